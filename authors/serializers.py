@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from utils.server_timing import timed
+
+from authors.authentication import invalidate_cached_user
+
 
 class AuthorSerializer(serializers.ModelSerializer):
     # Campo de senha, configurado para ser escrito mas não exibido, e validado com regras padrão de senhas
@@ -74,8 +78,12 @@ class AuthorSerializer(serializers.ModelSerializer):
         if 'password' in validated_data:
             instance.set_password(validated_data['password'])
         instance.save()
+        if 'password' in validated_data:
+            # o post_save já limpa o cache, mas a senha nova não pode depender de signal
+            invalidate_cached_user(str(instance.pk))
         return instance
 
+    @timed('serializer')
     def to_representation(self, instance):
         """
         Remove a senha da representação do usuário quando os dados são serializados para resposta.
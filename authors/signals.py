@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from authors.authentication import invalidate_cached_user
 from authors.models import Profile
 
 User = get_user_model()
@@ -12,3 +13,9 @@ def create_profile(sender, instance, created, *args, **kwargs):
     if created:
         profile = Profile.objects.create(author=instance)
         profile.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def jwt_user_cache_invalidate(sender, instance, *args, **kwargs):
+    invalidate_cached_user(str(instance.pk))
@@ -0,0 +1,125 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from authors.authentication import user_cache
+
+USER_CACHE = {'ENABLED': True, 'TTL': 60, 'MAX_SIZE': 1024}
+
+
+@override_settings(JWT_USER_CACHE=USER_CACHE)
+class AuthorJWTUserCacheTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='my_user', password='my_pass', first_name='My'
+        )
+        self.login()
+        return super().setUp()
+
+    def login(self, password='my_pass'):
+        response = self.client.post(
+            reverse('recipes:token_obtain_pair'),
+            {'username': 'my_user', 'password': password},
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}'
+        )
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in ctx.captured_queries
+            if 'FROM "auth_user"' in query['sql']
+        ], response
+
+    def test_me_reads_the_user_from_the_database(self):
+        url = reverse('authors:auhtor-api-me')
+        self.user_queries(url)
+
+        # update() não dispara signals: a entrada do cache continua lá
+        User.objects.filter(pk=self.user.pk).update(first_name='Changed')
+
+        queries, response = self.user_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(user_cache), 1)
+        self.assertEqual(response.data['first_name'], 'Changed')
+
+    def test_recipes_api_v2_skips_the_user_query_once_cached(self):
+        url = reverse('recipes:recipes-api-list')
+        self.user_queries(url)
+
+        queries, _ = self.user_queries(url)
+        self.assertEqual(queries, [])
+
+    def test_saving_the_user_invalidates_the_cache(self):
+        url = reverse('recipes:recipes-api-list')
+        self.user_queries(url)
+
+        self.user.first_name = 'Changed'
+        self.user.save()
+
+        queries, _ = self.user_queries(url)
+        self.assertEqual(len(queries), 1)
+
+    def test_deleted_user_is_not_authenticated(self):
+        url = reverse('recipes:recipes-api-list')
+        self.user_queries(url)
+
+        self.user.delete()
+
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_password_change_invalidates_the_cache(self):
+        url = reverse('recipes:recipes-api-list')
+        self.user_queries(url)
+
+        response = self.client.patch(
+            reverse('authors:auhtor-api-detail', args=(self.user.pk,)),
+            {'password': 'A-new-Pass-123'},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(user_cache), 0)
+
+    def test_changes_to_request_user_do_not_reach_the_cache(self):
+        url = reverse('recipes:recipes-api-list')
+        self.user_queries(url)
+        cached = next(iter(user_cache._entries.values()))[0]
+
+        _, response = self.user_queries(url)
+        response.wsgi_request.user.first_name = 'Other'
+
+        self.assertEqual(cached.first_name, 'My')
+
+    @override_settings(JWT_USER_CACHE={**USER_CACHE, 'ENABLED': False})
+    def test_disabled_cache_queries_the_user_every_time(self):
+        url = reverse('recipes:recipes-api-list')
+        self.user_queries(url)
+
+        queries, _ = self.user_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(user_cache), 0)
+
+    @override_settings(JWT_USER_CACHE={**USER_CACHE, 'TTL': -1})
+    def test_expired_entries_are_reloaded(self):
+        url = reverse('recipes:recipes-api-list')
+        self.user_queries(url)
+
+        queries, _ = self.user_queries(url)
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(JWT_USER_CACHE={**USER_CACHE, 'MAX_SIZE': 2})
+    def test_least_recently_used_entries_are_evicted(self):
+        user_cache.set(('a', 1), self.user)
+        user_cache.set(('b', 1), self.user)
+        user_cache.get(('a', 1))
+        user_cache.set(('c', 1), self.user)
+
+        self.assertIsNone(user_cache.get(('b', 1)))
+        self.assertIsNotNone(user_cache.get(('a', 1)))
+        self.assertIsNotNone(user_cache.get(('c', 1)))
@@ -22,8 +22,10 @@ class AuthorViewSet(ModelViewSet):
         """
         Retorna os dados do usuário autenticado.
         """
-        obj = self.get_queryset().first()
-        serializer = self.get_serializer(instance=obj)
+        # o request.user pode vir do cache de usuários da autenticação JWT,
+        # que em outros workers fica velho até o TTL: aqui os dados vêm do banco
+        instance = self.get_queryset().first()
+        serializer = self.get_serializer(instance=instance)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def get_queryset(self):
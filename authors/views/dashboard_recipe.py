@@ -1,6 +1,7 @@
 from authors.forms.recipe_form import AuthorRecipeForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 from django.http.response import Http404
 from django.shortcuts import redirect, render
 from django.urls import reverse
@@ -68,7 +69,12 @@ class DashboardRecipe(View):
             recipe.preparation_steps_is_html = False
             recipe.is_published = False
 
-            recipe.save()
+            try:
+                recipe.save()
+            except ValidationError as error:
+                # título salvo por outra requisição depois da validação do form
+                form.add_error(None, error)
+                return self.render_recipe(form)
 
             messages.success(request, 'Sua receita foi salva com sucesso!')
             return redirect(
@@ -0,0 +1,13 @@
+'''
+Load benchmarks on synthetic data.
+
+- `benchmarks.data.SyntheticData` fills the database with users, categories,
+  tags (with skewed popularity) and recipes linked to the tags, in batches
+  and without `Recipe.save()`.
+- `benchmarks.runner` requests the main pages and API endpoints in-process
+  and reports p50/p95/p99 latency, queries per request and peak memory.
+  `SCENARIOS` adds focused comparisons (e.g. response cache hit vs miss).
+
+Run both with `python manage.py benchmark` (see `--help`); the JSON report
+is meant to be kept and compared between runs.
+'''
@@ -0,0 +1,152 @@
+import random
+from itertools import accumulate
+
+from authors.models import Profile
+from django.contrib.auth.models import User
+from django.utils.text import slugify
+from faker import Faker
+from tag.models import Tag, normalize_tag_name
+
+from recipes.models import Recipe, author_display_name
+from recipes.search import get_search_backend
+from recipes.tests.test_recipe_base import RecipeMixin
+
+UNITS = {
+    'preparation_time_unit': ('Minutos', 'Horas'),
+    'servings_unit': ('Porções', 'Pessoas', 'Pedaços'),
+}
+
+
+class SyntheticData(RecipeMixin):
+    '''
+    Reproducible data set: the same seed and sizes generate the same rows.
+
+    Tag popularity follows Zipf's law (weight 1 / rank ** `tag_skew`), so a
+    few tags are in most recipes and most tags are in a few. Texts come from
+    a pool of Faker sentences, which keeps millions of recipes affordable.
+    '''
+    def __init__(self, seed=42, batch_size=2000, text_pool=1000,
+                 tag_skew=1.1, log=None):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.tag_skew = tag_skew
+        self.log = log or (lambda message: None)
+        self.rng = random.Random(seed)
+        self.fake = Faker('pt_BR')
+        self.fake.seed_instance(seed)
+        self.titles = [
+            self.fake.sentence(nb_words=4)[:65] for _ in range(text_pool)
+        ]
+        self.descriptions = [
+            self.fake.sentence(nb_words=16)[:165] for _ in range(text_pool)
+        ]
+        self.steps = [
+            self.fake.paragraph(nb_sentences=8) for _ in range(text_pool)
+        ]
+
+    def generate(self, users=100, categories=20, tags=200, recipes=10_000,
+                 tags_per_recipe=3, published_ratio=0.9):
+        self.users = self.make_users(users)
+        self.categories = self.make_categories(categories)
+        self.tags = self.make_tags(tags)
+        links = self.make_recipes(recipes, tags_per_recipe, published_ratio)
+        get_search_backend().rebuild()
+        return {
+            'users': len(self.users),
+            'categories': len(self.categories),
+            'tags': len(self.tags),
+            'recipes': recipes,
+            'recipe_tags': links,
+            'seed': self.seed,
+        }
+
+    def make_users(self, total):
+        # only the first user pays for password hashing
+        first = self.make_author(
+            username=f'benchmark-{self.seed}-0',
+            email=f'benchmark-{self.seed}-0@example.com',
+        )
+        users = [first] + User.objects.bulk_create((
+            User(
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                username=f'benchmark-{self.seed}-{i}',
+                email=f'benchmark-{self.seed}-{i}@example.com',
+                password=first.password,
+            )
+            for i in range(1, total)
+        ), batch_size=self.batch_size)
+        Profile.objects.bulk_create(
+            (Profile(author=user) for user in users[1:]),
+            batch_size=self.batch_size,
+        )
+        self.log(f'{total} users')
+        return users
+
+    def make_categories(self, total):
+        categories = [
+            self.make_category(name=self.fake.word().capitalize())
+            for _ in range(total)
+        ]
+        self.log(f'{total} categories')
+        return categories
+
+    def make_tags(self, total):
+        names = [f'{self.fake.word()} {i}' for i in range(total)]
+        tags = Tag.objects.bulk_create((
+            Tag(
+                name=name, normalized_name=normalize_tag_name(name),
+                slug=f'{slugify(name)}-{self.seed}',
+            )
+            for name in names
+        ), batch_size=self.batch_size)
+        self.tag_weights = list(accumulate(
+            1 / rank ** self.tag_skew for rank in range(1, total + 1)
+        ))
+        self.log(f'{total} tags')
+        return tags
+
+    def pick_tags(self, k):
+        return {
+            tag.pk for tag in self.rng.choices(
+                self.tags, cum_weights=self.tag_weights, k=k
+            )
+        }
+
+    def make_recipe(self, number, published_ratio):
+        author = self.rng.choice(self.users)
+        return Recipe(
+            # titles are unique (recipe_title_lower_uniq)
+            title=f'{self.rng.choice(self.titles)[:48]} ({self.seed}-{number})',
+            description=self.rng.choice(self.descriptions),
+            slug=f'benchmark-{self.seed}-{number}',
+            preparation_time=self.rng.randint(5, 240),
+            preparation_time_unit=self.rng.choice(
+                UNITS['preparation_time_unit']
+            ),
+            servings=self.rng.randint(1, 12),
+            servings_unit=self.rng.choice(UNITS['servings_unit']),
+            preparation_steps=self.rng.choice(self.steps),
+            is_published=self.rng.random() < published_ratio,
+            category=self.rng.choice(self.categories),
+            author=author,
+            author_full_name=author_display_name(author),
+        )
+
+    def make_recipes(self, total, tags_per_recipe, published_ratio):
+        Through = Recipe.tags.through
+        links = 0
+        for start in range(0, total, self.batch_size):
+            recipes = Recipe.objects.bulk_create([
+                self.make_recipe(number, published_ratio)
+                for number in range(start, min(start + self.batch_size, total))
+            ])
+            rows = [
+                Through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in self.pick_tags(tags_per_recipe)
+            ]
+            Through.objects.bulk_create(rows)
+            links += len(rows)
+            self.log(f'{start + len(recipes)}/{total} recipes')
+        return links
@@ -0,0 +1,340 @@
+import gc
+import platform
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, Max, Min
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory, override_settings
+from django.urls import resolve, reverse
+from tag.models import Tag
+
+from recipes.cache import set_recipe_cache_versions
+from recipes.models import Category, Recipe
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, pct):
+    '''
+    Nearest-rank percentile of an already sorted list.
+
+    >>> percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 95)
+    10
+    >>> percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50)
+    5
+    '''
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+
+@contextmanager
+def isolated_cache(alias='benchmark'):
+    '''
+    Makes the `alias` cache the default one while the block runs, so version
+    tokens and cached responses of the benchmark (whose data is usually
+    rolled back) never reach the site cache. It is cleared before and after.
+    '''
+    with override_settings(CACHES={
+        **settings.CACHES, 'default': settings.CACHES[alias],
+    }):
+        cache.clear()
+        try:
+            yield
+        finally:
+            cache.clear()
+
+
+def sample_recipe_ids(rng, size):
+    '''
+    Random published ids without `ORDER BY RANDOM()` (a full scan on large
+    tables): random points in the id range, each resolved by the index.
+    '''
+    published = Recipe.objects.filter(is_published=True)
+    bounds = published.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    ids = []
+    for _ in range(size):
+        point = rng.randint(bounds['low'], bounds['high'])
+        recipe_id = published.filter(id__gte=point).order_by('id').values_list(
+            'id', flat=True).first()
+        ids.append(recipe_id or bounds['high'])
+    return ids
+
+
+def build_endpoints(seed=42, sample_size=50):
+    '''
+    URLs of each endpoint. Endpoints with a parameter rotate over a sample
+    (recipes, categories, search terms) so the benchmark does not measure a
+    single warm row; the tag page is measured for the most and the least
+    used tags.
+    '''
+    rng = random.Random(seed)
+    recipe_ids = sample_recipe_ids(rng, sample_size)
+    category_ids = list(
+        Category.objects.order_by('id').values_list('id', flat=True)[:sample_size]
+    )
+    tags = Tag.objects.annotate(total=Count('recipe')).filter(total__gt=0)
+    popular_tag = tags.order_by('-total', 'id').first()
+    rare_tag = tags.order_by('total', 'id').first()
+    titles = Recipe.objects.filter(id__in=recipe_ids).values_list(
+        'title', flat=True)
+    terms = sorted({
+        word.strip('.').lower() for title in titles for word in title.split()
+        if len(word) > 3
+    })
+
+    endpoints = {
+        'home': [reverse('recipes:home')],
+        'home_page_10': [reverse('recipes:home') + '?page=10'],
+        'category': [
+            reverse('recipes:category', args=(pk,)) for pk in category_ids
+        ],
+        'search': [
+            reverse('recipes:search') + f'?q={term}' for term in terms
+        ],
+        'detail': [reverse('recipes:recipe', args=(pk,)) for pk in recipe_ids],
+        'api_v1_list': [reverse('recipes:recipes_api_v1')],
+        'api_v1_detail': [
+            reverse('recipes:recipes_api_v1_detail', args=(pk,))
+            for pk in recipe_ids
+        ],
+        'api_v2_list': [reverse('recipes:recipes-api-list')],
+        'api_v2_detail': [
+            reverse('recipes:recipes-api-detail', args=(pk,))
+            for pk in recipe_ids
+        ],
+    }
+    if popular_tag:
+        endpoints['tag_popular'] = [
+            reverse('recipes:tag', args=(popular_tag.slug,))
+        ]
+        endpoints['tag_rare'] = [reverse('recipes:tag', args=(rare_tag.slug,))]
+    return {name: urls for name, urls in endpoints.items() if urls}
+
+
+def measure_endpoint(client, urls, requests=100, warmup=5, cold=False):
+    for i in range(warmup):
+        client.get(urls[i % len(urls)])
+
+    timings, queries, statuses = [], [], set()
+    for i in range(requests):
+        if cold:
+            cache.clear()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            response = client.get(urls[i % len(urls)])
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count)
+        statuses.add(response.status_code)
+
+    # memory in a separate pass: tracemalloc slows every request down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for i in range(min(requests, 10)):
+            if cold:
+                cache.clear()
+            client.get(urls[i % len(urls)])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'requests': requests,
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(timings[-1], 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def cached_endpoints(endpoints):
+    '''
+    URLs of the endpoints behind the response cache of `recipes.cache`: the
+    v2 list and detail, the related recipes of the same sample and the tag
+    cloud.
+    '''
+    urls = {
+        name: endpoints[name] for name in ('api_v2_list', 'api_v2_detail')
+        if name in endpoints
+    }
+    if 'api_v2_detail' in endpoints:
+        urls['api_v2_related'] = [
+            reverse('recipes:recipes-api-related', kwargs=resolve(url).kwargs)
+            for url in endpoints['api_v2_detail']
+        ]
+    urls['api_v2_tag_cloud'] = [reverse('recipes:tags-cloud')]
+    return urls
+
+
+def measure_api_cache(client, endpoints, requests=100, warmup=5):
+    '''
+    Miss (cache cleared before every request) and hit (every URL requested
+    once before measuring) latency of each cached endpoint.
+    '''
+    results = {}
+    for name, urls in cached_endpoints(endpoints).items():
+        miss = measure_endpoint(
+            client, urls, requests=requests, warmup=warmup, cold=True
+        )
+        for url in urls:
+            client.get(url)
+        hit = measure_endpoint(client, urls, requests=requests, warmup=0)
+        results[name] = {
+            'miss': miss,
+            'hit': hit,
+            'speedup_p50': round(miss['p50_ms'] / hit['p50_ms'], 1),
+        }
+    return results
+
+
+def measure_card_render(client, endpoints, requests=100, warmup=5,
+                        sizes=(6, 100)):
+    '''
+    Render time of the home template with `sizes` recipe cards, without the
+    card fragment cache (timeout 0) and with it warm. Only the template is
+    timed: the recipes and their cache versions are loaded beforehand.
+    '''
+    request = RequestFactory().get(reverse('recipes:home'))
+    request.user = AnonymousUser()
+    recipes = list(Recipe.objects.filter(is_published=True).select_related(
+        'author', 'category', 'author__profile'
+    ).prefetch_related('tags').order_by('-id')[:max(sizes)])
+    set_recipe_cache_versions(recipes)
+
+    def render(page, timeout):
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            render_to_string('recipes/pages/home.html', {
+                'recipes': page,
+                'recipe_card_cache_timeout': timeout,
+            }, request)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+        }
+
+    results = {}
+    for size in sizes:
+        page = recipes[:size]
+        for _ in range(warmup):
+            render_to_string('recipes/pages/home.html', {
+                'recipes': page, 'recipe_card_cache_timeout': 0,
+            }, request)
+        uncached = render(page, 0)
+        cached = render(page, 600)
+        results[f'{size}_cards'] = {
+            'cards': len(page),
+            'uncached': uncached,
+            'cached': cached,
+            'speedup_p50': round(uncached['p50_ms'] / cached['p50_ms'], 1),
+        }
+    return results
+
+
+def measure_server_timing(client, endpoints, requests=100, warmup=5):
+    '''
+    Latency of the home page and the v2 list with the Server-Timing
+    middleware disabled and enabled. The middleware reads the setting when
+    it is loaded, so each side uses a new `Client`.
+    '''
+    results = {}
+    for name in ('home', 'api_v2_list'):
+        if name not in endpoints:
+            continue
+        sides = {}
+        for side, enabled in (('disabled', False), ('enabled', True)):
+            with override_settings(SERVER_TIMING_ENABLED=enabled):
+                sides[side] = measure_endpoint(
+                    Client(), endpoints[name], requests=requests,
+                    warmup=warmup,
+                )
+        results[name] = {
+            **sides,
+            'overhead_p50_ms': round(
+                sides['enabled']['p50_ms'] - sides['disabled']['p50_ms'], 3
+            ),
+        }
+    return results
+
+
+# extra measurements, selected with `manage.py benchmark --scenario`
+SCENARIOS = {
+    'api_cache': measure_api_cache,
+    'cards': measure_card_render,
+    'server_timing': measure_server_timing,
+}
+
+
+def run(endpoints, requests=100, warmup=5, cold=False, dataset=None,
+        scenarios=('endpoints',)):
+    '''
+    Requests every endpoint in-process with the test `Client` and returns
+    the report (a dict ready for `json.dump`). `scenarios` picks what is
+    measured: `endpoints` (every endpoint, warm or `cold`) and the names in
+    `SCENARIOS`, each reported under `scenarios`. Everything runs in the
+    `isolated_cache`.
+    '''
+    client = Client()
+    report = {}
+    backend = settings.CACHES['benchmark']['BACKEND']
+    with isolated_cache(), override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+    ):
+        if 'endpoints' in scenarios:
+            report['endpoints'] = {
+                name: measure_endpoint(
+                    client, urls, requests=requests, warmup=warmup, cold=cold
+                )
+                for name, urls in endpoints.items()
+            }
+        for name, measure in SCENARIOS.items():
+            if name in scenarios:
+                cache.clear()
+                report.setdefault('scenarios', {})[name] = measure(
+                    client, endpoints, requests=requests, warmup=warmup
+                )
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'dataset': dataset or {},
+            'published_recipes': Recipe.objects.filter(
+                is_published=True).count(),
+            'requests': requests,
+            'warmup': warmup,
+            'cold_cache': cold,
+            'scenarios': list(scenarios),
+            'database': connection.vendor,
+            'cache': backend,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+        },
+        **report,
+    }
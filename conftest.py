@@ -0,0 +1,48 @@
+import importlib.util
+import os
+
+import pytest
+from django.core.cache import cache
+
+# o backend com pool do PostgreSQL importa o driver, que pode não estar
+# instalado (os testes rodam em SQLite)
+collect_ignore = []
+if not any(
+    importlib.util.find_spec(driver) for driver in ('psycopg', 'psycopg2')
+):
+    collect_ignore.append('utils/db_pool/postgresql/base.py')
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--update-query-budget', action='store_true', default=False,
+        help='Regrava o query_budget.json com as contagens atuais.',
+    )
+
+
+def pytest_configure(config):
+    if config.getoption('update_query_budget'):
+        from utils.query_budget import UPDATE_ENV
+        os.environ[UPDATE_ENV] = '1'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    '''
+    O rollback do banco entre os testes não dispara signals, então os caches são limpos para nenhum teste ver respostas (ou usuários, já que os ids se repetem) de outro.
+    '''
+    from authors.authentication import user_cache
+    cache.clear()
+    user_cache.clear()
+    yield
+    cache.clear()
+    user_cache.clear()
+
+
+@pytest.fixture
+def query_budget():
+    '''
+    `with query_budget.measure('recipes:home[10]'): client.get(...)` falha se as queries passarem do `query_budget.json` (veja `utils/query_budget.py`).
+    '''
+    from utils.query_budget import QueryBudget
+    return QueryBudget()
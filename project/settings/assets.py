@@ -1,3 +1,5 @@
+import os
+
 from .environment import BASE_DIR
 
 # Static files (CSS, JavaScript, Images)
@@ -11,3 +13,24 @@ STATIC_ROOT = BASE_DIR / 'static'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Versões das capas das receitas (nome: largura máxima em px), geradas em
+# JPEG e WebP fora da requisição por recipes.images
+COVER_RENDITIONS = {
+    'thumbnail': 320,
+    'card': 840,
+    'full': 1600,
+}
+# Threads do pool de processamento (0 = processa no próprio on_commit)
+COVER_PROCESSING_WORKERS = int(os.environ.get('COVER_PROCESSING_WORKERS', 2))
+
+# Remoção dos arquivos antigos das capas (recipes.media): depois do commit,
+# em lotes numa thread em segundo plano (0 = apaga no próprio on_commit)
+MEDIA_DELETION_IN_BACKGROUND = os.environ.get(
+    'MEDIA_DELETION_IN_BACKGROUND', '1'
+) != '0'
+MEDIA_DELETION_BATCH_SIZE = 100
+# Novas tentativas de um arquivo que falhou, com espera de
+# MEDIA_DELETION_RETRY_DELAY segundos vezes o número da tentativa
+MEDIA_DELETION_RETRIES = 3
+MEDIA_DELETION_RETRY_DELAY = 0.5
@@ -0,0 +1,55 @@
+import os
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'recipes-default'),
+    },
+    # Usado no lugar do default por `manage.py benchmark`, para as versões e
+    # respostas das receitas sintéticas não ficarem no cache do site. O
+    # benchmark limpa este cache: não aponte para o mesmo banco do default.
+    'benchmark': {
+        'BACKEND': os.environ.get(
+            'BENCHMARK_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get(
+            'BENCHMARK_CACHE_LOCATION', 'recipes-benchmark'
+        ),
+        'KEY_PREFIX': 'benchmark',
+    },
+}
+
+# Tempo (em segundos) que uma resposta da API v2 fica no cache.
+# As respostas também são invalidadas pelos signals de Recipe e Tag.
+API_V2_CACHE_TIMEOUT = int(os.environ.get('API_V2_CACHE_TIMEOUT', 60 * 15))
+
+# Contagens da paginação das páginas HTML (recipes.counts): tempo máximo no
+# cache das contagens exatas e limite da contagem da busca.
+PAGINATION_COUNT_TIMEOUT = int(
+    os.environ.get('PAGINATION_COUNT_TIMEOUT', 60 * 10)
+)
+PAGINATION_COUNT_CAP = int(os.environ.get('PAGINATION_COUNT_CAP', 1000))
+
+# Card das receitas (recipes/partials/recipe.html) no cache de fragmentos.
+# A chave muda com a receita, o idioma e a versão da receita em recipes.cache.
+RECIPE_CARD_CACHE_TIMEOUT = int(
+    os.environ.get('RECIPE_CARD_CACHE_TIMEOUT', 60 * 60)
+)
+
+# Receitas parecidas (recipes.related), recalculadas por
+# `manage.py build_related_recipes`: quantas aparecem na página/API, quantas
+# ficam guardadas por receita (sobra para as despublicadas depois do cálculo),
+# quantas receitas de uma tag comum entram como candidatas e o peso da
+# categoria em relação a uma tag.
+RELATED_RECIPES_COUNT = int(os.environ.get('RELATED_RECIPES_COUNT', 6))
+RELATED_RECIPES_STORED = 12
+RELATED_RECIPES_MAX_POSTINGS = 100
+RELATED_RECIPES_CATEGORY_WEIGHT = 0.5
+RELATED_RECIPES_BATCH_SIZE = 2000
@@ -11,5 +11,28 @@ DATABASES = {
         'PASSWORD': os.environ.get('DATABASE_PASSWORD'),
         'HOST': os.environ.get('DATABASE_HOST'),
         'PORT': os.environ.get('DATABASE_PORT'),
+        # Conexões persistentes: cada worker reaproveita a conexão por até
+        # DATABASE_CONN_MAX_AGE segundos (0 = uma conexão por requisição) e
+        # testa a conexão reaproveitada antes da primeira query da requisição.
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': (
+            os.environ.get('DATABASE_CONN_HEALTH_CHECKS', '1') == '1'
+        ),
     }
 }
+
+# Pool de conexões dentro do processo (utils.db_pool), para PostgreSQL e
+# SQLite. A conexão volta para o pool no fim de cada requisição.
+if os.environ.get('DATABASE_POOL') == '1':
+    DATABASES['default'].update({
+        'ENGINE': 'utils.db_pool.' + DATABASES['default']['ENGINE'].rsplit(
+            '.', 1)[-1],
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 4)),
+            'TIMEOUT': float(os.environ.get('DATABASE_POOL_TIMEOUT', 5)),
+            'MAX_LIFETIME': int(
+                os.environ.get('DATABASE_POOL_MAX_LIFETIME', 60 * 30)
+            ),
+        },
+    })
@@ -1,4 +1,8 @@
+import os
+
 MIDDLEWARE = [
+    # Header Server-Timing (utils.server_timing), por fora de todos os outros
+    'utils.server_timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -10,3 +14,10 @@ MIDDLEWARE = [
     # Django cors headers
     'corsheaders.middleware.CorsMiddleware',
 ]
+
+# Server-Timing: desligado o middleware nem é instalado. A taxa de amostragem
+# (0 a 1) é a fração das requisições que também viram uma linha de log.
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED') == '1'
+SERVER_TIMING_LOG_SAMPLE_RATE = float(
+    os.environ.get('SERVER_TIMING_LOG_SAMPLE_RATE', 0)
+)
@@ -7,13 +7,22 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100,
     # simplejwt
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authors.authentication.JWTAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
     ),
 }
 
+# Cache (por processo) do usuário dos tokens JWT (authors.authentication):
+# evita a query do usuário em toda requisição autenticada. ENABLED=0 volta
+# ao comportamento do simplejwt.
+JWT_USER_CACHE = {
+    'ENABLED': os.environ.get('JWT_USER_CACHE_ENABLED', '1') == '1',
+    'TTL': int(os.environ.get('JWT_USER_CACHE_TTL', 60)),
+    'MAX_SIZE': int(os.environ.get('JWT_USER_CACHE_MAX_SIZE', 1024)),
+}
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60), # tempo de vida do token de acesso
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1), # tempo de vida do token de atualização
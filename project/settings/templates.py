@@ -2,7 +2,7 @@ from .environment import BASE_DIR
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'utils.server_timing.DjangoTemplates',
         'DIRS': [
             BASE_DIR / 'base_templates',
         ],
@@ -0,0 +1,276 @@
+'''
+Criação e atualização de receitas em lote (`POST/PATCH recipes/api/v2/bulk/`).
+
+Cada item é validado pelo `RecipeBulkItemSerializer` sem tocar no banco (categoria e tags chegam como ids). As consultas são feitas uma vez para o lote inteiro:
+
+- receitas a atualizar (do autor)
+- categorias existentes
+- tags existentes
+- títulos já usados
+- slugs ocupados (`RecipeManager.allocate_slugs`, como no `Recipe.save` de uma receita só)
+
+A gravação usa `bulk_create`/`bulk_update` e a tabela intermediária das tags também é inserida em lote, tudo numa transação. Se algum item for inválido nada é gravado e a resposta traz os erros na mesma posição dos itens, como no `many=True` do DRF. Um título gravado por outra requisição entre a checagem e o INSERT (IntegrityError dos índices únicos) desfaz a transação e vira o mesmo erro de validação; um slug ocupado assim faz o lote ser gravado de novo com outros slugs.
+'''
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework import serializers
+from tag.models import Tag
+
+from authors.validators import AuthorRecipeValidator
+from recipes.models import Category, Recipe, author_display_name
+from recipes.signals import recipes_bulk_changed
+
+BULK_FIELDS = [
+    'title', 'description', 'preparation_time', 'preparation_time_unit',
+    'servings', 'servings_unit', 'preparation_steps', 'is_published',
+    'category_id',
+]
+
+
+class RecipeBulkItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=65)
+    description = serializers.CharField(max_length=165)
+    preparation_time = serializers.IntegerField()
+    preparation_time_unit = serializers.CharField(max_length=65)
+    servings = serializers.IntegerField()
+    servings_unit = serializers.CharField(max_length=65)
+    preparation_steps = serializers.CharField()
+    public = serializers.BooleanField(source='is_published', default=False)
+    category = serializers.IntegerField(
+        source='category_id', required=False, allow_null=True
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+    def validate(self, dados):
+        AuthorRecipeValidator(
+            dados,
+            ErrorClass=serializers.ValidationError
+        )
+        return dados
+
+
+class RecipeBulkWriter:
+    def __init__(self, author, items, partial=False, max_items=500):
+        self.author = author
+        self.items = items
+        self.partial = partial
+        self.max_items = max_items
+        self.instances = {}
+        self.validated = []
+        self.errors = []
+        self.tag_slugs = {}
+
+    def add_error(self, index, field, message):
+        self.errors[index].setdefault(field, []).append(message)
+
+    def has_errors(self):
+        return any(self.errors)
+
+    def merged_item(self, index, item):
+        '''
+        No PATCH o item só traz os campos alterados: completa com os valores atuais da receita para validar o registro inteiro.
+        '''
+        instance = self.instances.get(item.get('id'))
+
+        if instance is None:
+            self.add_error(index, 'id', 'Recipe not found.')
+            return None
+
+        current = {
+            'title': instance.title,
+            'description': instance.description,
+            'preparation_time': instance.preparation_time,
+            'preparation_time_unit': instance.preparation_time_unit,
+            'servings': instance.servings,
+            'servings_unit': instance.servings_unit,
+            'preparation_steps': instance.preparation_steps,
+            'public': instance.is_published,
+            'category': instance.category_id,
+        }
+        return {**current, **item}
+
+    def is_valid(self):
+        if not isinstance(self.items, list) or not self.items:
+            raise serializers.ValidationError(
+                {'non_field_errors': ['Expected a non-empty list of items.']}
+            )
+        if len(self.items) > self.max_items:
+            raise serializers.ValidationError({'non_field_errors': [
+                f'Expected at most {self.max_items} items.'
+            ]})
+
+        self.errors = [{} for _ in self.items]
+        self.validated = [None] * len(self.items)
+
+        if self.partial:
+            ids = [
+                item.get('id') for item in self.items
+                if isinstance(item, dict) and isinstance(item.get('id'), int)
+            ]
+            self.instances = Recipe.objects.filter(
+                author=self.author
+            ).in_bulk(ids)
+
+        for index, item in enumerate(self.items):
+            if not isinstance(item, dict):
+                self.add_error(index, 'non_field_errors', 'Expected an object.')
+                continue
+
+            if self.partial:
+                item = self.merged_item(index, item)
+                if item is None:
+                    continue
+
+            serializer = RecipeBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                self.validated[index] = serializer.validated_data
+            else:
+                self.errors[index] = dict(serializer.errors)
+
+        self.validate_relations()
+        self.validate_titles()
+        return not self.has_errors()
+
+    def validate_relations(self):
+        valid = [
+            (index, data) for index, data in enumerate(self.validated) if data
+        ]
+        category_ids = {
+            data['category_id'] for _, data in valid
+            if data.get('category_id') is not None
+        }
+        tag_ids = {tag_id for _, data in valid for tag_id in data.get('tags', [])}
+
+        existing_categories = set(Category.objects.filter(
+            pk__in=category_ids
+        ).values_list('id', flat=True)) if category_ids else set()
+        self.tag_slugs = dict(Tag.objects.filter(
+            pk__in=tag_ids
+        ).values_list('id', 'slug')) if tag_ids else {}
+
+        for index, data in valid:
+            category_id = data.get('category_id')
+            if category_id is not None and category_id not in existing_categories:
+                self.add_error(
+                    index, 'category', f'Invalid pk "{category_id}".'
+                )
+            for tag_id in data.get('tags', []):
+                if tag_id not in self.tag_slugs:
+                    self.add_error(index, 'tags', f'Invalid pk "{tag_id}".')
+
+    def validate_titles(self):
+        '''
+        Mesma regra do `Recipe.clean` (título único sem diferenciar maiúsculas), checada numa só query para o lote.
+        '''
+        valid = [
+            (index, data) for index, data in enumerate(self.validated) if data
+        ]
+        titles = {data['title'].lower() for _, data in valid}
+
+        taken_titles = dict(Recipe.objects.annotate(
+            title_lower=Lower('title')
+        ).filter(title_lower__in=titles).values_list('title_lower', 'id'))
+
+        seen_titles = set()
+        for index, data in valid:
+            pk = self.items[index].get('id') if self.partial else None
+            title = data['title'].lower()
+
+            if taken_titles.get(title, pk) != pk or title in seen_titles:
+                self.add_error(
+                    index, 'title', 'Found recipes with the same title'
+                )
+            seen_titles.add(title)
+
+    def save(self, attempts=3):
+        for attempt in range(attempts):
+            try:
+                return self.write()
+            except IntegrityError:
+                # outra requisição gravou o mesmo título ou slug depois do is_valid()
+                self.errors = [{} for _ in self.items]
+                self.validate_titles()
+                if self.has_errors():
+                    raise serializers.ValidationError({'errors': self.errors})
+                if attempt == attempts - 1:
+                    raise
+
+    @transaction.atomic
+    def write(self):
+        if self.partial:
+            recipes, old_state = self.update()
+        else:
+            recipes, old_state = self.create(), []
+
+        self.save_tags(recipes)
+        recipes_bulk_changed(recipes, old_state, self.changed_tag_slugs)
+        return recipes
+
+    def create(self):
+        recipes = []
+        author_full_name = author_display_name(self.author)
+        slugs = Recipe.objects.allocate_slugs(
+            [data['title'] for data in self.validated]
+        )
+        for data, slug in zip(self.validated, slugs):
+            recipe = Recipe(
+                author=self.author,
+                author_full_name=author_full_name, # bulk_create não chama o save()
+                slug=slug,
+                **{field: data[field] for field in BULK_FIELDS if field in data}
+            )
+            recipes.append(recipe)
+        return Recipe.objects.bulk_create(recipes)
+
+    def update(self):
+        recipes, old_state = [], []
+        now = timezone.now()
+        for index, data in enumerate(self.validated):
+            recipe = self.instances[self.items[index]['id']]
+            old_state.append((
+                recipe.pk, recipe.is_published, recipe.category_id
+            ))
+            for field in BULK_FIELDS:
+                if field in data:
+                    setattr(recipe, field, data[field])
+            recipe.updated_at = now # bulk_update não aplica o auto_now
+            recipes.append(recipe)
+
+        Recipe.objects.bulk_update(recipes, BULK_FIELDS + ['updated_at'])
+        return recipes, old_state
+
+    def save_tags(self, recipes):
+        '''
+        Troca as tags dos itens que enviaram `tags` com um DELETE e um INSERT em lote na tabela intermediária.
+        '''
+        through = Recipe.tags.through
+        with_tags = [
+            (recipe, data['tags'])
+            for recipe, data in zip(recipes, self.validated)
+            if 'tags' in data
+        ]
+        self.changed_tag_slugs = set()
+        if not with_tags:
+            return
+
+        recipe_ids = [recipe.pk for recipe, _ in with_tags]
+        if self.partial:
+            removed = through.objects.filter(recipe_id__in=recipe_ids)
+            self.changed_tag_slugs.update(
+                removed.values_list('tag__slug', flat=True)
+            )
+            removed.delete()
+
+        through.objects.bulk_create([
+            through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe, tag_ids in with_tags
+            for tag_id in dict.fromkeys(tag_ids)
+        ])
+        self.changed_tag_slugs.update(
+            self.tag_slugs[tag_id]
+            for _, tag_ids in with_tags for tag_id in tag_ids
+        )
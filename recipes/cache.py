@@ -0,0 +1,195 @@
+import threading
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+from utils.http_cache import conditional_response, set_validators
+
+VERSION_KEY_PREFIX = 'api_v2:version'
+RESPONSE_KEY_PREFIX = 'api_v2:response'
+# nome e slug das tags que aparecem nas receitas: uma versão só, trocada quando qualquer tag é editada ou apagada
+RECIPE_TAGS_SCOPE = 'recipe:tags'
+
+
+class ResponseCacheStats:
+    '''
+    Contadores de hit/miss do cache de respostas (por processo).
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+stats = ResponseCacheStats()
+
+
+def _version_key(scope):
+    return f'{VERSION_KEY_PREFIX}:{scope}'
+
+
+def _new_version():
+    return f'{time.time_ns() // 1_000_000:x}.{uuid4().hex}'
+
+
+def version_timestamp(version):
+    '''
+    Momento em que o token foi criado (os tokens começam com o timestamp em milissegundos). Usado no `Last-Modified`.
+    '''
+    try:
+        milliseconds = int(version.split('.', 1)[0], 16)
+    except ValueError:
+        return None
+    return datetime.fromtimestamp(milliseconds / 1000, tz=timezone.utc)
+
+
+def get_versions(*scopes):
+    '''
+    Retorna o token de versão atual de cada escopo (`recipe:list`, `recipe:10`, `tag:list`...).
+
+    Os tokens são aleatórios em vez de contadores, assim uma chave antiga nunca volta a ser válida depois de um rollback ou de um `cache.clear()`. O prefixo de cada token é o instante da criação (veja `version_timestamp`).
+    '''
+    keys = {_version_key(scope): scope for scope in scopes}
+    versions = cache.get_many(keys.keys())
+    missing = {key: _new_version() for key in keys if key not in versions}
+
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+
+    return [versions[_version_key(scope)] for scope in scopes]
+
+
+def _bump_versions(scopes):
+    cache.set_many(
+        {_version_key(scope): _new_version() for scope in scopes},
+        timeout=None,
+    )
+
+
+def bump_versions(*scopes):
+    '''
+    Invalida todas as respostas que dependem de algum dos escopos.
+
+    Invalida na hora e de novo no commit: uma requisição concorrente que leu os dados antigos antes do commit não consegue deixar uma resposta velha no cache.
+    '''
+    scopes = set(scopes)
+    if not scopes:
+        return
+    _bump_versions(scopes)
+    transaction.on_commit(lambda: _bump_versions(scopes))
+
+
+def set_recipe_cache_versions(recipes):
+    '''
+    Preenche `Recipe.cache_version` de várias receitas com um único `get_many` (usado pelo cache do card em `recipes/partials/recipe.html`).
+    '''
+    recipes = list(recipes)
+    tags_version, *versions = get_versions(
+        RECIPE_TAGS_SCOPE, *(f'recipe:{recipe.pk}' for recipe in recipes)
+    )
+    for recipe, version in zip(recipes, versions):
+        recipe.cache_version = f'{version}:{tags_version}'
+
+
+def make_response_key(request, scopes):
+    '''
+    Chave da resposta: host + path + query string normalizada (ordenada) + versões dos escopos.
+    '''
+    query = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    query_string = '&'.join(f'{key}={value}' for key, value in query)
+    versions = ':'.join(get_versions(*scopes))
+    return (
+        f'{RESPONSE_KEY_PREFIX}:{versions}:'
+        f'{request.build_absolute_uri(request.path)}?{query_string}'
+    )
+
+
+class CachedResponseMixin:
+    '''
+    Mixin para ViewSets que guarda no cache o resultado de `list` e `retrieve`.
+
+    - `cache_scope`: nome do escopo usado para invalidar (`recipe`, `tag`).
+    - `list` depende de `<scope>:list` e `retrieve` depende de `<scope>:<pk>`, os dois também dos escopos em `cache_dependencies`.
+    - A resposta informa `X-Cache: HIT` ou `X-Cache: MISS`.
+    - GET condicional: se a view definir `get_list_validators`/`get_object_validators` (retornam `(etag, last_modified)` ou None), a resposta leva `ETag`/`Last-Modified` e um `If-None-Match`/`If-Modified-Since` válido recebe 304 antes da serialização. Os validadores ficam no cache junto com os dados, então um HIT continua sem queries.
+    '''
+    cache_scope = None
+    cache_dependencies = ()
+
+    def get_cache_timeout(self):
+        return settings.API_V2_CACHE_TIMEOUT
+
+    def get_list_validators(self):
+        return None
+
+    def get_object_validators(self):
+        return None
+
+    def cached_response(self, scopes, get_validators, view_method, request,
+                        *args, **kwargs):
+        key = make_response_key(request, scopes)
+        cached = cache.get(key)
+
+        if cached is not None:
+            stats.hit()
+            data, validators = cached
+            response = conditional_response(request, validators) or Response(data)
+            response['X-Cache'] = 'HIT'
+            return set_validators(response, validators)
+
+        stats.miss()
+        validators = get_validators()
+        response = conditional_response(request, validators)
+        if response is None:
+            response = view_method(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(
+                    key, (response.data, validators), self.get_cache_timeout()
+                )
+        response['X-Cache'] = 'MISS'
+        return set_validators(response, validators)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            [f'{self.cache_scope}:list', *self.cache_dependencies],
+            self.get_list_validators,
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            [f'{self.cache_scope}:{kwargs.get("pk")}', *self.cache_dependencies],
+            self.get_object_validators,
+            super().retrieve, request, *args, **kwargs
+        )
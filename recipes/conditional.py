@@ -0,0 +1,60 @@
+'''
+Validadores do GET condicional (`ETag`/`Last-Modified`) das receitas.
+
+O `updated_at` não muda quando uma tag, a categoria ou o autor são editados, então os validadores também usam as versões `recipe:<pk>`, `recipe:list` e `recipe:tags` de `recipes.cache`, que os signals já trocam nesses casos. Custa no máximo uma query: o `updated_at` pela chave primária no detalhe, ou `MAX(updated_at)` + `COUNT(*)` da lista filtrada.
+'''
+from django.db.models import Count, Max
+from utils.http_cache import conditional_response, make_validators, set_validators
+
+from recipes.cache import RECIPE_TAGS_SCOPE, get_versions, version_timestamp
+
+
+def recipe_validators(queryset, pk, *parts, scopes=()):
+    '''
+    `(etag, last_modified)` da receita `pk` dentro de `queryset`, ou None se ela não estiver lá (a view segue e responde 404). `parts` diferencia as representações (HTML, JSON, idioma...) e `scopes` são outras versões de `recipes.cache` de que a representação depende.
+    '''
+    if not str(pk).isdigit():
+        return None
+
+    updated_at = queryset.filter(pk=pk).values_list(
+        'updated_at', flat=True
+    ).first()
+    if updated_at is None:
+        return None
+
+    versions = get_versions(f'recipe:{pk}', RECIPE_TAGS_SCOPE, *scopes)
+    return make_validators(
+        ('recipe', pk, updated_at.isoformat(), *versions, *parts),
+        [updated_at, *map(version_timestamp, versions)],
+    )
+
+
+def recipe_list_validators(queryset, *parts):
+    aggregate = queryset.order_by().aggregate(
+        last_updated=Max('updated_at'), total=Count('pk'),
+    )
+    last_updated = aggregate['last_updated']
+    versions = get_versions('recipe:list', RECIPE_TAGS_SCOPE)
+    return make_validators(
+        (
+            'list', aggregate['total'],
+            last_updated.isoformat() if last_updated else '',
+            *versions, *parts,
+        ),
+        [last_updated, *map(version_timestamp, versions)],
+    )
+
+
+class ConditionalGetMixin:
+    '''
+    Para views do Django (`DetailView`...): responde 304 antes de montar o contexto e renderizar o template quando os validadores de `get_validators` batem com o `If-None-Match`/`If-Modified-Since`.
+    '''
+    def get_validators(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        response = conditional_response(request, validators)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return set_validators(response, validators)
@@ -0,0 +1,182 @@
+'''
+Contadores de receitas publicadas por tag e por categoria (`TagRecipeCount` e `CategoryRecipeCount`), para não rodar um `Count('recipe')` na tabela intermediária a cada leitura.
+
+Os signals de `recipes.signals` somam ou subtraem com um `UPDATE ... SET published = published + n`, na mesma transação da mudança: publicar, despublicar ou apagar uma receita, trocar a categoria e o `m2m_changed` das tags. As tags criadas em lote pela API (`TagManager.upsert`) ganham a linha zerada na criação (`create_tag_counts`); as linhas que ainda faltarem (categorias novas, tags de outros `bulk_create`) são criadas já com a contagem exata quando são somadas ou lidas.
+
+A paginação das páginas de categoria e de tag lê o total daqui (`category_count`/`tag_count`), sem `COUNT(*)`.
+
+O que não passa pelos signals (`QuerySet.update()`, SQL direto) desvia os contadores. `reconcile_tag_counts`/`reconcile_category_counts` recalculam com um GROUP BY e corrigem só as linhas diferentes: rodam periodicamente (`manage.py reconcile_recipe_counts`) e nos lotes da API, só para as tags e categorias do lote.
+
+Qualquer mudança nas tags troca a versão `tag:cloud` de `recipes.cache`, da resposta da nuvem de tags.
+'''
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+from tag.models import Tag
+
+from recipes.cache import bump_versions
+from recipes.models import Category, CategoryRecipeCount, TagRecipeCount
+
+CLOUD_SCOPE = 'tag:cloud'
+
+
+def published_count():
+    return Count('recipe', filter=Q(recipe__is_published=True))
+
+
+def exact_counts(source, fields, ids, chunk_size):
+    '''
+    `[(pk, {campo: valor}, {campo: valor guardado}), ...]` de `source` em lotes de `chunk_size`: todos os ids em ordem (keyset) ou só os de `ids`. A contagem exata e a linha do contador (`recipe_count`, LEFT JOIN) vêm na mesma query; sem linha, os valores guardados são None.
+    '''
+    fields = [*fields, 'published']
+    rows = source.annotate(
+        published=published_count(),
+        **{f'stored_{field}': F(f'recipe_count__{field}') for field in fields},
+    ).order_by('pk').values_list(
+        'pk', *fields, *(f'stored_{field}' for field in fields)
+    )
+
+    def split(chunk):
+        return [
+            (
+                row[0],
+                dict(zip(fields, row[1:len(fields) + 1])),
+                dict(zip(fields, row[len(fields) + 1:])),
+            )
+            for row in chunk
+        ]
+
+    if ids is None:
+        last_pk = 0
+        while True:
+            chunk = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                return
+            yield split(chunk)
+            last_pk = chunk[-1][0]
+
+    ids = sorted({pk for pk in ids if pk is not None})
+    for start in range(0, len(ids), chunk_size):
+        yield split(rows.filter(pk__in=ids[start:start + chunk_size]))
+
+
+def reconcile(model, source, fields, ids=None, chunk_size=2000):
+    '''
+    Compara as linhas de `model` com a contagem exata de `source` (tags ou categorias) e grava só as diferentes, junto com as cópias dos `fields`. `ids` restringe a conta. Retorna quantas linhas foram criadas ou corrigidas.
+    '''
+    fixed = 0
+    for rows in exact_counts(source, fields, ids, chunk_size):
+        created, updated = [], []
+        for pk, expected, current in rows:
+            if current['published'] is None:
+                created.append(model(pk=pk, **expected))
+            elif expected != current:
+                updated.append(model(pk=pk, **expected))
+
+        model.objects.bulk_create(created, ignore_conflicts=True)
+        model.objects.bulk_update(updated, [*fields, 'published'])
+        fixed += len(created) + len(updated)
+    return fixed
+
+
+def reconcile_tag_counts(tag_ids=None, chunk_size=2000):
+    fixed = reconcile(
+        TagRecipeCount, Tag.objects.all(), ['name', 'slug'], tag_ids,
+        chunk_size,
+    )
+    if fixed:
+        bump_versions(CLOUD_SCOPE)
+    return fixed
+
+
+def reconcile_category_counts(category_ids=None, chunk_size=2000):
+    return reconcile(
+        CategoryRecipeCount, Category.objects.all(), [], category_ids,
+        chunk_size,
+    )
+
+
+def create_tag_counts(tag_ids):
+    '''
+    Linhas zeradas para tags recém-criadas por `bulk_create`, que não dispara signals.
+    '''
+    TagRecipeCount.objects.bulk_create((
+        TagRecipeCount(tag_id=pk, name=name, slug=slug)
+        for pk, name, slug in Tag.objects.filter(
+            pk__in=tag_ids
+        ).values_list('pk', 'name', 'slug')
+    ), ignore_conflicts=True)
+
+
+def add(model, deltas, reconcile_missing):
+    '''
+    Soma `deltas` (`{pk: n}`) nos contadores com um UPDATE por valor de `n`. Os que não tinham linha são criados com a contagem exata, que já inclui a mudança (os signals rodam depois dela).
+    '''
+    deltas = {pk: n for pk, n in deltas.items() if pk is not None and n}
+    if not deltas:
+        return False
+
+    by_delta = defaultdict(list)
+    for pk, n in deltas.items():
+        by_delta[n].append(pk)
+
+    updated = sum(
+        model.objects.filter(pk__in=pks).update(published=F('published') + n)
+        for n, pks in by_delta.items()
+    )
+    if updated < len(deltas):
+        existing = set(model.objects.filter(
+            pk__in=deltas
+        ).values_list('pk', flat=True))
+        reconcile_missing([pk for pk in deltas if pk not in existing])
+    return True
+
+
+def add_to_tags(deltas):
+    if add(TagRecipeCount, deltas, reconcile_tag_counts):
+        bump_versions(CLOUD_SCOPE)
+
+
+def add_to_categories(deltas):
+    add(CategoryRecipeCount, deltas, reconcile_category_counts)
+
+
+def read_count(counts, reconcile_missing):
+    '''
+    `published` da linha de `counts`; sem linha, recalcula com `reconcile_missing` e lê de novo.
+    '''
+    count = counts.values_list('published', flat=True).first()
+    if count is None:
+        reconcile_missing()
+        count = counts.values_list('published', flat=True).first()
+    return count or 0
+
+
+def category_count(category_id):
+    return read_count(
+        CategoryRecipeCount.objects.filter(pk=category_id),
+        lambda: reconcile_category_counts([category_id]),
+    )
+
+
+def tag_count(slug):
+    return read_count(
+        TagRecipeCount.objects.filter(tag__slug=slug),
+        lambda: reconcile_tag_counts(
+            Tag.objects.filter(slug=slug).values_list('id', flat=True)
+        ),
+    )
+
+
+def tag_cloud(limit):
+    '''
+    As `limit` tags com mais receitas publicadas (empate: ordem alfabética), só da tabela dos contadores.
+    '''
+    return [
+        {'id': pk, 'name': name, 'slug': slug, 'count': count}
+        for pk, name, slug, count in TagRecipeCount.objects.filter(
+            published__gt=0
+        ).order_by('-published', 'name').values_list(
+            'tag_id', 'name', 'slug', 'published'
+        )[:limit]
+    ]
@@ -0,0 +1,41 @@
+'''
+Contagens usadas na paginação das páginas HTML.
+
+- Home: contagem exata guardada no cache, com as mesmas versões de `recipes.cache`. Os signals só invalidam quando o número de receitas publicadas pode mudar (publicar/despublicar, apagar).
+- Categoria e tag: os contadores de `recipes.counters`.
+- Busca: contagem com limite (`SELECT COUNT(*) FROM (... LIMIT n)`), suficiente para montar a janela de páginas atual.
+'''
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.cache import get_versions
+
+COUNT_KEY_PREFIX = 'pagination_count'
+
+
+def published_scope():
+    return 'count:published'
+
+
+def cached_count(queryset, *scopes):
+    versions = ':'.join(get_versions(*scopes))
+    key = f'{COUNT_KEY_PREFIX}:{":".join(scopes)}:{versions}'
+    count = cache.get(key)
+
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_TIMEOUT)
+
+    return count
+
+
+def capped_count(queryset, current_page, per_page, qty_pages=4):
+    '''
+    Conta no máximo o necessário para a janela de paginação (e pelo menos `PAGINATION_COUNT_CAP` linhas). Retorna `(total, is_estimate)`.
+    '''
+    limit = max(
+        settings.PAGINATION_COUNT_CAP,
+        (max(current_page, 1) + qty_pages) * per_page,
+    )
+    count = queryset[:limit].count()
+    return count, count >= limit
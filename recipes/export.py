@@ -0,0 +1,59 @@
+'''
+Exportação do catálogo publicado em NDJSON (uma receita por linha, em JSON), usada pelo `GET recipes/api/v2/export/` e pelo comando `export_recipes`.
+
+As receitas são lidas com `.iterator(chunk_size=...)` (cursor no servidor quando o banco suporta) e serializadas em blocos pelo `RecipeFastSerializer`, com uma query de tags por bloco. Nada é acumulado: a memória usada é a de um bloco, qualquer que seja o tamanho do catálogo.
+'''
+from datetime import datetime, time
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from recipes.models import Recipe
+from recipes.serializers import RecipeFastSerializer
+
+EXPORT_CHUNK_SIZE = 500
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def parse_updated_since(value):
+    '''
+    Aceita data (`2024-05-01`) ou data e hora ISO 8601 (`2024-05-01T10:00:00Z`). Sem fuso horário, usa o fuso do projeto. Levanta `ValueError` se o valor for inválido.
+    '''
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date or datetime: "{value}".')
+        moment = datetime.combine(day, time.min)
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def get_export_queryset(updated_since=None):
+    queryset = Recipe.objects.get_published()
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    return RecipeFastSerializer.get_queryset(queryset).order_by('id')
+
+
+def iter_catalog(context, updated_since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    '''
+    Gera as receitas publicadas (mesmos campos do `RecipeSerializer`) em ordem de id.
+    '''
+    rows = get_export_queryset(updated_since).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from RecipeFastSerializer(chunk, many=True, context=context).data
+
+
+def iter_ndjson(context, updated_since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for recipe in iter_catalog(context, updated_since, chunk_size):
+        yield encoder.encode(recipe) + '\n'
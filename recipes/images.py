@@ -0,0 +1,178 @@
+'''
+Processamento das capas das receitas fora da requisição.
+
+A requisição só grava o arquivo original. Depois do commit, `schedule_cover_processing` coloca a receita num pool de threads que gera as versões (`settings.COVER_RENDITIONS`) em JPEG e WebP e grava os caminhos em `Recipe.cover_renditions`.
+
+Se o processo morrer antes de terminar, `manage.py process_covers` processa as capas pendentes.
+'''
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from recipes.cache import bump_versions
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'recipes/covers/renditions'
+# versão na largura da própria capa, quando ela é mais estreita que alguma de `settings.COVER_RENDITIONS`
+ORIGINAL_RENDITION = 'original'
+FORMATS = {
+    'jpg': {'format': 'JPEG', 'quality': 70, 'optimize': True},
+    'webp': {'format': 'WEBP', 'quality': 70, 'method': 4},
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.COVER_PROCESSING_WORKERS,
+            thread_name_prefix='cover-processing',
+        )
+    return _executor
+
+
+def rendition_name(cover_name, rendition, extension):
+    path = PurePosixPath(cover_name)
+    # mantém a data do upload_to (recipes/covers/%Y/%m/%d/) no caminho das versões
+    date_parts = path.parent.parts[2:] if len(path.parts) > 3 else ()
+    return str(PurePosixPath(
+        RENDITIONS_DIR, *date_parts, f'{path.stem}-{rendition}.{extension}'
+    ))
+
+
+def make_renditions(cover_name):
+    '''
+    Gera as versões da capa e retorna o dicionário salvo em `Recipe.cover_renditions`:
+    `{'source': <original>, 'thumbnail': {'width': 320, 'jpg': ..., 'webp': ...}, ...}`
+
+    Só as versões mais estreitas que a imagem original são geradas, uma por largura (o `srcset` não pode repetir o descritor `Nw`). Se alguma ficou de fora, a versão `original` guarda a imagem na largura dela, em JPEG e WebP.
+    '''
+    renditions = {'source': cover_name}
+
+    with default_storage.open(cover_name) as cover_file:
+        with Image.open(cover_file) as original:
+            original = ImageOps.exif_transpose(original).convert('RGB')
+            original_width, original_height = original.size
+
+            sizes = {}
+            for rendition, width in sorted(
+                settings.COVER_RENDITIONS.items(), key=lambda item: item[1]
+            ):
+                if width >= original_width:
+                    sizes[ORIGINAL_RENDITION] = original_width
+                elif width not in sizes.values():
+                    sizes[rendition] = width
+
+            for rendition, width in sizes.items():
+                height = round((width * original_height) / original_width)
+                image = original.resize((width, height), Image.LANCZOS)
+                renditions[rendition] = {'width': width}
+
+                for extension, save_kwargs in FORMATS.items():
+                    name = rendition_name(cover_name, rendition, extension)
+                    full_path = default_storage.path(name)
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    image.save(full_path, **save_kwargs)
+                    renditions[rendition][extension] = name
+
+    return renditions
+
+
+def rendition_names(renditions):
+    '''
+    Caminhos dos arquivos de um `Recipe.cover_renditions`.
+    '''
+    return [
+        rendition[extension]
+        for rendition in (renditions or {}).values()
+        if isinstance(rendition, dict)
+        for extension in FORMATS if extension in rendition
+    ]
+
+
+def cover_file_names(cover_name, renditions=None):
+    '''
+    Caminhos da capa e das suas versões: as de `settings.COVER_RENDITIONS` e a `original`, que saem do nome da capa mesmo sem o `cover_renditions` atualizado, e as que estiverem no `renditions`.
+    '''
+    if not cover_name:
+        return rendition_names(renditions)
+    names = [cover_name] + [
+        rendition_name(cover_name, rendition, extension)
+        for rendition in [*settings.COVER_RENDITIONS, ORIGINAL_RENDITION]
+        for extension in FORMATS
+    ]
+    return list(dict.fromkeys(names + rendition_names(renditions)))
+
+
+def delete_renditions(renditions):
+    for name in rendition_names(renditions):
+        try:
+            default_storage.delete(name)
+        except FileNotFoundError:
+            ...
+
+
+def process_cover(recipe_id):
+    '''
+    Gera as versões da capa atual da receita. Se a capa mudar enquanto as versões são geradas, o resultado é descartado.
+    '''
+    from recipes.models import Recipe
+
+    cover_name = Recipe.objects.filter(
+        pk=recipe_id
+    ).values_list('cover', flat=True).first()
+
+    if not cover_name:
+        return None
+
+    try:
+        renditions = make_renditions(cover_name)
+    except OSError:
+        logger.exception('Could not process cover %s', cover_name)
+        return None
+
+    # update() não passa pelo save(): não dispara signals nem reagenda o processamento
+    updated = Recipe.objects.filter(
+        pk=recipe_id, cover=cover_name
+    ).update(cover_renditions=renditions)
+
+    if not updated:
+        delete_renditions(renditions)
+        return None
+
+    # sem signals: troca a versão da receita para o ETag da página mudar junto com o srcset
+    bump_versions(f'recipe:{recipe_id}')
+    return renditions
+
+
+def _process_cover_in_worker(recipe_id):
+    # cada thread do pool tem a sua conexão: trata a tarefa como uma requisição
+    close_old_connections()
+    try:
+        return process_cover(recipe_id)
+    except Exception:
+        logger.exception('Cover processing failed for recipe %s', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_cover_processing(recipe_id):
+    '''
+    Agenda o processamento da capa para depois do commit da transação atual.
+    '''
+    def submit():
+        if settings.COVER_PROCESSING_WORKERS:
+            get_executor().submit(_process_cover_in_worker, recipe_id)
+        else:
+            process_cover(recipe_id)
+
+    transaction.on_commit(submit)
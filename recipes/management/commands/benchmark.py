@@ -0,0 +1,108 @@
+import json
+
+from django.db import transaction
+from django.core.management.base import BaseCommand
+
+from benchmarks.data import SyntheticData
+from benchmarks.runner import SCENARIOS, build_endpoints, isolated_cache, run
+
+
+class Rollback(Exception):
+    ...
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos (usuários, categorias, tags e receitas) e mede '
+        'home, categoria, tag, busca, detalhe e APIs v1/v2: p50/p95/p99, '
+        'queries por requisição e pico de memória, em JSON. Por padrão os '
+        'dados são gerados numa transação desfeita no final, e o cache usado '
+        'é o alias "benchmark", não o do site.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=10_000)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Limpa o cache antes de cada requisição.',
+        )
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=['endpoints', *SCENARIOS],
+            help=(
+                'O que medir (pode repetir; padrão: endpoints). api_cache: '
+                'latência com e sem o cache de respostas da API v2. cards: '
+                'render da home com 6 e 100 cards, com e sem o cache do card. '
+                'server_timing: latência com o Server-Timing ligado e '
+                'desligado.'
+            ),
+        )
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Arquivo do relatório JSON (padrão: saída padrão).',
+        )
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            '--keep', action='store_true',
+            help='Grava os dados gerados (para repetir com --existing-data).',
+        )
+        group.add_argument(
+            '--existing-data', action='store_true',
+            help='Não gera dados, mede o banco como está.',
+        )
+
+    def handle(self, *args, **options):
+        if options['existing_data']:
+            report = self.benchmark(options, dataset=None)
+        elif options['keep']:
+            with transaction.atomic():
+                dataset = self.generate(options)
+            report = self.benchmark(options, dataset)
+        else:
+            # os signals da geração também mexem no cache: nada dos dados
+            # desfeitos pode sobrar no cache do site
+            try:
+                with isolated_cache(), transaction.atomic():
+                    report = self.benchmark(options, self.generate(options))
+                    raise Rollback()
+            except Rollback:
+                ...
+
+        content = json.dumps(report, indent=2) + '\n'
+        if options['output'] == '-':
+            self.stdout.write(content, ending='')
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(content)
+
+    def generate(self, options):
+        data = SyntheticData(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stderr.write,
+        )
+        return data.generate(
+            users=options['users'],
+            categories=options['categories'],
+            tags=options['tags'],
+            recipes=options['recipes'],
+            tags_per_recipe=options['tags_per_recipe'],
+        )
+
+    def benchmark(self, options, dataset):
+        return run(
+            build_endpoints(seed=options['seed']),
+            requests=options['requests'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            dataset=dataset,
+            scenarios=options['scenarios'] or ['endpoints'],
+        )
@@ -0,0 +1,78 @@
+import random
+import time
+from array import array
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.related import SimilarityIndex
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o cálculo das receitas parecidas em receitas sintéticas só em '
+        'memória (tags com frequência de Zipf, sem banco de dados).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500_000)
+        parser.add_argument('--tags', type=int, default=5_000)
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--max-tags', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--max-postings', type=int, default=None,
+            help='Padrão: RELATED_RECIPES_MAX_POSTINGS.',
+        )
+
+    def make_recipes(self, rng, options):
+        tags = range(1, options['tags'] + 1)
+        weights = list(accumulate(1 / rank for rank in tags))
+        categories = range(1, options['categories'] + 1)
+
+        tag_indptr, tag_indices, category_ids = array('q', [0]), array('q'), []
+        for _ in range(options['recipes']):
+            tag_indices.extend(sorted(set(rng.choices(
+                tags, cum_weights=weights,
+                k=rng.randint(1, options['max_tags']),
+            ))))
+            tag_indptr.append(len(tag_indices))
+            # algumas receitas sem categoria, como no site
+            category_ids.append(
+                rng.choice(categories) if rng.random() > 0.1 else None
+            )
+        return category_ids, tag_indptr, tag_indices
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        total = options['recipes']
+        category_ids, tag_indptr, tag_indices = self.make_recipes(rng, options)
+
+        start = time.perf_counter()
+        index = SimilarityIndex(
+            range(1, total + 1), category_ids, tag_indptr, tag_indices,
+            max_postings=options['max_postings'],
+        )
+        built = time.perf_counter()
+        self.stdout.write(
+            f'{total} recipes, {len(tag_indices)} tag links, '
+            f'max_postings={index.max_postings}: index built in '
+            f'{built - start:.2f}s'
+        )
+
+        stored = settings.RELATED_RECIPES_STORED
+        batch_size = settings.RELATED_RECIPES_BATCH_SIZE
+        neighbours = 0
+        for batch_start in range(0, total, batch_size):
+            for _, recipe_ids, _ in index.related(
+                range(batch_start, min(batch_start + batch_size, total)),
+                stored,
+            ):
+                neighbours += len(recipe_ids)
+        elapsed = time.perf_counter() - built
+        self.stdout.write(
+            f'top-{stored} of every recipe in {elapsed:.2f}s '
+            f'({elapsed / total * 1_000_000:.0f}us per recipe, '
+            f'{neighbours / total:.1f} neighbours on average)'
+        )
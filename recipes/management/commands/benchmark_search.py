@@ -0,0 +1,112 @@
+import random
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import Recipe
+from recipes.search import get_search_backend
+
+SYLLABLES = (
+    'ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo fu ga ge gi '
+    'go gu la le li lo lu ma me mi mo mu na ne ni no nu pa pe pi po pu ra '
+    're ri ro ru sa se si so su ta te ti to tu va ve vi vo vu'
+).split()
+
+
+class Rollback(Exception):
+    ...
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a busca indexada com o antigo icontains em receitas '
+        'sintéticas. Tudo roda numa transação que é desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+
+    def make_vocabulary(self, rng, size):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+        return sorted(words)
+
+    def make_text(self, rng, size):
+        # Palavras com frequência de Zipf, como em texto real
+        return ' '.join(rng.choices(self.words, cum_weights=self.weights, k=size))
+
+    def time_query(self, queryset, repeat):
+        '''
+        Mesmo trabalho da página de busca: COUNT(*) do Paginator + primeira página.
+        '''
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset.count()
+            list(queryset.values_list('id', flat=True)[:9])
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        total = options['recipes']
+        backend = get_search_backend()
+        self.words = self.make_vocabulary(rng, options['vocabulary'])
+        self.weights = list(accumulate(
+            1 / rank for rank in range(1, len(self.words) + 1)
+        ))
+
+        try:
+            with transaction.atomic():
+                start = Recipe.objects.order_by('-id').values_list(
+                    'id', flat=True).first() or 0
+                Recipe.objects.bulk_create((
+                    Recipe(
+                        # títulos são únicos (recipe_title_lower_uniq)
+                        title=f'{self.make_text(rng, 3)[:50]} {start + i}',
+                        description=self.make_text(rng, 12)[:165],
+                        slug=f'benchmark-search-{start + i}',
+                        preparation_steps=self.make_text(rng, 60),
+                        is_published=True,
+                    )
+                    for i in range(total)
+                ), batch_size=2000)
+
+                index_start = time.perf_counter()
+                backend.rebuild()
+                self.stdout.write(
+                    f'{total} recipes indexed in '
+                    f'{time.perf_counter() - index_start:.2f}s'
+                )
+
+                published = Recipe.objects.filter(is_published=True)
+                terms = (
+                    self.words[10],
+                    self.words[500],
+                    self.words[5000],
+                    f'{self.words[50]} {self.words[300]}',
+                )
+                for term in terms:
+                    icontains = published.filter(
+                        Q(title__icontains=term) |
+                        Q(description__icontains=term)
+                    ).order_by('-id')
+                    indexed = backend.search(published, term)
+                    self.stdout.write(
+                        f'"{term}": icontains '
+                        f'{self.time_query(icontains, options["repeat"]):.1f}ms '
+                        f'({icontains.count()} hits), '
+                        f'{type(backend).__name__} '
+                        f'{self.time_query(indexed, options["repeat"]):.1f}ms '
+                        f'({indexed.count()} hits)'
+                    )
+                raise Rollback()
+        except Rollback:
+            ...
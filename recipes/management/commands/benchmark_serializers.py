@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from tag.models import Tag, normalize_tag_name
+
+from recipes.models import Recipe
+from recipes.serializers import RecipeFastSerializer, RecipeSerializer
+from recipes.views.api import RecipeAPIv2ViewSet
+
+
+class Rollback(Exception):
+    ...
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara o RecipeSerializer com o RecipeFastSerializer numa página de '
+        'receitas sintéticas com tags. Tudo roda numa transação que é '
+        'desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def measure(self, serialize, rounds):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            serialize()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def handle(self, *args, **options):
+        total = options['recipes']
+        try:
+            with transaction.atomic():
+                start = Recipe.objects.order_by('-id').values_list(
+                    'id', flat=True).first() or 0
+                recipes = Recipe.objects.bulk_create(
+                    Recipe(
+                        title=f'Benchmark serializer {start + i}',
+                        slug=f'benchmark-serializer-{start + i}',
+                        description='Descrição', preparation_time=10,
+                        preparation_time_unit='Minutos', servings=2,
+                        servings_unit='Porções', preparation_steps='Passos',
+                        is_published=True,
+                    )
+                    for i in range(total)
+                )
+                tags = Tag.objects.bulk_create(
+                    Tag(
+                        name=f'Benchmark serializer {start} {i}',
+                        normalized_name=normalize_tag_name(
+                            f'Benchmark serializer {start} {i}'
+                        ),
+                        slug=f'benchmark-serializer-{start}-{i}',
+                    )
+                    for i in range(options['tags'])
+                )
+                Recipe.tags.through.objects.bulk_create(
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+                    for index, recipe in enumerate(recipes)
+                    for tag in {
+                        tags[(index + offset) % len(tags)]
+                        for offset in range(options['tags_per_recipe'])
+                    }
+                )
+
+                # sem requisição os links saem relativos nos dois serializers
+                context = {'request': None}
+                queryset = RecipeAPIv2ViewSet.queryset.filter(
+                    pk__in=[recipe.pk for recipe in recipes]
+                )
+                current = self.measure(lambda: RecipeSerializer(
+                    queryset.all(), many=True, context=context
+                ).data, options['rounds'])
+                fast = self.measure(lambda: RecipeFastSerializer(
+                    RecipeFastSerializer.get_queryset(queryset),
+                    many=True, context=context,
+                ).data, options['rounds'])
+
+                self.stdout.write(
+                    f'Serialize {total} recipes: RecipeSerializer '
+                    f'{current:.1f}ms, RecipeFastSerializer {fast:.1f}ms '
+                    f'({current / fast:.1f}x)'
+                )
+                raise Rollback()
+        except Rollback:
+            ...
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.related import refresh_related_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula as receitas parecidas das receitas com tags, categoria ou '
+        'publicação alteradas e das publicadas ainda sem lista. Com --full '
+        'recalcula todas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = refresh_related_recipes(
+            full=options['full'], batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{result["computed"]} of {result["recipes"]} published recipes '
+            f'recomputed, {result["neighbours"]} neighbour lists updated, '
+            f'{result["deleted"]} removed in '
+            f'{time.perf_counter() - start:.2f}s'
+        ))
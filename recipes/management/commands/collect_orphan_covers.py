@@ -0,0 +1,93 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.media import OrphanCovers, media_deleter
+
+
+class Command(BaseCommand):
+    help = (
+        'Procura os arquivos de capas (e versões) em MEDIA_ROOT que nenhuma '
+        'receita usa. Sem --delete só mostra o relatório (dry-run).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Apaga os arquivos órfãos (sem a opção é um dry-run).',
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help=(
+                'Ignora arquivos modificados há menos de N horas (uploads '
+                'de transações ainda abertas). Padrão: 24.'
+            ),
+        )
+        parser.add_argument(
+            '--max-rate', type=float, default=100,
+            help='Máximo de arquivos apagados por segundo (0 = sem limite).',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        delete, max_rate = options['delete'], options['max_rate']
+        cutoff = time.time() - options['min_age'] * 3600
+        orphans = OrphanCovers(chunk_size=options['chunk_size'])
+
+        found = recent = size = deleted = failed = 0
+        batch = []
+        batch_size = settings.MEDIA_DELETION_BATCH_SIZE
+        if max_rate:
+            # lotes de no máximo um segundo de remoções
+            batch_size = max(1, min(batch_size, int(max_rate)))
+
+        def flush():
+            nonlocal deleted, failed
+            if not batch:
+                return
+            batch_start = time.perf_counter()
+            failures = media_deleter.delete(batch)
+            deleted += len(batch) - len(failures)
+            failed += len(failures)
+            if max_rate:
+                # cada lote leva pelo menos len(batch) / max_rate segundos
+                wait = len(batch) / max_rate - (
+                    time.perf_counter() - batch_start
+                )
+                if wait > 0:
+                    time.sleep(wait)
+            batch.clear()
+
+        for name in orphans:
+            try:
+                stat = os.stat(os.path.join(settings.MEDIA_ROOT, name))
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                recent += 1
+                continue
+
+            found += 1
+            size += stat.st_size
+            if options['verbosity'] >= 2:
+                self.stdout.write(name)
+            if delete:
+                batch.append(name)
+                if len(batch) >= batch_size:
+                    flush()
+        flush()
+
+        summary = (
+            f'{orphans.scanned} files scanned, {found} orphans '
+            f'({size / 1024 / 1024:.1f} MiB), {recent} recent files skipped'
+        )
+        if delete:
+            summary += f', {deleted} deleted, {failed} failed'
+        else:
+            summary += ' (dry-run: use --delete to remove them)'
+        self.stdout.write(self.style.SUCCESS(
+            f'{summary} in {time.perf_counter() - start:.2f}s'
+        ))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.export import EXPORT_CHUNK_SIZE, iter_ndjson, parse_updated_since
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta as receitas publicadas em NDJSON (mesmos campos da API v2), '
+        'uma receita por linha.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Arquivo de saída (padrão: saída padrão).',
+        )
+        parser.add_argument(
+            '--updated-since',
+            help='Só receitas alteradas a partir desta data (ISO 8601).',
+        )
+        parser.add_argument(
+            '--base-url', default='',
+            help='Prefixo das URLs de tags e capas, ex.: https://example.com',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        updated_since = None
+        if options['updated_since']:
+            try:
+                updated_since = parse_updated_since(options['updated_since'])
+            except ValueError as error:
+                raise CommandError(error)
+
+        lines = iter_ndjson(
+            {'base_url': options['base_url']},
+            updated_since,
+            options['chunk_size'],
+        )
+
+        if options['output'] == '-':
+            total = self.write(lines, self.stdout)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                total = self.write(lines, output)
+
+        self.stderr.write(f'{total} recipes exported')
+
+    def write(self, lines, output):
+        total = 0
+        for line in lines:
+            output.write(line)
+            total += 1
+        return total
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import process_cover
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera as versões das capas que ainda não foram processadas '
+        '(ou de todas, com --all).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Reprocessa todas as capas, não só as pendentes.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(cover='').only(
+            'id', 'cover', 'cover_renditions'
+        ).order_by('id')
+        processed = 0
+
+        for recipe in recipes.iterator(chunk_size=500):
+            if not options['all'] and not recipe.cover_needs_processing:
+                continue
+            if process_cover(recipe.pk) is not None:
+                processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{processed} covers processed'))
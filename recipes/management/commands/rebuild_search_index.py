@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual das receitas.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            backend.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{type(backend).__name__}: {Recipe.objects.count()} recipes '
+            f'indexed in {time.perf_counter() - start:.2f}s'
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.counters import reconcile_category_counts, reconcile_tag_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula os contadores de receitas publicadas por tag e por '
+        'categoria e corrige os que desviaram (escritas que não passam '
+        'pelos signals, como QuerySet.update()).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        tags = reconcile_tag_counts(chunk_size=options['chunk_size'])
+        categories = reconcile_category_counts(
+            chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{tags} tag counters and {categories} category counters fixed '
+            f'in {time.perf_counter() - start:.2f}s'
+        ))
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from recipes.cache import bump_versions
+from recipes.models import Recipe
+from recipes.search import get_search_backend
+from recipes.signals import recipe_scopes
+
+
+class Command(BaseCommand):
+    help = (
+        'Renomeia as receitas com título repetido (sem diferenciar '
+        'maiúsculas), exigido pela migração recipes.0011: a mais antiga fica '
+        'com o título e as outras ganham um sufixo " (2)", " (3)"... Lista '
+        'cada receita renomeada.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Só lista o que seria renomeado.',
+        )
+
+    def renames(self):
+        '''
+        `[(id, título, título novo)]` das receitas repetidas, em ordem de id.
+        '''
+        max_length = Recipe._meta.get_field('title').max_length
+        # só id e título: roda antes das migrações seguintes à 0010
+        rows = Recipe.objects.annotate(
+            title_lower=Lower('title')
+        ).order_by('id').values_list('id', 'title', 'title_lower')
+
+        taken, duplicates = set(), []
+        for pk, title, title_lower in rows.iterator():
+            if title_lower in taken:
+                duplicates.append((pk, title))
+            taken.add(title_lower)
+
+        renames = []
+        for pk, title in duplicates:
+            number = 2
+            while True:
+                suffix = f' ({number})'
+                new_title = title[:max_length - len(suffix)] + suffix
+                if new_title.lower() not in taken:
+                    break
+                number += 1
+            taken.add(new_title.lower())
+            renames.append((pk, title, new_title))
+        return renames
+
+    def handle(self, *args, **options):
+        renames = self.renames()
+        for pk, title, new_title in renames:
+            self.stdout.write(f'{pk}: {title!r} -> {new_title!r}')
+
+        if options['dry_run'] or not renames:
+            self.stdout.write(f'{len(renames)} recipes to rename')
+            return
+
+        recipe_ids = [pk for pk, _, _ in renames]
+        with transaction.atomic():
+            for pk, _, new_title in renames:
+                Recipe.objects.filter(pk=pk).update(title=new_title)
+            # update() não passa pelos signals do índice de busca e do cache
+            get_search_backend().index_recipes(recipe_ids)
+            bump_versions(*recipe_scopes(recipe_ids))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(renames)} recipes renamed'
+        ))
@@ -0,0 +1,251 @@
+'''
+Remoção dos arquivos de mídia das receitas fora da requisição.
+
+Os signals de `Recipe` pegam os caminhos antigos (capa e versões) dos valores carregados do banco, sem outra query, e chamam `schedule_cover_deletion`. Os arquivos só são apagados depois do commit: num rollback a receita continua apontando para arquivos que existem.
+
+Depois do commit os caminhos entram na fila de uma thread em segundo plano, que apaga em lotes de até `MEDIA_DELETION_BATCH_SIZE` arquivos e tenta de novo (`MEDIA_DELETION_RETRIES` vezes) os que falharem. Com `MEDIA_DELETION_IN_BACKGROUND` desligado os arquivos são apagados no próprio `on_commit`.
+
+Se o processo morrer com caminhos na fila, os arquivos ficam órfãos no storage. Esses arquivos, e os de receitas apagadas em lote (o `QuerySet.delete()` de SQL puro não passa pelos signals), são encontrados por `OrphanCovers` (`manage.py collect_orphan_covers`).
+'''
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.db.models.functions import Collate
+
+from recipes.images import RENDITIONS_DIR, cover_file_names
+
+logger = logging.getLogger(__name__)
+
+
+def file_name(value):
+    '''
+    Caminho de um `FieldFile` ou do valor cru do campo (como vem do banco).
+    '''
+    return getattr(value, 'name', value) or ''
+
+
+class MediaDeleter:
+    def __init__(self, storage=None):
+        self.storage = storage
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get_storage(self):
+        return self.storage or default_storage
+
+    def schedule(self, names, using=None):
+        '''
+        Agenda a remoção dos arquivos para depois do commit da transação atual.
+        '''
+        names = [name for name in names if name]
+        if names:
+            transaction.on_commit(lambda: self.submit(names), using=using)
+
+    def submit(self, names):
+        if not settings.MEDIA_DELETION_IN_BACKGROUND:
+            self.delete(names)
+            return
+
+        for name in names:
+            self.queue.put(name)
+        self._ensure_thread()
+
+    def delete(self, names):
+        '''
+        Apaga os arquivos, tentando de novo os que falharem. Retorna os que continuaram falhando.
+        '''
+        pending = list(names)
+        for attempt in range(settings.MEDIA_DELETION_RETRIES + 1):
+            if attempt:
+                time.sleep(settings.MEDIA_DELETION_RETRY_DELAY * attempt)
+            pending = [name for name in pending if not self._delete(name)]
+            if not pending:
+                break
+
+        for name in pending:
+            logger.error('Could not delete media file %s', name)
+        return pending
+
+    def _delete(self, name):
+        try:
+            # FileSystemStorage.delete já ignora arquivos que não existem
+            self.get_storage().delete(name)
+        except OSError:
+            logger.warning('Media file deletion failed: %s', name, exc_info=True)
+            return False
+        return True
+
+    def wait(self):
+        '''
+        Bloqueia até a fila esvaziar (testes e desligamento do processo).
+        '''
+        self.queue.join()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='media-deletion', daemon=True
+                )
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        while len(batch) < settings.MEDIA_DELETION_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.delete(batch)
+            except Exception:
+                logger.exception('Media deletion batch failed')
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+media_deleter = MediaDeleter()
+
+
+def schedule_cover_deletion(cover, renditions=None, using=None):
+    '''
+    Agenda a remoção da capa e de todas as suas versões.
+    '''
+    media_deleter.schedule(
+        cover_file_names(file_name(cover), renditions), using=using
+    )
+
+
+COVERS_DIR = 'recipes/covers'
+
+# collation em que o ORDER BY dos caminhos fica na ordem do Python (bytes UTF-8)
+BINARY_COLLATIONS = {'postgresql': 'C', 'sqlite': 'BINARY'}
+
+
+def walk_files(root, relative_to):
+    '''
+    Caminhos dos arquivos dentro de `root`, relativos a `relative_to` e com `/`, em ordem lexicográfica. Lê um diretório por vez com `os.scandir`: só os nomes de um diretório ficam em memória.
+
+    Os diretórios são ordenados como `nome/`, para `capa/...` vir depois de `capa-2.jpg`, como na comparação dos caminhos inteiros.
+    '''
+    try:
+        with os.scandir(root) as entries:
+            children = sorted(
+                (entry.name + '/', entry.path) if entry.is_dir(
+                    follow_symlinks=False
+                ) else (entry.name, entry.path)
+                for entry in entries
+                if entry.is_dir(follow_symlinks=False)
+                or entry.is_file(follow_symlinks=False)
+            )
+    except FileNotFoundError:
+        return
+
+    for name, path in children:
+        if name.endswith('/'):
+            yield from walk_files(path, relative_to)
+        else:
+            yield PurePosixPath(
+                *os.path.relpath(path, relative_to).split(os.sep)
+            ).as_posix()
+
+
+class OrphanCovers:
+    '''
+    Itera pelos arquivos de `MEDIA_ROOT/recipes/covers/` que nenhuma receita usa, sem carregar a lista de arquivos nem a de capas inteiras:
+
+    - as capas: merge dos arquivos (`walk_files`, em ordem) com os `Recipe.cover` lidos do banco na mesma ordem, em lotes de `chunk_size` (`cover > último`);
+    - as versões (`recipes/covers/renditions/<data>/`): comparadas com os nomes gerados pelas capas do dia correspondente (`cover_file_names`), um diretório por vez.
+
+    `scanned` conta os arquivos lidos.
+    '''
+    def __init__(self, root=None, chunk_size=2000, using=None):
+        self.root = str(root or settings.MEDIA_ROOT)
+        self.chunk_size = chunk_size
+        self.using = using
+        self.scanned = 0
+        self._rendition_dir = None
+        self._rendition_names = set()
+
+    def get_queryset(self):
+        from recipes.models import Recipe
+        using = self.using or router.db_for_read(Recipe)
+        return Recipe.objects.using(using).exclude(cover='')
+
+    def referenced_covers(self):
+        queryset = self.get_queryset()
+        collation = BINARY_COLLATIONS.get(
+            connections[queryset.db].vendor
+        )
+        if collation:
+            queryset = queryset.annotate(cover_key=Collate('cover', collation))
+        else:
+            queryset = queryset.annotate(cover_key=F('cover'))
+
+        last = ''
+        while True:
+            chunk = list(queryset.filter(cover_key__gt=last).order_by(
+                'cover_key'
+            ).values_list('cover', flat=True)[:self.chunk_size])
+            yield from chunk
+            if len(chunk) < self.chunk_size:
+                return
+            last = chunk[-1]
+
+    def rendition_referenced(self, name):
+        directory = PurePosixPath(name).parent
+        if directory != self._rendition_dir:
+            self._rendition_dir = directory
+            self._rendition_names = self.rendition_names(
+                directory.relative_to(RENDITIONS_DIR).parts
+            )
+        return name in self._rendition_names
+
+    def rendition_names(self, date_parts):
+        # mesma regra do `recipes.images.rendition_name`: recipes/covers/<data>/capa -> renditions/<data>/
+        queryset = self.get_queryset()
+        if date_parts:
+            queryset = queryset.filter(
+                cover__startswith=f'{COVERS_DIR}/{"/".join(date_parts)}/'
+            )
+        else:
+            queryset = queryset.exclude(cover__regex=r'^[^/]*/[^/]*/[^/]*/')
+
+        names = set()
+        for cover, renditions in queryset.values_list(
+            'cover', 'cover_renditions'
+        ).iterator(chunk_size=self.chunk_size):
+            names.update(cover_file_names(cover, renditions))
+        return names
+
+    def __iter__(self):
+        covers = self.referenced_covers()
+        current = next(covers, None)
+        renditions_prefix = RENDITIONS_DIR + '/'
+
+        for name in walk_files(os.path.join(self.root, COVERS_DIR), self.root):
+            self.scanned += 1
+            if name.startswith(renditions_prefix):
+                if not self.rendition_referenced(name):
+                    yield name
+                continue
+
+            while current is not None and current < name:
+                current = next(covers, None)
+            if current != name:
+                yield name
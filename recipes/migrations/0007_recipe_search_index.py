@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from recipes.search import get_search_backend
+    get_search_backend(schema_editor.connection).install(schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from recipes.search import get_search_backend
+    get_search_backend(schema_editor.connection).uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_alter_recipe_preparation_time_alter_recipe_servings'),
+        ('tag', '0002_remove_tag_content_type_remove_tag_object_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
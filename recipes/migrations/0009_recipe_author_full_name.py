@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 03:14
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+
+
+def fill_author_full_name(apps, schema_editor):
+    # mesmo valor do antigo annotate de RecipeManager.get_published; em
+    # tabelas grandes pode ser refeito em lotes com `manage.py backfill_author_names`
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('auth', 'User')
+    names = User.objects.filter(pk=OuterRef('author_id')).annotate(
+        name=Concat(
+            F('first_name'), Value(' '),
+            F('last_name'), Value(' ('),
+            F('username'), Value(')'),
+        )
+    ).values('name')
+    Recipe.objects.update(
+        author_full_name=Coalesce(Subquery(names), Value('  ()'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0008_recipe_cover_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='author_full_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=455),
+        ),
+        migrations.RunPython(fill_author_full_name, migrations.RunPython.noop),
+    ]
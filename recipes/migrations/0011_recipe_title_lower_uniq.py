@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 04:08
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+import django.db.models.functions.text
+
+
+def check_duplicate_titles(apps, schema_editor):
+    # o índice único não é criado com títulos repetidos; em vez de renomear
+    # receitas sem avisar, a migração para e lista os conflitos, que são
+    # resolvidos com `manage.py resolve_duplicate_titles`
+    Recipe = apps.get_model('recipes', 'Recipe')
+    rows = Recipe.objects.annotate(
+        title_lower=Lower('title')
+    ).order_by('id').values_list('id', 'title_lower')
+
+    groups = {}
+    for pk, title_lower in rows.iterator():
+        groups.setdefault(title_lower, []).append(pk)
+    conflicts = [ids for ids in groups.values() if len(ids) > 1]
+    if conflicts:
+        raise RuntimeError(
+            'Receitas com o mesmo título (ids): '
+            + '; '.join(', '.join(map(str, ids)) for ids in conflicts)
+            + '. Rode `python manage.py resolve_duplicate_titles` e migre '
+            'de novo.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            check_duplicate_titles, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('title'), name='recipe_title_lower_uniq'),
+        ),
+    ]
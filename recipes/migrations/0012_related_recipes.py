@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 04:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_title_lower_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedRecipes',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='related_recipes', serialize=False, to='recipes.recipe')),
+                ('recipe_ids', models.JSONField(default=list)),
+                ('scores', models.JSONField(default=list)),
+                ('stale', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='relatedrecipes',
+            index=models.Index(condition=models.Q(('stale', True)), fields=['recipe'], name='related_recipes_stale_idx'),
+        ),
+    ]
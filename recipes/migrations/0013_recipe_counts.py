@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-18 05:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def count_published_recipes(apps, schema_editor):
+    # contagem inicial; depois os signals mantêm e o reconcile_recipe_counts corrige
+    Tag = apps.get_model('tag', 'Tag')
+    Category = apps.get_model('recipes', 'Category')
+    TagRecipeCount = apps.get_model('recipes', 'TagRecipeCount')
+    CategoryRecipeCount = apps.get_model('recipes', 'CategoryRecipeCount')
+    published = Count('recipe', filter=Q(recipe__is_published=True))
+
+    TagRecipeCount.objects.bulk_create((
+        TagRecipeCount(tag_id=pk, name=name, slug=slug, published=count)
+        for pk, name, slug, count in Tag.objects.annotate(
+            count=published
+        ).values_list('id', 'name', 'slug', 'count').iterator()
+    ), batch_size=1000)
+    CategoryRecipeCount.objects.bulk_create((
+        CategoryRecipeCount(category_id=pk, published=count)
+        for pk, count in Category.objects.annotate(
+            count=published
+        ).values_list('id', 'count').iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tag', '0003_tag_normalized_name'),
+        ('recipes', '0012_related_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryRecipeCount',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_count', serialize=False, to='recipes.category')),
+                ('published', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagRecipeCount',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_count', serialize=False, to='tag.tag')),
+                ('name', models.CharField(max_length=255)),
+                ('slug', models.SlugField()),
+                ('published', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tagrecipecount',
+            index=models.Index(condition=models.Q(('published__gt', 0)), fields=['-published', 'name'], name='tag_recipe_count_cloud_idx'),
+        ),
+        migrations.RunPython(
+            count_published_recipes, migrations.RunPython.noop
+        ),
+    ]
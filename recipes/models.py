@@ -1,18 +1,22 @@
-import os
+import copy
 from collections import defaultdict
+from itertools import count
 
-from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import F, Value
-from django.db.models.functions import Concat
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce, Concat, Lower
 from django.forms import ValidationError
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
-from PIL import Image
 from tag.models import Tag
 
+from recipes.cache import RECIPE_TAGS_SCOPE, get_versions
+from recipes.images import schedule_cover_processing
+
 
 class Category(models.Model):
     name = models.CharField(max_length=65)
@@ -20,18 +24,113 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+
+def author_display_name(author):
+    '''
+    Nome do autor como era montado pelo `Concat` das listas: `Nome Sobrenome (usuario)`; sem autor, as partes vazias deixam só `'  ()'`.
+    '''
+    if author is None:
+        return '  ()'
+    return f'{author.first_name} {author.last_name} ({author.username})'
+
+
+def comparable_value(value):
+    # FieldFile é comparado pelo caminho, como o valor que vem do banco
+    return value.name if isinstance(value, FieldFile) else value
+
+
+SLUG_ATTEMPTS = 3
+TITLE_TAKEN_MESSAGE = 'Found recipes with the same title'
+
+
 class RecipeManager(models.Manager):
+    def title_taken(self, title, exclude_pk=None):
+        '''
+        Se outra receita já usa o título, sem diferenciar maiúsculas. Compara `Lower(title)` dos dois lados para usar o índice único `recipe_title_lower_uniq` (o `iexact` vira um `LIKE` no SQLite e não usa o índice).
+        '''
+        return self.annotate(title_lower=Lower('title')).filter(
+            title_lower=Lower(Value(title))
+        ).exclude(pk=exclude_pk).exists()
+
+    def allocate_slug(self, title, exclude_pk=None):
+        '''
+        Primeiro slug livre entre `slug-do-titulo`, `slug-do-titulo-2`, `slug-do-titulo-3`... com uma query só: os slugs ocupados que começam com o slug do título (cortado para caber o sufixo no `max_length`).
+        '''
+        return self.allocate_slugs([title], exclude_pk=exclude_pk)[0]
+
+    def allocate_slugs(self, titles, exclude_pk=None):
+        '''
+        O `allocate_slug` de cada título, com uma query só para a lista inteira. Os slugs já escolhidos na lista também contam como ocupados.
+        '''
+        max_length = self.model._meta.get_field('slug').max_length
+        bases = [
+            slugify(title)[:max_length].strip('-') or 'receita'
+            for title in titles
+        ]
+        if not bases:
+            return []
+        prefixes = Q()
+        # espaço para um sufixo de até 7 caracteres
+        for prefix in {base[:max_length - 8] for base in bases}:
+            prefixes |= Q(slug__startswith=prefix)
+        taken = set(self.filter(prefixes).exclude(
+            pk=exclude_pk
+        ).values_list('slug', flat=True))
+
+        slugs = []
+        for base in bases:
+            slug = base
+            for number in count(2):
+                if slug not in taken:
+                    break
+                suffix = f'-{number}'
+                slug = base[:max_length - len(suffix)].rstrip('-') + suffix
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
     def get_published(self):
         return self.filter(
             is_published=True
-        ).annotate(
-            author_full_name=Concat(
-                F('author__first_name'), Value(' '),
-                F('author__last_name'), Value(' ('),
-                F('author__username'), Value(')'),
-            )
         ).order_by('-id')
 
+    def sync_author_full_name(self, author):
+        '''
+        Atualiza o `author_full_name` de todas as receitas do autor num único UPDATE (só as que estão diferentes).
+        '''
+        name = author_display_name(author)
+        return self.filter(author_id=author.pk).exclude(
+            author_full_name=name
+        ).update(author_full_name=name)
+
+    def backfill_author_full_name(self, batch_size=1000):
+        '''
+        Recalcula o `author_full_name` de todas as receitas em lotes de `batch_size` ids, com o nome vindo de uma subquery em `auth_user`. Retorna quantas receitas foram atualizadas.
+        '''
+        names = User.objects.filter(pk=OuterRef('author_id')).annotate(
+            name=Concat(
+                F('first_name'), Value(' '),
+                F('last_name'), Value(' ('),
+                F('username'), Value(')'),
+            )
+        ).values('name')
+
+        updated, last_pk = 0, 0
+        while True:
+            ids = list(self.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size])
+            if not ids:
+                return updated
+
+            updated += self.filter(pk__in=ids).update(
+                author_full_name=Coalesce(
+                    Subquery(names), Value(author_display_name(None))
+                )
+            )
+            last_pk = ids[-1]
+
+
 class Recipe(models.Model):
     objects = RecipeManager()
     title = models.CharField(max_length=65, verbose_name=_('Title'))
@@ -48,6 +147,9 @@ class Recipe(models.Model):
     is_published = models.BooleanField(default=False)
     cover = models.ImageField(
         upload_to='recipes/covers/%Y/%m/%d/', blank=True, default='')
+    cover_renditions = models.JSONField(
+        default=dict, blank=True, editable=False
+    ) # Versões da capa geradas em segundo plano por recipes.images
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, null=True, blank=True,
         default=None,
@@ -55,64 +157,265 @@ class Recipe(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True
     ) # Category é uma chave estrangeira, o id da categoria é armazenado no campo category_id
+    author_full_name = models.CharField(
+        max_length=455, blank=True, default='', db_index=True, editable=False
+    ) # Cópia de author_display_name(author), mantida pelo save() e pelos signals de User
     tags = models.ManyToManyField(Tag, blank=True, default='')
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {}
+        instance.set_loaded_values(field_names)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        '''
+        Os valores recarregados passam a ser os do banco: sem isso um campo que volta ao valor carregado antes do refresh seria deixado de fora do `update_fields`. Também roda na leitura de um campo adiado.
+        '''
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None:
+            fields = [field.attname for field in self._meta.concrete_fields]
+        self.set_loaded_values(
+            self._meta.get_field(name).attname for name in fields
+        )
+
+    def set_loaded_values(self, attnames):
+        '''
+        Guarda os valores atuais dos campos como os do banco, usados pelos signals e pelo `get_dirty_fields` para saber o que mudou. Os JSONs são copiados, então alterar o dicionário da instância também conta como mudança.
+        '''
+        loaded = getattr(self, '_loaded_values', {})
+        for attname in attnames:
+            if attname in self.__dict__:
+                value = comparable_value(self.__dict__[attname])
+                if isinstance(value, (dict, list)):
+                    value = copy.deepcopy(value)
+                loaded[attname] = value
+        self._loaded_values = loaded
+
+    def get_loaded_value(self, attname, default=None):
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def get_dirty_fields(self):
+        '''
+        Nomes dos campos que mudaram desde que a instância foi carregada (ou salva). Campos adiados que foram atribuídos contam como alterados; sem os valores do banco (instância montada à mão) retorna `None`.
+        '''
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return {
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__ and (
+                field.attname not in loaded
+                or comparable_value(self.__dict__[field.attname])
+                != loaded[field.attname]
+            )
+        }
+
     def get_absolute_url(self):
         return reverse('recipes:recipe', args=(self.id,))
 
-    @staticmethod
-    def resize_image(image, new_width=800):
-        image_full_path = os.path.join(settings.MEDIA_ROOT, image.name)
-        image_pillow = Image.open(image_full_path)
-        original_width, original_height = image_pillow.size
-
-        if original_width <= new_width:
-            image_pillow.close()
-            return
+    @cached_property
+    def cache_version(self):
+        '''
+        Versões `recipe:<pk>` e `recipe:tags` de `recipes.cache`, trocadas pelos signals quando a receita, as tags, a categoria ou o autor mudam. Faz parte da chave do cache do card; as listas preenchem a página toda de uma vez com `set_recipe_cache_versions`.
+        '''
+        return ':'.join(get_versions(f'recipe:{self.pk}', RECIPE_TAGS_SCOPE))
 
-        new_height = round((new_width * original_height) / original_width)
+    def get_cover_srcset(self, extension='jpg'):
+        renditions = self.cover_renditions or {}
+        if not self.cover or renditions.get('source') != self.cover.name:
+            return ''
 
-        new_image = image_pillow.resize((new_width, new_height), Image.LANCZOS)
-        new_image.save(
-            image_full_path,
-            optimize=True,
-            quality=50,
+        return ', '.join(
+            f'{self.cover.storage.url(rendition[extension])} '
+            f'{rendition["width"]}w'
+            for rendition in renditions.values()
+            if isinstance(rendition, dict) and extension in rendition
         )
 
+    @property
+    def cover_srcset(self):
+        return self.get_cover_srcset('jpg')
+
+    @property
+    def cover_webp_srcset(self):
+        return self.get_cover_srcset('webp')
+
+    @property
+    def cover_needs_processing(self):
+        return bool(self.cover) and (
+            self.cover_renditions or {}
+        ).get('source') != self.cover.name
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            slug = f'{slugify(self.title)}'
-            self.slug = slug
+        allocate_slug = not self.slug
+
+        if not self.cover and self.cover_renditions:
+            self.cover_renditions = {}
 
-        saved = super().save(*args, **kwargs) # os *args e **kwargs são usados para passar argumentos e palavras-chave para a função pai.
+        if (
+            self._state.adding or Recipe.author.is_cached(self)
+            or self.author_id != self.get_loaded_value('author_id')
+        ):
+            self.author_full_name = author_display_name(self.author)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'author' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'author_full_name'}
 
-        if self.cover:
+        adding = self._state.adding
+        dirty_fields = None if adding else self.get_dirty_fields()
+        track_changes = (
+            dirty_fields is not None and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert') and not args
+        )
+
+        for attempt in range(1, SLUG_ATTEMPTS + 1):
+            if allocate_slug:
+                self.slug = Recipe.objects.allocate_slug(self.title, self.pk)
+            if track_changes:
+                # UPDATE só das colunas alteradas (e do updated_at, do auto_now)
+                kwargs['update_fields'] = self.get_dirty_fields() | {
+                    'updated_at'
+                }
             try:
-                self.resize_image(self.cover, 840)
-            except FileNotFoundError:
-                ...
+                # savepoint: depois de um IntegrityError a transação de fora continua usável
+                with transaction.atomic(using=kwargs.get('using')):
+                    saved = super().save(*args, **kwargs) # os *args e **kwargs são usados para passar argumentos e palavras-chave para a função pai.
+                break
+            except IntegrityError:
+                # outra requisição salvou o mesmo slug ou título entre a checagem e o INSERT
+                if Recipe.objects.title_taken(self.title, self.pk):
+                    raise ValidationError({'title': [TITLE_TAKEN_MESSAGE]})
+                if not allocate_slug or attempt == SLUG_ATTEMPTS:
+                    raise
+
+        update_fields = kwargs.get('update_fields')
+        saved_fields = [
+            field for field in self._meta.concrete_fields
+            if update_fields is None
+            or field.name in update_fields or field.attname in update_fields
+        ]
+        self.set_loaded_values(field.attname for field in saved_fields)
+
+        cover_changed = adding or (
+            any(field.name == 'cover' for field in saved_fields)
+            and (dirty_fields is None or 'cover' in dirty_fields)
+        )
+        if cover_changed and self.cover_needs_processing:
+            # As versões da capa são geradas fora da requisição, depois do commit
+            schedule_cover_processing(self.pk)
 
         return saved
 
     def clean(self, *args, **kwargs):
         error_messages = defaultdict(list)
 
-        recipe_from_db = Recipe.objects.filter(
-            title__iexact=self.title
-        ).first()
-
-        if recipe_from_db:
-            if recipe_from_db.pk != self.pk:
-                error_messages['title'].append(
-                    'Found recipes with the same title'
-                )
+        if self.title and Recipe.objects.title_taken(self.title, self.pk):
+            error_messages['title'].append(TITLE_TAKEN_MESSAGE)
 
         if error_messages:
             raise ValidationError(error_messages)
 
+    def validate_constraints(self, exclude=None):
+        # o título único já é checado no clean(), com o erro no campo `title`
+        return super().validate_constraints(exclude={*(exclude or ()), 'title'})
+
     class Meta:
         verbose_name = _('Recipe')
-        verbose_name_plural = _('Recipes')
\ No newline at end of file
+        verbose_name_plural = _('Recipes')
+        constraints = [
+            # título único sem diferenciar maiúsculas; índice do `title_taken`
+            models.UniqueConstraint(
+                Lower('title'), name='recipe_title_lower_uniq',
+            ),
+        ]
+        indexes = [
+            # home e lista da API v2: publicadas, mais novas primeiro
+            models.Index(
+                fields=['-id'], condition=Q(is_published=True),
+                name='recipe_published_id_idx',
+            ),
+            # página de categoria e `?category_id=`
+            models.Index(
+                fields=['category', '-id'], condition=Q(is_published=True),
+                name='recipe_published_category_idx',
+            ),
+            # `?author_id=` (publicadas) e dashboard (rascunhos do autor)
+            models.Index(
+                fields=['author', '-id'], condition=Q(is_published=True),
+                name='recipe_published_author_idx',
+            ),
+            models.Index(
+                fields=['author', '-id'], condition=Q(is_published=False),
+                name='recipe_draft_author_idx',
+            ),
+        ]
+
+
+class RelatedRecipes(models.Model):
+    '''
+    Receitas mais parecidas com a `recipe`, calculadas fora da requisição por `recipes.related`: ids da mais parecida para a menos e a similaridade de cada uma. `stale` marca as linhas que os signals invalidaram (tags, categoria ou publicação mudaram).
+    '''
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='related_recipes',
+    )
+    recipe_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list)
+    stale = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.recipe_ids}'
+
+    class Meta:
+        indexes = [
+            # recipes.related.refresh_related_recipes: só as linhas invalidadas
+            models.Index(
+                fields=['recipe'], condition=Q(stale=True),
+                name='related_recipes_stale_idx',
+            ),
+        ]
+
+
+class TagRecipeCount(models.Model):
+    '''
+    Quantas receitas publicadas usam a tag, mantido pelos signals (`recipes.counters`). Guarda uma cópia do nome e do slug: a nuvem de tags lê só esta tabela.
+    '''
+    tag = models.OneToOneField(
+        Tag, on_delete=models.CASCADE, primary_key=True,
+        related_name='recipe_count',
+    )
+    name = models.CharField(max_length=255)
+    slug = models.SlugField()
+    published = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.published}'
+
+    class Meta:
+        indexes = [
+            # nuvem de tags: mais usadas primeiro
+            models.Index(
+                fields=['-published', 'name'], condition=Q(published__gt=0),
+                name='tag_recipe_count_cloud_idx',
+            ),
+        ]
+
+
+class CategoryRecipeCount(models.Model):
+    '''
+    Quantas receitas publicadas estão na categoria, mantido pelos signals (`recipes.counters`).
+    '''
+    category = models.OneToOneField(
+        Category, on_delete=models.CASCADE, primary_key=True,
+        related_name='recipe_count',
+    )
+    published = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.category_id}: {self.published}'
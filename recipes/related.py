@@ -0,0 +1,364 @@
+'''
+Receitas relacionadas, calculadas fora da requisição.
+
+Cada receita publicada é um vetor esparso de features, as tags e a categoria, com peso IDF (`log(1 + N / receitas com a feature)`: uma tag que está em todas as receitas ainda conta um pouco; a categoria multiplicada por `RELATED_RECIPES_CATEGORY_WEIGHT`). A similaridade entre duas receitas é o cosseno desses vetores.
+
+`SimilarityIndex` guarda a matriz receita x feature em CSR (`array` de inteiros da biblioteca padrão, `indptr`/`indices`: NumPy e SciPy não são dependências do projeto) e a transposta (as receitas de cada feature, em ordem de id). Os vizinhos de uma receita saem da transposta: só receitas com alguma tag em comum entram na conta (a categoria completa a lista quando há poucas). Numa feature com mais de `RELATED_RECIPES_MAX_POSTINGS` receitas só as mais próximas no id são candidatas; tags raras (as que mais pesam) são sempre percorridas inteiras.
+
+O resultado fica em `RelatedRecipes`, uma linha por receita com os ids em ordem. `refresh_related_recipes` recalcula só as receitas marcadas como `stale` pelos signals (tags, categoria ou publicação mudaram) e as publicadas sem linha; cada receita recalculada também entra nas listas dos seus vizinhos. Uma receita que deixou de ser parecida continua nas listas antigas até elas serem recalculadas: `manage.py build_related_recipes --full` recalcula tudo.
+
+A leitura (`get_related_recipes`) custa duas queries: a linha de `RelatedRecipes` e as receitas publicadas da lista, na ordem guardada.
+'''
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.cache import bump_versions
+from recipes.models import Recipe, RelatedRecipes
+
+RELATED_SCOPE = 'related'
+
+
+def chunked(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class SimilarityIndex:
+    '''
+    `recipe_ids` em ordem crescente, `category_ids[i]` (ou None) e as tags da receita `i` em `tag_indices[tag_indptr[i]:tag_indptr[i + 1]]`.
+    '''
+    def __init__(self, recipe_ids, category_ids, tag_indptr, tag_indices,
+                 max_postings=None, category_weight=None):
+        self.max_postings = (
+            max_postings or settings.RELATED_RECIPES_MAX_POSTINGS
+        )
+        if category_weight is None:
+            category_weight = settings.RELATED_RECIPES_CATEGORY_WEIGHT
+
+        self.recipe_ids = array('q', recipe_ids)
+        total = len(self.recipe_ids)
+
+        # features: tags primeiro (na ordem em que aparecem), depois as categorias
+        self.tag_features = {}
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        for position in range(total):
+            for tag_id in tag_indices[
+                tag_indptr[position]:tag_indptr[position + 1]
+            ]:
+                self.indices.append(self.tag_features.setdefault(
+                    tag_id, len(self.tag_features)
+                ))
+            self.indptr.append(len(self.indices))
+
+        self.category_features = {}
+        self.categories = array('q', [-1]) * total
+        for position, category_id in enumerate(category_ids):
+            if category_id is not None:
+                self.categories[position] = self.category_features.setdefault(
+                    category_id,
+                    len(self.tag_features) + len(self.category_features),
+                )
+
+        self.postings = self.transpose(
+            len(self.tag_features) + len(self.category_features)
+        )
+        weights = [
+            math.log(1 + total / len(postings)) if postings else 0.0
+            for postings in self.postings
+        ]
+        for feature in self.category_features.values():
+            weights[feature] *= category_weight
+        # só o quadrado do peso entra no produto escalar
+        self.squared_weights = [weight * weight for weight in weights]
+
+        self.norms = array('d', (
+            math.sqrt(sum(
+                self.squared_weights[feature]
+                for feature in self.features(position)
+            ))
+            for position in range(total)
+        ))
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def transpose(self, features):
+        '''
+        Receitas (posições, em ordem) de cada feature.
+        '''
+        postings = [array('q') for _ in range(features)]
+        for position in range(len(self.recipe_ids)):
+            for feature in self.features(position):
+                postings[feature].append(position)
+        return postings
+
+    def features(self, position):
+        features = list(
+            self.indices[self.indptr[position]:self.indptr[position + 1]]
+        )
+        if self.categories[position] >= 0:
+            features.append(self.categories[position])
+        return features
+
+    def position(self, recipe_id):
+        position = bisect_left(self.recipe_ids, recipe_id)
+        if (
+            position < len(self.recipe_ids)
+            and self.recipe_ids[position] == recipe_id
+        ):
+            return position
+        return None
+
+    def candidates(self, feature, position):
+        postings = self.postings[feature]
+        if len(postings) <= self.max_postings:
+            return postings
+        # janela de max_postings receitas em volta da própria receita
+        start = bisect_left(postings, position) - self.max_postings // 2
+        start = min(max(start, 0), len(postings) - self.max_postings)
+        return postings[start:start + self.max_postings]
+
+    def neighbours(self, position, count):
+        '''
+        `[(posição, similaridade), ...]` das `count` receitas mais parecidas com a da `position`, da mais parecida para a menos (no empate, a mais nova primeiro).
+        '''
+        norm = self.norms[position]
+        if not norm:
+            return []
+
+        dots = {}
+        get = dots.get
+        squared_weights = self.squared_weights
+        for feature in self.indices[
+            self.indptr[position]:self.indptr[position + 1]
+        ]:
+            weight = squared_weights[feature]
+            for candidate in self.candidates(feature, position):
+                dots[candidate] = get(candidate, 0.0) + weight
+
+        category = self.categories[position]
+        category_weight = 0.0
+        if category >= 0:
+            category_weight = squared_weights[category]
+            if len(dots) <= count:
+                # poucas receitas com tags em comum: completa com a categoria
+                for candidate in self.candidates(category, position):
+                    dots.setdefault(candidate, 0.0)
+
+        dots.pop(position, None)
+        # a categoria entra no produto escalar só aqui, na mesma passada do cosseno;
+        # os `sorted` (em C) saem mais baratos que um `heapq.nlargest` de tuplas
+        candidates = sorted(dots)
+        categories, norms = self.categories, self.norms
+        scores = [
+            (dots[candidate] + category_weight
+             if categories[candidate] == category else dots[candidate])
+            / norms[candidate]
+            for candidate in candidates
+        ]
+        # índices de trás para frente: no empate a ordenação estável deixa a mais nova primeiro
+        best = sorted(
+            range(len(candidates) - 1, -1, -1),
+            key=scores.__getitem__, reverse=True,
+        )[:count]
+        return [
+            (candidates[index], scores[index] / norm)
+            for index in best if scores[index]
+        ]
+
+    def related(self, positions, count):
+        '''
+        `(recipe_id, [ids], [similaridades])` de cada posição.
+        '''
+        recipe_ids = self.recipe_ids
+        for position in positions:
+            neighbours = self.neighbours(position, count)
+            yield (
+                recipe_ids[position],
+                [recipe_ids[candidate] for candidate, _ in neighbours],
+                [round(score, 4) for _, score in neighbours],
+            )
+
+    @classmethod
+    def from_database(cls, **kwargs):
+        '''
+        Índice das receitas publicadas, lido em duas queries em ordem de id (só tuplas, sem instâncias).
+        '''
+        recipes = Recipe.objects.filter(
+            is_published=True
+        ).order_by('id').values_list('id', 'category_id')
+        links = Recipe.tags.through.objects.filter(
+            recipe__is_published=True
+        ).order_by('recipe_id', 'tag_id').values_list('recipe_id', 'tag_id')
+        return cls.from_rows(
+            recipes.iterator(chunk_size=10_000),
+            links.iterator(chunk_size=10_000),
+            **kwargs
+        )
+
+    @classmethod
+    def from_rows(cls, recipes, links, **kwargs):
+        '''
+        `recipes`: `(id, category_id)` e `links`: `(recipe_id, tag_id)`, os dois em ordem de id. As queries não leem o mesmo snapshot: as tags de uma receita publicada entre uma e outra ficam de fora, e ela entra no próximo refresh.
+        '''
+        recipe_ids, category_ids = array('q'), []
+        for recipe_id, category_id in recipes:
+            recipe_ids.append(recipe_id)
+            category_ids.append(category_id)
+
+        tag_indptr, tag_indices = array('q', [0]), array('q')
+        position = 0
+        for recipe_id, tag_id in links:
+            if (
+                position == len(recipe_ids)
+                or recipe_ids[position] != recipe_id
+            ):
+                found = bisect_left(recipe_ids, recipe_id, position)
+                if (
+                    found == len(recipe_ids)
+                    or recipe_ids[found] != recipe_id
+                ):
+                    continue
+                tag_indptr.extend([len(tag_indices)] * (found - position))
+                position = found
+            tag_indices.append(tag_id)
+        while len(tag_indptr) <= len(recipe_ids):
+            tag_indptr.append(len(tag_indices))
+
+        return cls(recipe_ids, category_ids, tag_indptr, tag_indices, **kwargs)
+
+
+def mark_stale(recipe_ids):
+    '''
+    Marca as listas das receitas para serem recalculadas no próximo `refresh_related_recipes`. `recipe_ids` pode ser uma queryset de ids (vira subquery).
+    '''
+    RelatedRecipes.objects.filter(
+        recipe_id__in=recipe_ids, stale=False
+    ).update(stale=True)
+
+
+def insert_into_neighbours(additions, skip, stored, batch_size):
+    '''
+    Coloca cada receita recalculada na lista dos seus vizinhos (`additions`: `{vizinho: {receita: similaridade}}`), se a similaridade couber entre as `stored` maiores. Os vizinhos em `skip` já foram recalculados. Retorna quantas listas mudaram.
+    '''
+    updated = 0
+    for chunk in chunked(sorted(set(additions) - skip), batch_size):
+        rows = []
+        for row in RelatedRecipes.objects.filter(recipe_id__in=chunk):
+            scores = dict(zip(row.recipe_ids, row.scores))
+            scores.update(additions[row.recipe_id])
+            best = heapq.nlargest(
+                stored, scores.items(), key=lambda item: (item[1], item[0])
+            )
+            recipe_ids = [recipe_id for recipe_id, _ in best]
+            if recipe_ids != row.recipe_ids:
+                row.recipe_ids = recipe_ids
+                row.scores = [score for _, score in best]
+                row.updated_at = timezone.now()
+                rows.append(row)
+        RelatedRecipes.objects.bulk_update(
+            rows, ['recipe_ids', 'scores', 'updated_at']
+        )
+        updated += len(rows)
+    return updated
+
+
+def refresh_related_recipes(full=False, batch_size=None):
+    '''
+    Recalcula as listas das receitas `stale` e das publicadas sem lista (ou de todas, com `full`), em lotes de `batch_size` receitas, cada lote gravado numa transação. Apaga as listas das receitas despublicadas. Retorna `{'recipes', 'computed', 'neighbours', 'deleted'}`.
+    '''
+    batch_size = batch_size or settings.RELATED_RECIPES_BATCH_SIZE
+    stored = settings.RELATED_RECIPES_STORED
+
+    # desmarca antes de ler o índice: o que mudar daqui em diante fica para a próxima
+    stale_ids = list(RelatedRecipes.objects.filter(
+        stale=True
+    ).values_list('recipe_id', flat=True))
+    for chunk in chunked(stale_ids, batch_size):
+        RelatedRecipes.objects.filter(recipe_id__in=chunk).update(stale=False)
+
+    try:
+        deleted, _ = RelatedRecipes.objects.filter(
+            recipe__is_published=False
+        ).delete()
+        index = SimilarityIndex.from_database()
+
+        if full:
+            positions = range(len(index))
+        else:
+            missing = Recipe.objects.filter(
+                is_published=True, related_recipes__isnull=True
+            ).values_list('id', flat=True)
+            positions = sorted({
+                position for position in map(
+                    index.position, [*stale_ids, *missing]
+                ) if position is not None
+            })
+
+        computed, additions = set(), defaultdict(dict)
+        related = index.related(positions, stored)
+        for batch in chunked(related, batch_size):
+            with transaction.atomic():
+                RelatedRecipes.objects.bulk_create(
+                    [
+                        RelatedRecipes(
+                            recipe_id=recipe_id, recipe_ids=recipe_ids,
+                            scores=scores,
+                        )
+                        for recipe_id, recipe_ids, scores in batch
+                    ],
+                    update_conflicts=True, unique_fields=['recipe'],
+                    update_fields=['recipe_ids', 'scores', 'updated_at'],
+                )
+            for recipe_id, recipe_ids, scores in batch:
+                computed.add(recipe_id)
+                if not full:
+                    for neighbour, score in zip(recipe_ids, scores):
+                        additions[neighbour][recipe_id] = score
+
+        neighbours = insert_into_neighbours(
+            additions, computed, stored, batch_size
+        )
+    except Exception:
+        mark_stale(stale_ids)
+        raise
+
+    bump_versions(RELATED_SCOPE)
+    return {
+        'recipes': len(index), 'computed': len(computed),
+        'neighbours': neighbours, 'deleted': deleted,
+    }
+
+
+def get_related_recipes(queryset, recipe_id, limit=None):
+    '''
+    As receitas de `queryset` (instâncias ou dicionários de `.values()` com `id`) na ordem da lista guardada de `recipe_id`, no máximo `limit` (`RELATED_RECIPES_COUNT`). Receitas despublicadas ou apagadas depois do cálculo ficam de fora pelo próprio `queryset`.
+    '''
+    limit = limit or settings.RELATED_RECIPES_COUNT
+    recipe_ids = RelatedRecipes.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('recipe_ids', flat=True).first()
+    if not recipe_ids:
+        return []
+
+    recipes = {
+        recipe['id'] if isinstance(recipe, dict) else recipe.pk: recipe
+        for recipe in queryset.filter(pk__in=recipe_ids).order_by()
+    }
+    return [
+        recipes[pk] for pk in recipe_ids if pk in recipes
+    ][:limit]
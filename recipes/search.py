@@ -0,0 +1,248 @@
+'''
+Busca textual de receitas com índice invertido mantido pelo banco.
+
+- SQLite: tabela virtual FTS5 `recipes_recipe_fts` (rowid = id da receita), ranking por `bm25`.
+- PostgreSQL: tabela `recipes_recipe_search` com uma coluna `tsvector` e índice GIN, ranking por `ts_rank`.
+- Outros bancos: `icontains` sem ranking (comportamento antigo, agora incluindo passos e tags).
+
+O documento indexado de cada receita é: título, descrição, modo de preparo e os nomes das tags. Os signals em `recipes/signals.py` mantêm o índice atualizado e o comando `manage.py rebuild_search_index` reconstrói tudo.
+'''
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def split_words(search_term):
+    return WORD_RE.findall(search_term or '')
+
+
+class SearchBackend:
+    vendor = None
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self, schema_editor):
+        ...
+
+    def uninstall(self, schema_editor):
+        ...
+
+    def rebuild(self):
+        ...
+
+    def index_recipes(self, recipe_ids):
+        ...
+
+    def remove_recipes(self, recipe_ids):
+        ...
+
+    def search(self, queryset, search_term):
+        raise NotImplementedError
+
+
+class IcontainsSearchBackend(SearchBackend):
+    def search(self, queryset, search_term):
+        words = split_words(search_term)
+        if not words:
+            return queryset.none()
+
+        for word in words:
+            queryset = queryset.filter(
+                Q(title__icontains=word) |
+                Q(description__icontains=word) |
+                Q(preparation_steps__icontains=word) |
+                Q(tags__name__icontains=word)
+            )
+        return queryset.distinct()
+
+
+class IndexedSearchBackend(SearchBackend):
+    '''
+    Base dos backends com índice: o documento de cada receita é montado com um único `INSERT ... SELECT` agrupando os nomes das tags.
+    '''
+    table = None
+    document_sql = None
+
+    def _execute(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _ids_placeholder(self, recipe_ids):
+        return ', '.join(['%s'] * len(recipe_ids))
+
+    def _chunks(self, recipe_ids, size=500):
+        recipe_ids = list(recipe_ids)
+        for start in range(0, len(recipe_ids), size):
+            yield recipe_ids[start:start + size]
+
+    def rebuild(self):
+        self._execute(f'DELETE FROM {self.table}')
+        self._execute(self.document_sql.format(where=''))
+
+    def remove_recipes(self, recipe_ids):
+        for chunk in self._chunks(recipe_ids):
+            self._execute(
+                f'DELETE FROM {self.table} '
+                f'WHERE {self.id_column} IN ({self._ids_placeholder(chunk)})',
+                chunk,
+            )
+
+    def index_recipes(self, recipe_ids):
+        for chunk in self._chunks(recipe_ids):
+            self.remove_recipes(chunk)
+            self._execute(
+                self.document_sql.format(
+                    where=f'WHERE r.id IN ({self._ids_placeholder(chunk)})'
+                ),
+                chunk,
+            )
+
+
+class SQLiteFTS5SearchBackend(IndexedSearchBackend):
+    vendor = 'sqlite'
+    table = 'recipes_recipe_fts'
+    id_column = 'rowid'
+    # Pesos do bm25 na ordem das colunas: título, descrição, passos, tags
+    weights = (10.0, 4.0, 1.0, 6.0)
+    document_sql = '''
+        INSERT INTO recipes_recipe_fts
+            (rowid, title, description, preparation_steps, tags)
+        SELECT r.id, r.title, r.description, r.preparation_steps,
+            COALESCE((
+                SELECT group_concat(t.name, ' ')
+                FROM recipes_recipe_tags rt
+                INNER JOIN tag_tag t ON t.id = rt.tag_id
+                WHERE rt.recipe_id = r.id
+            ), '')
+        FROM recipes_recipe r
+        {where}
+    '''
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5('
+            'title, description, preparation_steps, tags, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(self.document_sql.format(where=''))
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def make_match_query(self, search_term):
+        # Cada palavra vira um termo de prefixo entre aspas; palavras separadas por espaço são combinadas com AND
+        return ' '.join(f'"{word}"*' for word in split_words(search_term))
+
+    def search(self, queryset, search_term):
+        match = self.make_match_query(search_term)
+        if not match:
+            return queryset.none()
+
+        # `extra(tables=...)` junta a tabela FTS5 na mesma query: o MATCH usa o índice invertido e o bm25 é calculado só para as linhas encontradas
+        weights = ', '.join(str(weight) for weight in self.weights)
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            tables=[self.table],
+            where=[
+                f'{self.table}.rowid = {table}.id',
+                f'{self.table} MATCH %s',
+            ],
+            params=[match],
+            select={'search_rank': f'bm25({self.table}, {weights})'},
+        ).order_by('search_rank', '-id')
+
+
+class PostgreSQLSearchBackend(IndexedSearchBackend):
+    vendor = 'postgresql'
+    table = 'recipes_recipe_search'
+    id_column = 'recipe_id'
+
+    @property
+    def config(self):
+        return getattr(settings, 'RECIPES_SEARCH_CONFIG', 'portuguese')
+
+    @property
+    def document_sql(self):
+        config = self.config
+        return f'''
+            INSERT INTO recipes_recipe_search (recipe_id, document)
+            SELECT r.id,
+                setweight(to_tsvector('{config}', r.title), 'A') ||
+                setweight(to_tsvector('{config}', COALESCE((
+                    SELECT string_agg(t.name, ' ')
+                    FROM recipes_recipe_tags rt
+                    INNER JOIN tag_tag t ON t.id = rt.tag_id
+                    WHERE rt.recipe_id = r.id
+                ), '')), 'B') ||
+                setweight(to_tsvector('{config}', r.description), 'B') ||
+                setweight(to_tsvector('{config}', r.preparation_steps), 'D')
+            FROM recipes_recipe r
+            {{where}}
+        '''
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} ('
+            'recipe_id bigint PRIMARY KEY '
+            'REFERENCES recipes_recipe (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {self.table}_document_gin '
+            f'ON {self.table} USING GIN (document)'
+        )
+        schema_editor.execute(self.document_sql.format(where=''))
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def make_tsquery(self, search_term):
+        # Mesma semântica do SQLite: todas as palavras, cada uma como prefixo
+        return ' & '.join(f'{word}:*' for word in split_words(search_term))
+
+    def search(self, queryset, search_term):
+        tsquery = self.make_tsquery(search_term)
+        if not tsquery:
+            return queryset.none()
+
+        table = queryset.model._meta.db_table
+        query_sql = f"to_tsquery('{self.config}', %s)"
+        return queryset.extra(
+            tables=[self.table],
+            where=[
+                f'{self.table}.recipe_id = {table}.id',
+                f'{self.table}.document @@ {query_sql}',
+            ],
+            params=[tsquery],
+            select={
+                'search_rank':
+                    f'ts_rank({self.table}.document, {query_sql})',
+            },
+            select_params=[tsquery],
+        ).order_by('-search_rank', '-id')
+
+
+BACKENDS = {
+    backend.vendor: backend
+    for backend in (SQLiteFTS5SearchBackend, PostgreSQLSearchBackend)
+}
+
+
+def get_search_backend(using_connection=None):
+    using_connection = using_connection or connection
+    backend_class = BACKENDS.get(
+        using_connection.vendor, IcontainsSearchBackend
+    )
+    return backend_class(using_connection)
+
+
+def search_recipes(queryset, search_term):
+    '''
+    Filtra `queryset` pelo termo de busca, ordenando pela relevância.
+    '''
+    return get_search_backend().search(queryset, search_term)
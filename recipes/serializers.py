@@ -1,10 +1,21 @@
-from recipes.models import Recipe, Category
+from recipes.models import TITLE_TAKEN_MESSAGE, Recipe, Category
 from django.contrib.auth.models import User
-from tag.models import Tag
+from tag.models import TAG_NAME_TAKEN_MESSAGE, Tag, normalize_tag_name
 from rest_framework import serializers
 from collections import defaultdict
 from authors.validators import AuthorRecipeValidator # Validador de entrada de dados para o Recipe
 from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.urls import reverse
+from utils.server_timing import timed
+
+def preparation_text(preparation_time, preparation_time_unit):
+    '''
+    Combina `preparation_time` e `preparation_time_unit` em uma string, indicando o tempo de preparo.
+    '''
+    if preparation_time == 1:
+        return f'{preparation_time} {preparation_time_unit[:-1]}' # O método `[:-1]` remove o último caractere da string.
+    return f'{preparation_time} {preparation_time_unit}'
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,7 +25,30 @@ class CategorySerializer(serializers.ModelSerializer):
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ['id', 'name', 'slug']
+
+    def validate_name(self, name):
+        tags = Tag.objects.filter(normalized_name=normalize_tag_name(name))
+        if self.instance is not None:
+            tags = tags.exclude(pk=self.instance.pk)
+        if tags.exists():
+            raise serializers.ValidationError(TAG_NAME_TAKEN_MESSAGE)
+        return name
+
+    @timed('serializer')
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+class TagBulkUpsertSerializer(serializers.Serializer):
+    '''
+    Entrada do `POST recipes/api/v2/tag/bulk/`: `{"names": [...]}`.
+    '''
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=10_000,
+    )
+
 
 class RecipeSerializer(serializers.ModelSerializer):
     '''
@@ -62,13 +96,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=True
     )
     
+    @timed('serializer')
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
     def preparation_method(self, obj):
-        '''
-        Combina `preparation_time` e `preparation_time_unit` em uma string, indicando o tempo de preparo.
-        '''
-        if obj.preparation_time == 1:
-            return f'{obj.preparation_time} {obj.preparation_time_unit[:-1]}' # O método `[:-1]` remove o último caractere da string.
-        return f'{obj.preparation_time} {obj.preparation_time_unit}'
+        return preparation_text(obj.preparation_time, obj.preparation_time_unit)
     
     def validate(self, dados):
         '''
@@ -80,10 +113,143 @@ class RecipeSerializer(serializers.ModelSerializer):
             
         if self.instance is not None and dados.get('preparation_time') is None:
             dados['preparation_time'] = self.instance.preparation_time
+
+        # O mesmo para o título e a descrição: um PATCH só com `public` também passa pelo AuthorRecipeValidator
+        for field in ('title', 'description'):
+            if self.instance is not None and dados.get(field) is None:
+                dados[field] = getattr(self.instance, field)
         
         super_validate = super().validate(dados)
         AuthorRecipeValidator(
             dados, 
             ErrorClass=serializers.ValidationError
         )
-        return super_validate # Retorna os dados validados.
\ No newline at end of file
+
+        # Mesma regra do Recipe.clean, que o ModelSerializer não chama
+        title = dados.get('title')
+        title_changed = title and title != getattr(self.instance, 'title', None)
+        if title_changed and Recipe.objects.title_taken(
+            title, getattr(self.instance, 'pk', None)
+        ):
+            raise serializers.ValidationError(
+                {'title': [TITLE_TAKEN_MESSAGE]}
+            )
+        return super_validate # Retorna os dados validados.
+
+    def save(self, **kwargs):
+        # O save() da receita levanta o erro do título quando outra requisição salvou o mesmo título depois do validate
+        try:
+            return super().save(**kwargs)
+        except ValidationError as error:
+            raise serializers.ValidationError(error.message_dict)
+
+
+class RecipeFastSerializer:
+    '''
+    Serialização só de leitura usada no `list` e no `retrieve` da API v2. A saída é a mesma do `RecipeSerializer`, mas sem instanciar models nem campos do DRF:
+
+    - as receitas chegam como dicionários (`get_queryset` aplica o `.values()`)
+    - as tags de todas as receitas vêm de uma única query, e cada tag vira um dicionário só, reaproveitado em todas as receitas que a usam
+    - os links das tags saem de um modelo de URL montado uma vez (um `reverse()` por resposta, não por tag)
+
+    Uso: `RecipeFastSerializer(rows, many=True, context={'request': request}).data` (ou `context={'base_url': ...}` fora de uma requisição)
+    '''
+    values_fields = [
+        'id', 'title', 'description', 'slug', 'author_id', 'author_full_name',
+        'is_published', 'preparation_time', 'preparation_time_unit',
+        'category_id', 'category__name', 'servings', 'servings_unit',
+        'preparation_steps', 'cover',
+    ]
+    tag_view_name = 'recipes:tags-detail'
+    tag_pk_marker = 'tagpk0'
+
+    def __init__(self, rows, many=False, context=None):
+        self.rows = rows
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def get_queryset(cls, queryset):
+        '''
+        Troca os objetos por dicionários; o `prefetch_related` das tags é removido porque elas são buscadas em `get_tags`.
+        '''
+        return queryset.prefetch_related(None).values(*cls.values_fields)
+
+    def get_tags(self, recipe_ids):
+        '''
+        `{recipe_id: [(id, dicionário da tag, link), ...]}`, as tags de cada receita em ordem de id, como no `Prefetch` do `RecipeAPIv2ViewSet.queryset`.
+        '''
+        tags_by_recipe = defaultdict(list)
+        if not recipe_ids:
+            return tags_by_recipe
+
+        url = self.build_absolute_uri(
+            reverse(self.tag_view_name, kwargs={'pk': self.tag_pk_marker})
+        )
+        url_prefix, url_suffix = url.split(self.tag_pk_marker)
+
+        tags = {}
+        rows = Tag.objects.filter(recipe__id__in=recipe_ids).annotate(
+            recipe_pk=F('recipe__id')
+        ).order_by('id').values_list('recipe_pk', 'id', 'name', 'slug')
+        for recipe_id, tag_id, name, slug in rows:
+            tag = tags.get(tag_id)
+            if tag is None:
+                tag = tags[tag_id] = (
+                    tag_id,
+                    {'id': tag_id, 'name': name, 'slug': slug},
+                    f'{url_prefix}{tag_id}{url_suffix}',
+                )
+            tags_by_recipe[recipe_id].append(tag)
+        return tags_by_recipe
+
+    def build_absolute_uri(self, location):
+        '''
+        Com `request` no contexto gera a URL absoluta como o DRF; fora de uma requisição (comando de exportação) usa o `base_url` do contexto.
+        '''
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(location)
+        return self.context.get('base_url', '').rstrip('/') + location
+
+    def get_cover_url(self, name):
+        if not name:
+            return None
+        return self.build_absolute_uri(self.cover_storage.url(name))
+
+    @property
+    def cover_storage(self):
+        return Recipe._meta.get_field('cover').storage
+
+    def to_representation(self, row, tags):
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'description': row['description'],
+            'slug': row['slug'],
+            'author': row['author_id'],
+            'author_full_name': row['author_full_name'],
+            'public': row['is_published'],
+            'prepration': preparation_text(
+                row['preparation_time'], row['preparation_time_unit']
+            ),
+            'category': row['category_id'],
+            'category_name': row['category__name'],
+            'tags': [tag_id for tag_id, _, _ in tags],
+            'tags_objects': [tag for _, tag, _ in tags],
+            'tags_links': [link for _, _, link in tags],
+            'preparation_time': row['preparation_time'],
+            'preparation_time_unit': row['preparation_time_unit'],
+            'servings': row['servings'],
+            'servings_unit': row['servings_unit'],
+            'preparation_steps': row['preparation_steps'],
+            'cover': self.get_cover_url(row['cover']),
+        }
+
+    @property
+    @timed('serializer')
+    def data(self):
+        rows = list(self.rows) if self.many else [self.rows]
+        tags = self.get_tags([row['id'] for row in rows])
+        data = [self.to_representation(row, tags.get(row['id'], ())) for row in rows]
+        return data if self.many else data[0]
@@ -1,32 +1,407 @@
-import os
+from collections import defaultdict
 
-from django.db.models.signals import pre_delete, pre_save
+from django.contrib.auth.models import User
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
 from django.dispatch import receiver
+from tag.models import Tag
 
-from recipes.models import Recipe
+from recipes.cache import RECIPE_TAGS_SCOPE, bump_versions
+from recipes.counters import (CLOUD_SCOPE, add_to_categories, add_to_tags,
+                              reconcile_category_counts, reconcile_tag_counts)
+from recipes.counts import published_scope
+from recipes.media import file_name, schedule_cover_deletion
+from recipes.models import (Category, Recipe, TagRecipeCount,
+                            author_display_name)
+from recipes.related import mark_stale
+from recipes.search import get_search_backend
 
 
-def delete_cover(instance):
-    try:
-        os.remove(instance.cover.path)
-    except (ValueError, FileNotFoundError):
-        ...
+def loaded_cover(instance):
+    '''
+    `(capa, versões)` como vieram do banco. Sem os valores carregados (instância montada à mão ou com a capa adiada) busca só esses dois campos.
+    '''
+    loaded = getattr(instance, '_loaded_values', {})
+    if 'cover' in loaded:
+        return loaded['cover'], loaded.get('cover_renditions')
+    return Recipe.objects.filter(pk=instance.pk).values_list(
+        'cover', 'cover_renditions'
+    ).first() or (None, None)
 
 
 @receiver(pre_delete, sender=Recipe)
-def recipe_cover_delete(sender, instance, *args, **kwargs):
-    old_instance = Recipe.objects.filter(pk=instance.pk).first()
-    delete_cover(old_instance)
+def recipe_cover_delete(sender, instance, using, *args, **kwargs):
+    # os arquivos só são apagados depois do commit (recipes.media)
+    cover, renditions = loaded_cover(instance)
+    schedule_cover_deletion(cover, renditions, using=using)
 
 
 @receiver(pre_save, sender=Recipe)
-def recipe_cover_update(sender, instance, *args, **kwargs):
-    old_instance = Recipe.objects.filter(pk=instance.pk).first()
-    
-    if not old_instance:
+def recipe_cover_update(sender, instance, using, update_fields=None,
+                        *args, **kwargs):
+    if instance._state.adding or (
+        update_fields is not None and 'cover' not in update_fields
+    ):
         return
-    
-    is_new_cover = old_instance.cover != instance.cover
 
-    if is_new_cover:
-        delete_cover(old_instance)
+    cover, renditions = loaded_cover(instance)
+    if file_name(cover) != file_name(instance.cover):
+        schedule_cover_deletion(cover, renditions, using=using)
+
+
+def recipe_scopes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    return ['recipe:list', *(f'recipe:{pk}' for pk in recipe_ids)]
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_api_cache_invalidate(sender, instance, *args, **kwargs):
+    bump_versions(*recipe_scopes([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_api_cache_invalidate(sender, instance, action, reverse,
+                                     pk_set, *args, **kwargs):
+    if not reverse:
+        # instance é uma Recipe
+        if action.startswith('post_'):
+            bump_versions(*recipe_scopes([instance.pk]))
+        return
+
+    # instance é uma Tag e pk_set são ids de Recipe
+    if action == 'pre_clear':
+        # no clear o pk_set é None, então pega as receitas antes de desvincular
+        pk_set = instance.recipe_set.values_list('id', flat=True)
+    elif action not in ('post_add', 'post_remove'):
+        return
+
+    bump_versions(*recipe_scopes(pk_set))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_api_cache_invalidate(sender, instance, created=False, *args,
+                             **kwargs):
+    # as respostas das receitas dependem de `recipe:tags`: uma versão trocada, sem buscar as receitas da tag
+    # (o delete em cascata da tabela intermediária não dispara m2m_changed); uma tag nova ainda não está em nenhuma receita
+    scopes = ['tag:list', f'tag:{instance.pk}']
+    if not created:
+        scopes.append(RECIPE_TAGS_SCOPE)
+    bump_versions(*scopes)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_api_cache_invalidate(sender, instance, *args, **kwargs):
+    recipe_ids = Recipe.objects.filter(
+        category=instance.pk
+    ).values_list('id', flat=True)
+    bump_versions(*recipe_scopes(recipe_ids))
+
+
+@receiver(post_save, sender=User)
+def author_full_name_sync(sender, instance, *args, **kwargs):
+    # antes da invalidação do cache abaixo: nenhuma resposta nova sai com o nome antigo
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    Recipe.objects.sync_author_full_name(instance)
+
+
+@receiver(pre_delete, sender=User)
+def author_full_name_clear(sender, instance, *args, **kwargs):
+    # o SET_NULL do author é um UPDATE sem signals: limpa o nome junto
+    Recipe.objects.filter(author_id=instance.pk).update(
+        author_full_name=author_display_name(None)
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(pre_delete, sender=User)
+def author_api_cache_invalidate(sender, instance, *args, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+
+    recipe_ids = Recipe.objects.filter(
+        author=instance.pk
+    ).values_list('id', flat=True)
+    bump_versions(*recipe_scopes(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_index_update(sender, instance, *args, **kwargs):
+    get_search_backend().index_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_index_delete(sender, instance, *args, **kwargs):
+    get_search_backend().remove_recipes([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_search_index_update(sender, instance, action, reverse,
+                                    pk_set, *args, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            get_search_backend().index_recipes([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        # guarda as receitas da tag para reindexar depois do clear
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        get_search_backend().index_recipes(
+            getattr(instance, '_search_recipe_ids', [])
+        )
+    elif action in ('post_add', 'post_remove'):
+        get_search_backend().index_recipes(pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_search_index_collect(sender, instance, *args, **kwargs):
+    # o delete em cascata da tabela intermediária não dispara m2m_changed
+    instance._search_recipe_ids = list(
+        Recipe.objects.filter(tags=instance.pk).values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_search_index_update(sender, instance, *args, **kwargs):
+    recipe_ids = getattr(instance, '_search_recipe_ids', None)
+    if recipe_ids is None:
+        recipe_ids = Recipe.objects.filter(
+            tags=instance.pk
+        ).values_list('id', flat=True)
+    get_search_backend().index_recipes(recipe_ids)
+
+
+def recipe_was_published(instance):
+    # sem o valor carregado do banco (instância criada à mão), assume que estava publicada
+    return instance.get_loaded_value('is_published', True)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_count_invalidate(sender, instance, created, *args, **kwargs):
+    # só o total da home fica no cache; categorias e tags usam os contadores
+    was_published = False if created else recipe_was_published(instance)
+    is_known_state = (
+        created or 'is_published' in getattr(instance, '_loaded_values', {})
+    )
+    if is_known_state and was_published == instance.is_published:
+        return
+    bump_versions(published_scope())
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_count_delete(sender, instance, *args, **kwargs):
+    if recipe_was_published(instance):
+        bump_versions(published_scope())
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_related_invalidate(sender, instance, created, *args, **kwargs):
+    # receitas novas não têm lista: o refresh calcula as publicadas sem lista
+    if created:
+        return
+
+    loaded = getattr(instance, '_loaded_values', {})
+    if (
+        'is_published' in loaded and 'category_id' in loaded
+        and loaded['is_published'] == instance.is_published
+        and loaded['category_id'] == instance.category_id
+    ):
+        return
+    mark_stale([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_related_invalidate(sender, instance, action, reverse,
+                                   pk_set, *args, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            mark_stale([instance.pk])
+    elif action == 'pre_clear':
+        mark_stale(instance.recipe_set.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        mark_stale(pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_related_invalidate(sender, instance, *args, **kwargs):
+    # o delete em cascata da tabela intermediária não dispara m2m_changed
+    mark_stale(Recipe.objects.filter(
+        tags=instance.pk
+    ).values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def category_related_invalidate(sender, instance, *args, **kwargs):
+    # o SET_NULL da categoria é um UPDATE sem signals
+    mark_stale(Recipe.objects.filter(
+        category=instance.pk
+    ).values_list('id', flat=True))
+
+
+def recipe_published_state(instance):
+    '''
+    `(is_published, category_id)` como estão no banco, dos valores carregados; sem eles (instância montada à mão ou com os campos adiados) busca só esses dois campos.
+    '''
+    loaded = getattr(instance, '_loaded_values', {})
+    if 'is_published' in loaded and 'category_id' in loaded:
+        return loaded['is_published'], loaded['category_id']
+    return Recipe.objects.filter(pk=instance.pk).values_list(
+        'is_published', 'category_id'
+    ).first() or (False, None)
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_counters_collect(sender, instance, *args, **kwargs):
+    instance._counter_state = (
+        (False, None) if instance._state.adding
+        else recipe_published_state(instance)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_counters_update(sender, instance, created, update_fields=None,
+                           *args, **kwargs):
+    was_published, old_category_id = instance.__dict__.pop(
+        '_counter_state', (False, None)
+    )
+    is_published, category_id = instance.is_published, instance.category_id
+    # campos fora do update_fields continuam com o valor antigo no banco
+    if update_fields is not None:
+        if 'is_published' not in update_fields:
+            is_published = was_published
+        if not {'category', 'category_id'} & set(update_fields):
+            category_id = old_category_id
+
+    categories = defaultdict(int)
+    if was_published:
+        categories[old_category_id] -= 1
+    if is_published:
+        categories[category_id] += 1
+    add_to_categories(categories)
+
+    if was_published != is_published and not created:
+        add_to_tags(dict.fromkeys(
+            instance.tags.through.objects.filter(
+                recipe_id=instance.pk
+            ).values_list('tag_id', flat=True),
+            1 if is_published else -1,
+        ))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_counters_collect_delete(sender, instance, *args, **kwargs):
+    # as ligações com as tags somem no delete em cascata
+    is_published, category_id = recipe_published_state(instance)
+    instance._counter_state = (is_published, category_id, list(
+        instance.tags.through.objects.filter(
+            recipe_id=instance.pk
+        ).values_list('tag_id', flat=True)
+    ) if is_published else [])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_counters_delete(sender, instance, *args, **kwargs):
+    is_published, category_id, tag_ids = instance.__dict__.pop(
+        '_counter_state', (False, None, [])
+    )
+    if is_published:
+        add_to_categories({category_id: -1})
+        add_to_tags(dict.fromkeys(tag_ids, -1))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_counters_update(sender, instance, action, reverse, pk_set,
+                                *args, **kwargs):
+    # dos dois lados: instance é a Recipe (pk_set de tags) ou a Tag (pk_set de receitas)
+    own, other = ('tag_id', 'recipe_id') if reverse else ('recipe_id', 'tag_id')
+
+    if action in ('pre_remove', 'pre_clear'):
+        # o post_remove recebe todos os ids pedidos, mesmo os que não estavam ligados, e o post_clear nenhum
+        links = sender.objects.filter(
+            **{own: instance.pk}, recipe__is_published=True
+        )
+        if pk_set is not None:
+            links = links.filter(**{f'{other}__in': pk_set})
+        instance._counter_removed = list(
+            links.values_list(other, flat=True)
+        )
+        return
+
+    if action in ('post_remove', 'post_clear'):
+        changed, delta = instance.__dict__.pop('_counter_removed', []), -1
+    elif action == 'post_add':
+        delta = 1
+        if reverse:
+            changed = Recipe.objects.filter(
+                pk__in=pk_set, is_published=True
+            ).values_list('id', flat=True)
+        elif instance.get_loaded_value('is_published', instance.is_published):
+            changed = pk_set
+        else:
+            changed = []
+    else:
+        return
+
+    if reverse:
+        add_to_tags({instance.pk: delta * len(changed)})
+    else:
+        add_to_tags(dict.fromkeys(changed, delta))
+
+
+@receiver(post_save, sender=Tag)
+def tag_counter_rename(sender, instance, created, *args, **kwargs):
+    # cópia do nome e do slug lida pela nuvem de tags
+    if not created and TagRecipeCount.objects.filter(
+        pk=instance.pk
+    ).exclude(name=instance.name, slug=instance.slug).update(
+        name=instance.name, slug=instance.slug
+    ):
+        bump_versions(CLOUD_SCOPE)
+
+
+def recipes_bulk_changed(recipes, old_state=(), tag_slugs=()):
+    '''
+    `bulk_create`/`bulk_update` não disparam signals: faz de uma vez o que os receivers acima fazem por receita (cache da API, contagens, contadores, índice de busca e receitas parecidas).
+
+    `old_state` é uma lista de `(pk, is_published, category_id)` antes da atualização.
+    '''
+    recipe_ids = [recipe.pk for recipe in recipes]
+    scopes = recipe_scopes(recipe_ids)
+
+    category_ids = {
+        recipe.category_id for recipe in recipes if recipe.is_published
+    } | {
+        category_id for _, is_published, category_id in old_state
+        if is_published
+    }
+    tag_slugs = set(tag_slugs)
+    if old_state:
+        tag_slugs.update(Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('tag__slug', flat=True))
+
+    if category_ids or any(recipe.is_published for recipe in recipes):
+        scopes.append(published_scope())
+
+    bump_versions(*scopes)
+    get_search_backend().index_recipes(recipe_ids)
+    if old_state:
+        mark_stale(recipe_ids)
+
+    # recontagem exata só das tags e categorias afetadas
+    if tag_slugs:
+        reconcile_tag_counts(Tag.objects.filter(
+            slug__in=tag_slugs
+        ).values_list('id', flat=True))
+    reconcile_category_counts(category_ids)
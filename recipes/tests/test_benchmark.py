@@ -0,0 +1,138 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from benchmarks.data import SyntheticData
+from benchmarks.runner import build_endpoints, run
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from tag.models import Tag
+
+from recipes.models import Recipe
+
+
+class BenchmarkTest(TestCase):
+    def generate(self, seed=42):
+        return SyntheticData(seed=seed, batch_size=7, text_pool=20).generate(
+            users=4, categories=3, tags=10, recipes=30, tags_per_recipe=3,
+        )
+
+    def test_generates_the_requested_data(self):
+        dataset = self.generate()
+
+        self.assertEqual(dataset['recipes'], 30)
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertEqual(Tag.objects.count(), 10)
+        self.assertEqual(
+            Recipe.tags.through.objects.count(), dataset['recipe_tags']
+        )
+        recipe = Recipe.objects.select_related('author__profile').first()
+        self.assertEqual(recipe.cover, '')
+        self.assertTrue(recipe.author.profile)
+
+    def test_tag_popularity_is_skewed(self):
+        self.generate()
+        totals = sorted(
+            Recipe.tags.through.objects.filter(tag=tag).count()
+            for tag in Tag.objects.all()
+        )
+        self.assertGreater(totals[-1], totals[len(totals) // 2] * 2)
+
+    def test_same_seed_generates_the_same_recipes(self):
+        fields = ('title', 'preparation_time', 'is_published', 'tags__name')
+        self.generate()
+        first = list(Recipe.objects.order_by('id', 'tags').values_list(*fields))
+        User.objects.all().delete()
+        Recipe.objects.all().delete()
+        Tag.objects.all().delete()
+
+        self.generate()
+        second = list(Recipe.objects.order_by('id', 'tags').values_list(*fields))
+        self.assertEqual(first, second)
+
+    def test_report(self):
+        self.generate()
+        report = run(build_endpoints(), requests=3, warmup=1, cold=True)
+
+        self.assertEqual(set(report['endpoints']), {
+            'home', 'home_page_10', 'category', 'search', 'detail',
+            'api_v1_list', 'api_v1_detail', 'api_v2_list', 'api_v2_detail',
+            'tag_popular', 'tag_rare',
+        })
+        for name, result in report['endpoints'].items():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'], name)
+            self.assertGreater(result['queries_max'], 0, name)
+            self.assertGreater(result['peak_memory_kib'], 0, name)
+            self.assertEqual(result['status'], [200], name)
+
+    def test_api_cache_scenario(self):
+        self.generate()
+        report = run(
+            build_endpoints(), requests=3, warmup=1, scenarios=['api_cache']
+        )
+
+        self.assertNotIn('endpoints', report)
+        results = report['scenarios']['api_cache']
+        self.assertEqual(set(results), {
+            'api_v2_list', 'api_v2_detail', 'api_v2_related',
+            'api_v2_tag_cloud',
+        })
+        for name, result in results.items():
+            self.assertEqual(result['hit']['queries_max'], 0, name)
+            self.assertGreater(result['miss']['queries_max'], 0, name)
+            self.assertEqual(result['hit']['status'], [200], name)
+
+    def test_cards_scenario(self):
+        self.generate()
+        report = run(build_endpoints(), requests=2, warmup=1, scenarios=['cards'])
+
+        results = report['scenarios']['cards']
+        self.assertEqual(set(results), {'6_cards', '100_cards'})
+        self.assertEqual(results['6_cards']['cards'], 6)
+        self.assertEqual(
+            results['100_cards']['cards'],
+            Recipe.objects.filter(is_published=True).count(),
+        )
+
+    def test_server_timing_scenario(self):
+        self.generate()
+        report = run(
+            build_endpoints(), requests=2, warmup=1,
+            scenarios=['server_timing'],
+        )
+
+        results = report['scenarios']['server_timing']
+        self.assertEqual(set(results), {'home', 'api_v2_list'})
+        for name, result in results.items():
+            self.assertEqual(result['disabled']['status'], [200], name)
+            self.assertEqual(result['enabled']['status'], [200], name)
+            self.assertIn('overhead_p50_ms', result)
+
+    def test_command_rolls_back_the_generated_data(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'report.json'
+            call_command(
+                'benchmark', '--users=2', '--categories=2', '--tags=4',
+                '--recipes=12', '--requests=2', '--warmup=0',
+                f'--output={output}', stderr=io.StringIO(),
+            )
+            report = json.loads(output.read_text())
+
+        self.assertEqual(report['meta']['dataset']['recipes'], 12)
+        self.assertIn('detail', report['endpoints'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_command_leaves_the_site_cache_alone(self):
+        cache.set('site-key', 'kept')
+
+        call_command(
+            'benchmark', '--users=2', '--categories=2', '--tags=4',
+            '--recipes=12', '--requests=2', '--warmup=0',
+            '--scenario=api_cache', stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+
+        self.assertEqual(cache.get('site-key'), 'kept')
+        self.assertFalse([key for key in cache._cache if 'api_v2' in key])
@@ -0,0 +1,205 @@
+import pytest
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import get_resolver, reverse
+from parameterized import parameterized
+from rest_framework.test import APIClient
+from tag.models import Tag
+from utils.query_budget import QueryBudget
+from utils.query_budget import query_budget as within_budget
+
+from recipes.counters import reconcile_category_counts, reconcile_tag_counts
+from recipes.models import Recipe, author_display_name
+from recipes.related import refresh_related_recipes
+
+from .test_recipe_base import RecipeMixin
+
+SIZES = (1, 10, 100)
+
+# nome da URL -> função que monta o caminho a partir dos dados do teste
+URLS = {
+    'recipes:home': lambda data: reverse('recipes:home'),
+    'recipes:search': lambda data: reverse('recipes:search') + '?q=recipe',
+    'recipes:tag': lambda data: reverse('recipes:tag', args=(data.tag.slug,)),
+    'recipes:category': lambda data: reverse(
+        'recipes:category', args=(data.category.pk,)
+    ),
+    'recipes:recipe': lambda data: reverse(
+        'recipes:recipe', args=(data.recipe.pk,)
+    ),
+    'recipes:theory': lambda data: reverse('recipes:theory'),
+    'recipes:recipes_api_v1': lambda data: reverse('recipes:recipes_api_v1'),
+    'recipes:recipes_api_v1_detail': lambda data: reverse(
+        'recipes:recipes_api_v1_detail', args=(data.recipe.pk,)
+    ),
+    'recipes:recipes-api-list': lambda data: reverse(
+        'recipes:recipes-api-list'
+    ),
+    'recipes:recipes-api-detail': lambda data: reverse(
+        'recipes:recipes-api-detail', args=(data.recipe.pk,)
+    ),
+    'recipes:recipes-api-export': lambda data: reverse(
+        'recipes:recipes-api-export'
+    ),
+    'recipes:recipes-api-related': lambda data: reverse(
+        'recipes:recipes-api-related', args=(data.recipe.pk,)
+    ),
+    'recipes:tags-detail': lambda data: reverse(
+        'recipes:tags-detail', args=(data.tag.pk,)
+    ),
+    'recipes:tags-cloud': lambda data: reverse('recipes:tags-cloud'),
+    'authors:register': lambda data: reverse('authors:register'),
+    'authors:login': lambda data: reverse('authors:login'),
+    'authors:dashboard': lambda data: reverse('authors:dashboard'),
+    'authors:dashboard_recipe_new': lambda data: reverse(
+        'authors:dashboard_recipe_new'
+    ),
+    'authors:dashboard_recipe_edit': lambda data: reverse(
+        'authors:dashboard_recipe_edit', args=(data.draft.pk,)
+    ),
+    'authors:profile': lambda data: reverse(
+        'authors:profile', args=(data.author.profile.pk,)
+    ),
+    'authors:auhtor-api-list': lambda data: reverse('authors:auhtor-api-list'),
+    'authors:auhtor-api-detail': lambda data: reverse(
+        'authors:auhtor-api-detail', args=(data.author.pk,)
+    ),
+    'authors:auhtor-api-me': lambda data: reverse('authors:auhtor-api-me'),
+}
+
+LOGIN_REQUIRED = {
+    'authors:dashboard', 'authors:dashboard_recipe_new',
+    'authors:dashboard_recipe_edit', 'authors:auhtor-api-list',
+    'authors:auhtor-api-detail', 'authors:auhtor-api-me',
+}
+
+# URLs sem GET para medir
+NOT_MEASURED = {
+    'recipes:token_obtain_pair': 'POST only',
+    'recipes:token_refresh': 'POST only',
+    'recipes:token_verify': 'POST only',
+    'recipes:recipes-api-bulk': 'POST/PATCH only',
+    'recipes:tags-list': 'shadowed by recipes-api-detail',
+    'recipes:tags-bulk': 'POST only',
+    'authors:register_create': 'POST only',
+    'authors:login_create': 'POST only',
+    'authors:logout': 'POST only',
+    'authors:dashboard_recipe_delete': 'POST only',
+}
+
+
+def named_urls(patterns=None, namespace=None):
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from named_urls(
+                pattern.url_patterns, pattern.namespace or namespace
+            )
+        elif pattern.name and namespace in ('recipes', 'authors'):
+            yield f'{namespace}:{pattern.name}'
+
+
+class QueryBudgetData(RecipeMixin):
+    '''
+    Um autor, uma categoria e duas tags; `size` receitas publicadas e `size` rascunhos, todos com as duas tags.
+    '''
+    def __init__(self):
+        self.author = self.make_author()
+        self.category = self.make_category()
+        self.tag, self.other_tag = (
+            Tag.objects.create(name='Doce'), Tag.objects.create(name='Bolo')
+        )
+        self.size = 0
+
+    def grow(self, size):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                title=f'Recipe {kind} {i}', slug=f'recipe-{kind}-{i}',
+                description='Recipe description', preparation_time=10,
+                preparation_time_unit='Minutos', servings=2,
+                servings_unit='Porções', preparation_steps='Steps',
+                is_published=kind == 'published', category=self.category,
+                author=self.author,
+                author_full_name=author_display_name(self.author),
+            )
+            for kind in ('published', 'draft')
+            for i in range(self.size, size)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+            for recipe in recipes for tag in (self.tag, self.other_tag)
+        )
+        refresh_related_recipes(full=True)
+        # bulk_create não dispara os signals dos contadores
+        reconcile_tag_counts()
+        reconcile_category_counts()
+        self.size = size
+        self.recipe = Recipe.objects.filter(is_published=True).first()
+        self.draft = Recipe.objects.filter(is_published=False).first()
+
+
+class QueryBudgetTest(TestCase):
+    '''
+    Conta as queries de cada URL nomeada com 1, 10 e 100 receitas e compara com o `query_budget.json` (regerar com `pytest --update-query-budget`). A contagem não pode crescer entre 10 e 100 receitas: isso é um N+1.
+    '''
+    client_class = APIClient
+    query_budget = QueryBudget()
+
+    def test_every_named_url_is_measured_or_skipped(self):
+        self.assertEqual(
+            set(named_urls()), set(URLS) | set(NOT_MEASURED)
+        )
+
+    def get(self, url):
+        response = self.client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    @parameterized.expand(sorted(URLS))
+    def test_query_budget(self, name):
+        data = QueryBudgetData()
+        if name in LOGIN_REQUIRED:
+            self.client.force_login(data.author)
+            self.client.force_authenticate(data.author)
+
+        counts, reports = {}, {}
+        for size in SIZES:
+            data.grow(size)
+            cache.clear()
+            url = URLS[name](data)
+            with self.query_budget.measure(f'{name}[{size}]') as recorder:
+                response = self.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[size], reports[size] = len(recorder), recorder.report()
+
+        self.assertEqual(
+            counts[SIZES[-2]], counts[SIZES[-1]],
+            f'{name}: queries grow with the number of recipes '
+            f'({counts}):\n{reports[SIZES[-1]]}',
+        )
+
+
+@pytest.mark.django_db
+def test_home_fits_the_query_budget(client, query_budget):
+    QueryBudgetData().grow(10)
+    cache.clear()
+
+    with query_budget.measure('recipes:home[10]'):
+        response = client.get(reverse('recipes:home'))
+    assert response.status_code == 200
+
+
+@within_budget('recipes:recipes-api-list[{size}]')
+def get_recipes_api_list(client, size):
+    return client.get(reverse('recipes:recipes-api-list'))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('size', [1, 10])
+def test_recipes_api_list_fits_the_query_budget(client, size):
+    QueryBudgetData().grow(size)
+    cache.clear()
+
+    assert get_recipes_api_list(client, size=size).status_code == 200
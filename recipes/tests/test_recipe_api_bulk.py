@@ -0,0 +1,178 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import test
+from tag.models import Tag
+
+from recipes.bulk import RecipeBulkWriter
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from recipes.tests.test_recipe_base import RecipeMixin
+
+
+class RecipeAPIv2BulkTest(test.APITestCase, RecipeMixin):
+    url = reverse('recipes:recipes-api-bulk')
+
+    def setUp(self):
+        self.author = self.make_author(username='bulk')
+        self.client.force_authenticate(self.author)
+        self.category = self.make_category()
+        self.tags = [Tag.objects.create(name=f'Tag {i}') for i in range(3)]
+        return super().setUp()
+
+    def make_item(self, i, **kwargs):
+        return {
+            'title': f'Bulk recipe {i}',
+            'description': f'Bulk description {i}',
+            'preparation_time': 10,
+            'preparation_time_unit': 'Minutos',
+            'servings': 2,
+            'servings_unit': 'Porções',
+            'preparation_steps': 'Misture tudo',
+            'public': True,
+            'category': self.category.id,
+            'tags': [self.tags[i % 3].id],
+            **kwargs,
+        }
+
+    def test_bulk_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(self.url, [self.make_item(0)], format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_bulk_create_writes_recipes_and_tags(self):
+        response = self.client.post(
+            self.url, [self.make_item(i) for i in range(6)], format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['results']), 6)
+
+        recipe = Recipe.objects.get(title='Bulk recipe 4')
+        self.assertEqual(recipe.slug, 'bulk-recipe-4')
+        self.assertEqual(recipe.author, self.author)
+        self.assertTrue(recipe.is_published)
+        self.assertEqual(list(recipe.tags.all()), [self.tags[1]])
+
+    def test_bulk_create_allocates_free_slugs(self):
+        Recipe.objects.create(
+            title='Bolo de cenoura', slug='bolo-de-cenoura', author=self.author
+        )
+        items = [
+            self.make_item(0, title='Bolo de cenoura!'),
+            self.make_item(1, title='Bolo de cenoura?'),
+            self.make_item(2, title='!!! ??? !!!'),
+        ]
+        response = self.client.post(self.url, items, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [recipe['slug'] for recipe in response.data['results']],
+            ['bolo-de-cenoura-2', 'bolo-de-cenoura-3', 'receita'],
+        )
+
+    def test_bulk_create_500_recipes_in_a_few_queries(self):
+        items = [self.make_item(i) for i in range(500)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, items, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        # só cresce com os lotes do INSERT (limite de parâmetros do banco)
+        self.assertLess(len(ctx.captured_queries), 25)
+
+    def test_bulk_create_reports_errors_per_item_and_writes_nothing(self):
+        Recipe.objects.create(
+            title='Existing', slug='existing', author=self.author
+        )
+        items = [
+            self.make_item(0),
+            self.make_item(1, title='EXISTING'),
+            self.make_item(2, category=9999),
+            self.make_item(3, tags=[9999]),
+            self.make_item(4, servings=-1),
+            self.make_item(0),
+        ]
+        response = self.client.post(self.url, items, format='json')
+        errors = response.data['errors']
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(errors[0], {})
+        self.assertIn('title', errors[1])
+        self.assertIn('category', errors[2])
+        self.assertIn('tags', errors[3])
+        self.assertIn('servings', errors[4])
+        self.assertIn('title', errors[5])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_bulk_create_concurrent_title_is_a_validation_error(self):
+        is_valid = RecipeBulkWriter.is_valid
+
+        def is_valid_then_concurrent_insert(writer):
+            valid = is_valid(writer)
+            # outra requisição grava o mesmo título entre a checagem e o INSERT
+            Recipe.objects.create(
+                title='bulk RECIPE 1', slug='concurrent', author=self.author
+            )
+            return valid
+
+        with patch.object(
+            RecipeBulkWriter, 'is_valid', is_valid_then_concurrent_insert
+        ):
+            response = self.client.post(
+                self.url, [self.make_item(0), self.make_item(1)],
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0], {})
+        self.assertIn('title', response.data['errors'][1])
+        self.assertEqual(
+            list(Recipe.objects.values_list('slug', flat=True)), ['concurrent']
+        )
+
+    def test_bulk_create_rejects_too_many_items(self):
+        items = [self.make_item(i) for i in range(501)]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_update_changes_only_own_recipes(self):
+        own = Recipe.objects.create(
+            title='Own recipe', slug='own', author=self.author,
+            category=self.category, description='Own description',
+            preparation_time=10, preparation_time_unit='Minutos',
+            servings=2, servings_unit='Porções', preparation_steps='Passos',
+        )
+        own.tags.add(self.tags[0])
+        other = self.make_recipe(author_data={'username': 'other'})
+
+        response = self.client.patch(self.url, [
+            {'id': own.id, 'public': True, 'tags': [self.tags[2].id]},
+            {'id': other.id, 'title': 'Hijacked title'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id', response.data['errors'][1])
+
+        response = self.client.patch(self.url, [
+            {'id': own.id, 'public': True, 'tags': [self.tags[2].id]},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+
+        own.refresh_from_db()
+        self.assertTrue(own.is_published)
+        self.assertEqual(own.title, 'Own recipe')
+        self.assertEqual(list(own.tags.all()), [self.tags[2]])
+
+    def test_bulk_write_invalidates_caches_and_search_index(self):
+        list_url = reverse('recipes:recipes-api-list')
+        self.client.get(list_url)
+        self.client.get(reverse('recipes:home'))
+
+        self.client.post(self.url, [self.make_item(0)], format='json')
+
+        self.assertEqual(self.client.get(list_url).data['count'], 1)
+        home = self.client.get(reverse('recipes:home'))
+        self.assertEqual(home.context['recipes'].paginator.count, 1)
+        self.assertEqual(
+            search_recipes(Recipe.objects.all(), 'bulk').count(), 1
+        )
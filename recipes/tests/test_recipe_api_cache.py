@@ -0,0 +1,160 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import test
+from tag.models import Tag
+
+from recipes.cache import stats
+from recipes.tests.test_recipe_base import RecipeMixin
+
+
+class RecipeAPIv2CacheTest(test.APITestCase, RecipeMixin):
+    def setUp(self):
+        stats.reset()
+        return super().setUp()
+
+    def get_list_url(self, query=''):
+        return reverse('recipes:recipes-api-list') + query
+
+    def get_detail_url(self, pk):
+        return reverse('recipes:recipes-api-detail', args=(pk,))
+
+    def test_second_list_request_is_a_hit_without_queries(self):
+        self.make_recipe()
+        first = self.client.get(self.get_list_url())
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(self.get_list_url())
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(stats.as_dict()['hits'], 1)
+        self.assertEqual(stats.as_dict()['misses'], 1)
+
+    def test_query_params_order_does_not_change_the_key(self):
+        self.make_recipe()
+        self.client.get(self.get_list_url('?page_size=5&category_id=1'))
+        response = self.client.get(
+            self.get_list_url('?category_id=1&page_size=5')
+        )
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_recipe_save_invalidates_list_and_detail(self):
+        recipe = self.make_recipe()
+        self.client.get(self.get_list_url())
+        self.client.get(self.get_detail_url(recipe.pk))
+
+        recipe.title = 'Changed title'
+        recipe.save()
+
+        list_response = self.client.get(self.get_list_url())
+        detail_response = self.client.get(self.get_detail_url(recipe.pk))
+        self.assertEqual(list_response['X-Cache'], 'MISS')
+        self.assertEqual(detail_response['X-Cache'], 'MISS')
+        self.assertEqual(detail_response.data['title'], 'Changed title')
+
+    def test_recipe_save_keeps_other_details_cached(self):
+        recipe = self.make_recipe()
+        other = self.make_recipe(
+            title='Other Recipe', slug='other',
+            author_data={'username': 'other'},
+        )
+        self.client.get(self.get_detail_url(other.pk))
+
+        recipe.save()
+
+        response = self.client.get(self.get_detail_url(other.pk))
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_recipe_delete_invalidates_list(self):
+        recipe = self.make_recipe()
+        self.client.get(self.get_list_url())
+        recipe.delete()
+        response = self.client.get(self.get_list_url())
+        self.assertEqual(response.data['count'], 0)
+
+    def test_recipe_tags_change_invalidates_recipe(self):
+        recipe = self.make_recipe()
+        tag = Tag.objects.create(name='Doce')
+        self.client.get(self.get_detail_url(recipe.pk))
+
+        recipe.tags.add(tag)
+        response = self.client.get(self.get_detail_url(recipe.pk))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['tags'], [tag.pk])
+
+        self.client.get(self.get_detail_url(recipe.pk))
+        tag.recipe_set.clear()
+        response = self.client.get(self.get_detail_url(recipe.pk))
+        self.assertEqual(response.data['tags'], [])
+
+    def test_tag_save_invalidates_tags_and_recipes_using_it(self):
+        recipe = self.make_recipe()
+        tag = Tag.objects.create(name='Doce')
+        recipe.tags.add(tag)
+        tag_url = reverse('recipes:tags-detail', args=(tag.pk,))
+        self.client.get(tag_url)
+        self.client.get(self.get_detail_url(recipe.pk))
+
+        tag.name = 'Salgado'
+        tag.save()
+
+        tag_response = self.client.get(tag_url)
+        recipe_response = self.client.get(self.get_detail_url(recipe.pk))
+        self.assertEqual(tag_response.data['name'], 'Salgado')
+        self.assertEqual(
+            recipe_response.data['tags_objects'][0]['name'], 'Salgado'
+        )
+
+    def test_tag_save_bumps_one_version_for_all_recipes(self):
+        recipes = self.make_recipe_in_batch(qtd=5)
+        tag = Tag.objects.create(name='Doce')
+        tag.recipe_set.add(*recipes)
+        self.client.get(self.get_list_url())
+
+        tag.name = 'Salgado'
+        with patch(
+            'recipes.cache.cache.set_many', wraps=cache.set_many
+        ) as set_many:
+            tag.save()
+
+        bumped = {key for call in set_many.call_args_list for key in call.args[0]}
+        # uma versão para todas as receitas, nenhuma `recipe:<pk>`
+        self.assertIn('api_v2:version:recipe:tags', bumped)
+        self.assertFalse([
+            key for key in bumped
+            if key.startswith('api_v2:version:recipe:')
+            and key.rsplit(':', 1)[1].isdigit()
+        ])
+        response = self.client.get(self.get_list_url())
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(
+            response.data['results'][0]['tags_objects'][0]['name'], 'Salgado'
+        )
+
+    def test_tag_delete_invalidates_tag_and_recipes_using_it(self):
+        recipe = self.make_recipe()
+        tag = Tag.objects.create(name='Doce')
+        recipe.tags.add(tag)
+        tag_url = reverse('recipes:tags-detail', args=(tag.pk,))
+        self.client.get(tag_url)
+        self.client.get(self.get_detail_url(recipe.pk))
+
+        tag.delete()
+
+        self.assertEqual(self.client.get(tag_url).status_code, 404)
+        response = self.client.get(self.get_detail_url(recipe.pk))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['tags'], [])
+
+    def test_not_found_is_not_cached(self):
+        self.client.get(self.get_detail_url(1000))
+        response = self.client.get(self.get_detail_url(1000))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(stats.as_dict()['hits'], 0)
+
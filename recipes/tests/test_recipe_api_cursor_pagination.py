@@ -0,0 +1,76 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import test
+from tag.models import Tag
+
+from recipes.tests.test_recipe_base import RecipeMixin
+
+
+class RecipeAPIv2CursorPaginationTest(test.APITestCase, RecipeMixin):
+    def get_api_url(self, query=''):
+        return reverse('recipes:recipes-api-list') + query
+
+    def test_default_pagination_still_returns_count(self):
+        self.make_recipe_in_batch(qtd=3)
+        response = self.client.get(self.get_api_url())
+        self.assertEqual(response.data['count'], 3)
+
+    def test_cursor_mode_does_not_return_count(self):
+        self.make_recipe_in_batch(qtd=3)
+        response = self.client.get(self.get_api_url('?pagination=cursor'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_mode_walks_all_pages_in_id_desc_order(self):
+        recipes = self.make_recipe_in_batch(qtd=7)
+        expected_ids = sorted((r.id for r in recipes), reverse=True)
+
+        url = self.get_api_url('?pagination=cursor&page_size=3')
+        ids = []
+        while url:
+            response = self.client.get(url)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(ids, expected_ids)
+
+    def test_cursor_mode_previous_link_returns_previous_page(self):
+        self.make_recipe_in_batch(qtd=5)
+        first = self.client.get(
+            self.get_api_url('?pagination=cursor&page_size=2')
+        )
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual(first.data['results'], previous.data['results'])
+
+    def test_cursor_mode_applies_category_author_and_tags_filters(self):
+        recipes = self.make_recipe_in_batch(qtd=4)
+        tag = Tag.objects.create(name='Doce')
+        recipes[1].tags.add(tag)
+        recipes[2].tags.add(tag)
+
+        response = self.client.get(
+            self.get_api_url(f'?pagination=cursor&tags_ids={tag.id}')
+        )
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(ids, [recipes[2].id, recipes[1].id])
+
+        response = self.client.get(self.get_api_url(
+            f'?pagination=cursor&author_id={recipes[0].author_id}'
+            f'&category_id={recipes[0].category_id}'
+        ))
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(ids, [recipes[0].id])
+
+    def test_cursor_mode_runs_no_count_query(self):
+        self.make_recipe_in_batch(qtd=3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.get_api_url('?pagination=cursor'))
+
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in ctx.captured_queries)
+        )
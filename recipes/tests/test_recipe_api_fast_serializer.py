@@ -0,0 +1,131 @@
+import json
+
+from django.urls import reverse
+from rest_framework import test
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from tag.models import Tag
+
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from recipes.serializers import RecipeFastSerializer, RecipeSerializer
+from recipes.tests.test_recipe_base import RecipeMixin
+from recipes.views.api import RecipeAPIv2ViewSet
+
+
+def render(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+class RecipeFastSerializerTest(test.APITestCase, RecipeMixin):
+    def setUp(self):
+        self.request = Request(test.APIRequestFactory().get('/'))
+        self.context = {'request': self.request}
+        return super().setUp()
+
+    def get_queryset(self):
+        return RecipeAPIv2ViewSet.queryset.all()
+
+    def make_varied_recipes(self):
+        recipes = self.make_recipe_in_batch(qtd=6)
+        tags = [Tag.objects.create(name=f'Tag {i}') for i in range(3)]
+
+        recipes[0].tags.add(*tags)
+        recipes[1].tags.add(tags[1], tags[2])
+        recipes[2].tags.add(tags[0])
+
+        Recipe.objects.filter(pk=recipes[3].pk).update(
+            preparation_time=1, preparation_time_unit='Horas',
+            cover='recipes/covers/2024/01/01/bolo de cenoura.jpg',
+        )
+        Recipe.objects.filter(pk=recipes[4].pk).update(category=None)
+        Recipe.objects.filter(pk=recipes[5].pk).update(author=None)
+        return recipes
+
+    def assertSameOutput(self, queryset):
+        expected = RecipeSerializer(
+            queryset, many=True, context=self.context
+        ).data
+        fast = RecipeFastSerializer(
+            RecipeFastSerializer.get_queryset(queryset),
+            many=True, context=self.context,
+        ).data
+        self.assertEqual(render(fast), render(expected))
+
+    def test_list_output_matches_recipe_serializer(self):
+        self.make_varied_recipes()
+        self.assertSameOutput(self.get_queryset())
+
+    def test_search_output_matches_recipe_serializer(self):
+        self.make_varied_recipes()
+        self.assertSameOutput(search_recipes(self.get_queryset(), 'recipe'))
+
+    def test_single_output_matches_recipe_serializer(self):
+        recipes = self.make_varied_recipes()
+        recipe = self.get_queryset().get(pk=recipes[0].pk)
+        row = RecipeFastSerializer.get_queryset(
+            self.get_queryset()
+        ).get(pk=recipes[0].pk)
+
+        self.assertEqual(
+            render(RecipeFastSerializer(row, context=self.context).data),
+            render(RecipeSerializer(recipe, context=self.context).data),
+        )
+
+    def test_tags_are_ordered_by_id(self):
+        recipe = self.make_recipe()
+        tags = [Tag.objects.create(name=f'Tag {i}') for i in range(3)]
+        # ligadas fora da ordem dos ids
+        recipe.tags.add(tags[2])
+        recipe.tags.add(tags[0], tags[1])
+
+        data = RecipeFastSerializer(
+            RecipeFastSerializer.get_queryset(self.get_queryset()),
+            many=True, context=self.context,
+        ).data
+        self.assertEqual(
+            [tag['id'] for tag in data[0]['tags_objects']],
+            [tag.id for tag in tags],
+        )
+        self.assertSameOutput(self.get_queryset())
+
+    def test_tag_dicts_are_shared_between_recipes(self):
+        recipes = self.make_recipe_in_batch(qtd=2)
+        tag = Tag.objects.create(name='Doce')
+        for recipe in recipes:
+            recipe.tags.add(tag)
+
+        data = RecipeFastSerializer(
+            RecipeFastSerializer.get_queryset(self.get_queryset()),
+            many=True, context=self.context,
+        ).data
+        self.assertIs(data[0]['tags_objects'][0], data[1]['tags_objects'][0])
+
+    def test_list_runs_one_query_for_recipes_and_one_for_tags(self):
+        self.make_varied_recipes()
+        queryset = RecipeFastSerializer.get_queryset(self.get_queryset())
+
+        with self.assertNumQueries(2):
+            RecipeFastSerializer(
+                queryset, many=True, context=self.context
+            ).data
+
+    def test_api_list_and_detail_use_the_same_output(self):
+        recipes = self.make_varied_recipes()
+        response = self.client.get(reverse('recipes:recipes-api-list'))
+        request = response.wsgi_request
+        context = {'request': Request(request)}
+
+        self.assertEqual(
+            render(response.data['results']),
+            render(RecipeSerializer(
+                self.get_queryset(), many=True, context=context
+            ).data),
+        )
+
+        response = self.client.get(
+            reverse('recipes:recipes-api-detail', args=(recipes[3].pk,))
+        )
+        self.assertEqual(response.data['prepration'], '1 Hora')
+        self.assertTrue(response.data['cover'].startswith('http://testserver/'))
+
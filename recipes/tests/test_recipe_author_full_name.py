@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import test
+
+from recipes.models import Recipe
+from recipes.tests.test_recipe_base import RecipeMixin
+
+
+class RecipeAuthorFullNameTest(test.APITestCase, RecipeMixin):
+    def expected_names(self):
+        # o annotate que as listas usavam antes da coluna
+        return dict(Recipe.objects.annotate(expected=Concat(
+            F('author__first_name'), Value(' '),
+            F('author__last_name'), Value(' ('),
+            F('author__username'), Value(')'),
+        )).values_list('id', 'expected'))
+
+    def stored_names(self):
+        return dict(Recipe.objects.values_list('id', 'author_full_name'))
+
+    def test_new_recipe_stores_the_author_name(self):
+        recipe = self.make_recipe()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.author_full_name, 'user name (username)')
+        self.assertEqual(self.stored_names(), self.expected_names())
+
+    def test_renaming_the_author_updates_all_recipes_in_one_query(self):
+        recipes = self.make_recipe_in_batch(qtd=3)
+        author = recipes[0].author
+        Recipe.objects.update(author=author)
+
+        author.first_name = 'Renamed'
+        with CaptureQueriesContext(connection) as ctx:
+            author.save()
+
+        updates = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE "recipes_recipe"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.stored_names(), self.expected_names())
+
+    def test_changing_the_recipe_author_updates_the_name(self):
+        recipe = self.make_recipe()
+        other = self.make_author(first_name='Other', username='other')
+
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.author_id = other.pk
+        recipe.save()
+
+        self.assertEqual(self.stored_names(), self.expected_names())
+
+    def test_deleting_the_author_clears_the_name(self):
+        recipe = self.make_recipe()
+        recipe.author.delete()
+        self.assertEqual(self.stored_names(), self.expected_names())
+        self.assertEqual(self.stored_names()[recipe.pk], '  ()')
+
+    def test_bulk_create_stores_the_author_name(self):
+        author = self.make_author(username='bulk')
+        self.client.force_authenticate(author)
+        category = self.make_category()
+        self.client.post(reverse('recipes:recipes-api-bulk'), [{
+            'title': 'Bulk recipe', 'description': 'Bulk description',
+            'preparation_time': 10, 'preparation_time_unit': 'Minutos',
+            'servings': 2, 'servings_unit': 'Porções',
+            'preparation_steps': 'Misture tudo', 'category': category.pk,
+        }], format='json')
+        self.assertEqual(self.stored_names(), self.expected_names())
+
+    def test_backfill_command_fixes_stale_names(self):
+        self.make_recipe_in_batch(qtd=3)
+        Recipe.objects.update(author_full_name='stale')
+
+        call_command('backfill_author_names', batch_size=2, stdout=StringIO())
+        self.assertEqual(self.stored_names(), self.expected_names())
+
+    def test_api_list_reads_the_column_without_joining_users(self):
+        self.make_recipe_in_batch(qtd=3)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('recipes:recipes-api-list'))
+
+        self.assertEqual(
+            response.data['results'][0]['author_full_name'],
+            'user name (u2)',
+        )
+        self.assertFalse(any(
+            'auth_user' in query['sql'] for query in ctx.captured_queries
+        ))
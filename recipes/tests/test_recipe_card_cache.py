@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from tag.models import Tag
+
+from recipes.models import Category, Recipe
+
+from .test_recipe_base import RecipeTestBase
+
+
+class RecipeCardCacheTest(RecipeTestBase):
+    def setUp(self):
+        self.recipe = self.make_recipe()
+        self.home_url = reverse('recipes:home')
+        self.detail_url = reverse('recipes:recipe', args=(self.recipe.pk,))
+        return super().setUp()
+
+    def test_card_is_served_from_the_cache(self):
+        self.client.get(self.home_url)
+        # update() não dispara signals: o card continua o mesmo
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            description='Changed without signals'
+        )
+        response = self.client.get(self.home_url)
+        self.assertContains(response, 'Recipe Description')
+        self.assertNotContains(response, 'Changed without signals')
+
+    def test_saving_the_recipe_renders_the_card_again(self):
+        self.client.get(self.home_url)
+        self.recipe.description = 'New description'
+        self.recipe.save()
+        self.assertContains(self.client.get(self.home_url), 'New description')
+
+    def test_category_author_and_tag_edits_render_the_card_again(self):
+        tag = Tag.objects.create(name='Doce')
+        self.recipe.tags.add(tag)
+        self.client.get(self.home_url)
+        self.client.get(self.detail_url)
+
+        category = Category.objects.get(pk=self.recipe.category_id)
+        category.name = 'New category'
+        category.save()
+        self.assertContains(self.client.get(self.home_url), 'New category')
+
+        author = User.objects.get(pk=self.recipe.author_id)
+        author.first_name = 'Renamed'
+        author.save()
+        self.assertContains(self.client.get(self.home_url), 'Renamed')
+
+        tag.name = 'Salgado'
+        tag.save()
+        self.assertContains(self.client.get(self.detail_url), 'Salgado')
+
+    def test_detail_and_list_cards_are_cached_separately(self):
+        self.client.get(self.home_url)
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Recipe Preparation Steps')
+
+    def test_language_is_part_of_the_key(self):
+        self.client.get(self.home_url, HTTP_ACCEPT_LANGUAGE='pt-br')
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            description='Changed without signals'
+        )
+        response = self.client.get(self.home_url, HTTP_ACCEPT_LANGUAGE='en')
+        self.assertContains(response, 'Changed without signals')
+
@@ -0,0 +1,113 @@
+from django.urls import reverse
+from rest_framework import test
+
+from recipes.models import Recipe
+from recipes.tests.test_recipe_base import RecipeMixin
+
+
+class RecipeConditionalGetTest(test.APITestCase, RecipeMixin):
+    def setUp(self):
+        self.recipe = self.make_recipe()
+        return super().setUp()
+
+    def get_urls(self):
+        return [
+            reverse('recipes:recipe', args=(self.recipe.pk,)),
+            reverse('recipes:recipes_api_v1_detail', args=(self.recipe.pk,)),
+            reverse('recipes:recipes-api-detail', args=(self.recipe.pk,)),
+            reverse('recipes:recipes-api-list'),
+        ]
+
+    def test_responses_have_etag_and_last_modified(self):
+        for url in self.get_urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_matching_etag_returns_304_with_a_single_query(self):
+        # API_V2_CACHE_TIMEOUT=0: sem o cache de respostas, só a query dos validadores
+        with self.settings(API_V2_CACHE_TIMEOUT=0):
+            for url in self.get_urls():
+                with self.subTest(url=url):
+                    etag = self.client.get(url)['ETag']
+
+                    with self.assertNumQueries(1):
+                        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response['ETag'], etag)
+                    self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_returns_304(self):
+        url = reverse('recipes:recipes_api_v1_detail', args=(self.recipe.pk,))
+        last_modified = self.client.get(url)['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_saving_the_recipe_changes_the_etag(self):
+        url = reverse('recipes:recipes-api-detail', args=(self.recipe.pk,))
+        etag = self.client.get(url)['ETag']
+
+        self.recipe.title = 'Another title'
+        self.recipe.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Another title')
+
+    def test_category_rename_changes_the_etag(self):
+        url = reverse('recipes:recipe', args=(self.recipe.pk,))
+        etag = self.client.get(url)['ETag']
+
+        self.recipe.category.name = 'Renamed'
+        self.recipe.category.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+
+    def test_html_etag_depends_on_the_logged_user(self):
+        url = reverse('recipes:recipe', args=(self.recipe.pk,))
+        etag = self.client.get(url)['ETag']
+
+        self.client.force_login(self.recipe.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etag_changes_when_a_recipe_is_unpublished(self):
+        url = reverse('recipes:recipes-api-list')
+
+        with self.settings(API_V2_CACHE_TIMEOUT=0):
+            etag = self.client.get(url)['ETag']
+            # update() não dispara signals: muda só a contagem
+            Recipe.objects.filter(pk=self.recipe.pk).update(is_published=False)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+
+    def test_list_etag_depends_on_the_query_string(self):
+        url = reverse('recipes:recipes-api-list')
+        first = self.client.get(url)['ETag']
+        second = self.client.get(url + '?page_size=10')['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_cache_hit_answers_304_without_queries(self):
+        url = reverse('recipes:recipes-api-detail', args=(self.recipe.pk,))
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_unpublished_recipe_detail_still_returns_404(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(is_published=False)
+        response = self.client.get(
+            reverse('recipes:recipe', args=(self.recipe.pk,)),
+            HTTP_IF_NONE_MATCH='"anything"',
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,239 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, Q
+from django.urls import reverse
+from rest_framework import test
+from tag.models import Tag
+
+from recipes.counters import reconcile_tag_counts
+from recipes.models import (Category, CategoryRecipeCount, Recipe,
+                            TagRecipeCount)
+
+from .test_recipe_base import RecipeMixin
+
+
+def exact(queryset):
+    return dict(queryset.annotate(
+        count=Count('recipe', filter=Q(recipe__is_published=True))
+    ).filter(count__gt=0).values_list('pk', 'count'))
+
+
+def stored(model):
+    return dict(model.objects.filter(published__gt=0).values_list(
+        'pk', 'published'
+    ))
+
+
+class RecipeCountersTest(test.APITestCase, RecipeMixin):
+    def setUp(self):
+        self.author = self.make_author()
+        self.category, self.other_category = (
+            Category.objects.create(name=name) for name in ('Doces', 'Salgados')
+        )
+        self.sweet, self.cake, self.salty = (
+            Tag.objects.create(name=name) for name in ('Doce', 'Bolo', 'Sal')
+        )
+        return super().setUp()
+
+    def create(self, title, *tags, is_published=True, category=None):
+        recipe = Recipe.objects.create(
+            title=title, description='Descrição', preparation_time=10,
+            preparation_time_unit='Minutos', servings=2,
+            servings_unit='Porções', preparation_steps='Passos',
+            is_published=is_published, author=self.author,
+            category=category or self.category,
+        )
+        recipe.tags.add(*tags)
+        return recipe
+
+    def assertCountersExact(self):
+        self.assertEqual(stored(TagRecipeCount), exact(Tag.objects.all()))
+        self.assertEqual(
+            stored(CategoryRecipeCount), exact(Category.objects.all())
+        )
+
+    def test_tag_changes_on_the_recipe_side(self):
+        recipe = self.create('Bolo', self.sweet, self.cake)
+        self.create('Rascunho', self.sweet, is_published=False)
+        self.assertEqual(stored(TagRecipeCount), {
+            self.sweet.pk: 1, self.cake.pk: 1,
+        })
+
+        recipe.tags.remove(self.cake, self.salty) # a tag Sal não estava ligada
+        self.assertCountersExact()
+        recipe.tags.set([self.salty])
+        self.assertCountersExact()
+        recipe.tags.clear()
+        self.assertCountersExact()
+
+    def test_tag_changes_on_the_tag_side(self):
+        recipes = [self.create(f'Receita {i}') for i in range(3)]
+        draft = self.create('Rascunho', is_published=False)
+
+        self.sweet.recipe_set.add(*recipes, draft)
+        self.assertEqual(stored(TagRecipeCount), {self.sweet.pk: 3})
+        self.sweet.recipe_set.remove(recipes[0], draft)
+        self.assertCountersExact()
+        self.sweet.recipe_set.clear()
+        self.assertCountersExact()
+
+    def test_publish_unpublish_and_category_change(self):
+        recipe = self.create('Bolo', self.sweet, is_published=False)
+        recipe = Recipe.objects.get(pk=recipe.pk)
+
+        recipe.is_published = True
+        recipe.save()
+        self.assertEqual(stored(TagRecipeCount), {self.sweet.pk: 1})
+        self.assertEqual(stored(CategoryRecipeCount), {self.category.pk: 1})
+
+        recipe.category = self.other_category
+        recipe.save()
+        self.assertCountersExact()
+
+        recipe.is_published = False
+        recipe.save()
+        self.assertCountersExact()
+        self.assertEqual(stored(TagRecipeCount), {})
+
+    def test_refreshed_instance_counts_from_the_new_state(self):
+        recipe = self.create('Bolo', self.sweet, is_published=False)
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        other = Recipe.objects.get(pk=recipe.pk)
+        other.is_published = True
+        other.save()
+
+        recipe.refresh_from_db()
+        recipe.is_published = False
+        recipe.save()
+        self.assertCountersExact()
+        self.assertEqual(stored(TagRecipeCount), {})
+
+    def test_fields_left_out_of_update_fields_are_not_counted(self):
+        recipe = self.create('Bolo', self.sweet)
+        recipe.is_published = False
+        recipe.title = 'Outro título'
+        recipe.save(update_fields=['title'])
+        self.assertEqual(stored(TagRecipeCount), {self.sweet.pk: 1})
+
+    def test_hand_built_instance_reads_the_old_state(self):
+        recipe = self.create('Bolo', self.sweet)
+        Recipe.objects.filter(pk=recipe.pk).update(is_published=True)
+
+        hand_built = Recipe.objects.defer('is_published').get(pk=recipe.pk)
+        hand_built.is_published = False
+        hand_built.save()
+        self.assertCountersExact()
+
+    def test_delete(self):
+        recipe = self.create('Bolo', self.sweet, self.cake)
+        self.create('Pudim', self.sweet)
+        recipe.delete()
+        self.assertCountersExact()
+
+        Recipe.objects.all().delete()
+        self.assertEqual(stored(TagRecipeCount), {})
+        self.assertEqual(stored(CategoryRecipeCount), {})
+
+    def test_tags_created_in_bulk_get_a_counter(self):
+        ids, _ = Tag.objects.upsert(['Nova'])
+        self.create('Bolo', Tag.objects.get(pk=ids['Nova']))
+        self.assertEqual(stored(TagRecipeCount), {ids['Nova']: 1})
+
+    def test_bulk_api_keeps_the_counters_exact(self):
+        self.client.force_authenticate(self.author)
+        url = reverse('recipes:recipes-api-bulk')
+        response = self.client.post(url, [
+            {
+                'title': f'Lote {i}', 'description': 'Descrição',
+                'preparation_time': 10, 'preparation_time_unit': 'Minutos',
+                'servings': 2, 'servings_unit': 'Porções',
+                'preparation_steps': 'Passos', 'public': i % 2 == 0,
+                'category': self.category.pk, 'tags': [self.sweet.pk],
+            }
+            for i in range(4)
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertCountersExact()
+
+        response = self.client.patch(url, [
+            {'id': item['id'], 'public': True, 'tags': [self.cake.pk],
+             'category': self.other_category.pk}
+            for item in response.data['results'][:3]
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertCountersExact()
+
+    def test_reconcile_fixes_drift(self):
+        self.create('Bolo', self.sweet, self.cake)
+        # UPDATE sem signals
+        Recipe.objects.update(is_published=False)
+        TagRecipeCount.objects.filter(pk=self.cake.pk).delete()
+
+        out = StringIO()
+        call_command('reconcile_recipe_counts', stdout=out)
+        self.assertIn('3 tag counters and 2 category counters fixed', out.getvalue())
+        self.assertCountersExact()
+        self.assertEqual(reconcile_tag_counts(), 0)
+
+
+class TagCloudAPITest(test.APITestCase, RecipeMixin):
+    url = reverse('recipes:tags-cloud')
+
+    def setUp(self):
+        author = self.make_author()
+        self.sweet, self.cake, self.salty, self.unused = (
+            Tag.objects.create(name=name)
+            for name in ('Doce', 'Bolo', 'Sal', 'Sem uso')
+        )
+        for i, tags in enumerate((
+            [self.sweet, self.cake], [self.sweet, self.salty], [self.sweet],
+        )):
+            recipe = Recipe.objects.create(
+                title=f'Receita {i}', description='Descrição',
+                preparation_time=10, preparation_time_unit='Minutos',
+                servings=2, servings_unit='Porções',
+                preparation_steps='Passos', is_published=True, author=author,
+            )
+            recipe.tags.add(*tags)
+        return super().setUp()
+
+    def test_cloud_is_sorted_by_count_then_name(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(tag['name'], tag['count']) for tag in response.data],
+            [('Doce', 3), ('Bolo', 1), ('Sal', 1)],
+        )
+        self.assertEqual(response.data[0]['slug'], self.sweet.slug)
+
+    def test_cloud_reads_only_the_counter_table(self):
+        with self.assertNumQueries(1) as ctx:
+            self.client.get(self.url)
+        self.assertIn('recipes_tagrecipecount', ctx.captured_queries[0]['sql'])
+        self.assertNotIn('recipes_recipe_tags', ctx.captured_queries[0]['sql'])
+
+    def test_cloud_limit(self):
+        response = self.client.get(self.url, {'limit': 1})
+        self.assertEqual([tag['name'] for tag in response.data], ['Doce'])
+        for limit in ('0', 'abc', '201'):
+            response = self.client.get(self.url, {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+
+    def test_cloud_is_cached_until_a_counter_changes(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+
+        Recipe.objects.first().tags.add(self.unused)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Sem uso', [tag['name'] for tag in response.data])
+
+    def test_renamed_tag_shows_the_new_name(self):
+        self.client.get(self.url)
+        self.salty.name = 'Salgado'
+        self.salty.save()
+        self.assertIn(
+            'Salgado', [tag['name'] for tag in self.client.get(self.url).data]
+        )
@@ -0,0 +1,167 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from recipes.media import MediaDeleter, media_deleter
+from recipes.models import Recipe
+
+from .test_recipe_base import RecipeTestBase
+from .test_recipe_cover_renditions import make_image_file
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, COVER_PROCESSING_WORKERS=0,
+    MEDIA_DELETION_IN_BACKGROUND=True, MEDIA_DELETION_RETRY_DELAY=0,
+)
+class RecipeCoverLifecycleTest(RecipeTestBase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        return super().tearDownClass()
+
+    def make_recipe_with_cover(self):
+        recipe = self.make_recipe()
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.cover = make_image_file()
+            recipe.save()
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        self.files = [recipe.cover.path] + [
+            recipe.cover.storage.path(rendition[extension])
+            for rendition in recipe.cover_renditions.values()
+            if isinstance(rendition, dict)
+            for extension in ('jpg', 'webp')
+        ]
+        self.assertTrue(all(os.path.exists(path) for path in self.files))
+        return recipe
+
+    def assertFilesExist(self, exist=True):
+        for path in self.files:
+            self.assertEqual(os.path.exists(path), exist, path)
+
+    def test_delete_removes_the_files_after_commit(self):
+        recipe = self.make_recipe_with_cover()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as ctx:
+                recipe.delete()
+        # nenhum SELECT da receita antes do DELETE
+        self.assertFalse(any(
+            'FROM "recipes_recipe"' in query['sql']
+            and query['sql'].startswith('SELECT')
+            for query in ctx.captured_queries
+        ))
+        self.assertFilesExist()
+
+        for callback in callbacks:
+            callback()
+        media_deleter.wait()
+        self.assertFilesExist(False)
+
+    def test_cover_change_removes_the_old_files_without_a_select(self):
+        recipe = self.make_recipe_with_cover()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                recipe.cover = make_image_file('new.jpg')
+                recipe.save()
+        media_deleter.wait()
+
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT "recipes_recipe"."id", ')
+            for query in ctx.captured_queries
+        ))
+        self.assertFilesExist(False)
+        self.assertTrue(os.path.exists(recipe.cover.path))
+
+    def test_renditions_are_found_from_a_stale_instance(self):
+        # as versões foram gravadas por update() depois de a instância ser carregada
+        recipe = self.make_recipe_with_cover()
+        stale = Recipe.objects.get(pk=recipe.pk)
+        stale._loaded_values['cover_renditions'] = {}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.delete()
+        media_deleter.wait()
+        self.assertFilesExist(False)
+
+    def test_rollback_keeps_the_files(self):
+        recipe = self.make_recipe_with_cover()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Recipe.objects.filter(pk=recipe.pk).delete()
+                raise RuntimeError
+        media_deleter.wait()
+
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
+        self.assertFilesExist()
+
+    def test_save_without_cover_change_keeps_the_files(self):
+        recipe = self.make_recipe_with_cover()
+        with patch.object(media_deleter, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.title = 'Outro título'
+                recipe.save()
+                recipe.cover = ''
+                recipe.save(update_fields=['title'])
+        submit.assert_not_called()
+
+    def test_deferred_cover_is_read_before_the_change(self):
+        recipe = self.make_recipe_with_cover()
+        deferred = Recipe.objects.defer('cover').get(pk=recipe.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deferred.cover = ''
+            deferred.save(update_fields=['cover'])
+        media_deleter.wait()
+        self.assertFilesExist(False)
+
+    @override_settings(MEDIA_DELETION_IN_BACKGROUND=False)
+    def test_without_background_thread_files_are_removed_on_commit(self):
+        recipe = self.make_recipe_with_cover()
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertFilesExist(False)
+
+
+@override_settings(
+    MEDIA_DELETION_RETRIES=2, MEDIA_DELETION_RETRY_DELAY=0,
+    MEDIA_DELETION_BATCH_SIZE=2,
+)
+class MediaDeleterTest(RecipeTestBase):
+    def test_failed_deletions_are_retried(self):
+        failures = {'a': 1, 'b': 3}
+
+        class Storage:
+            def delete(self, name):
+                if failures[name]:
+                    failures[name] -= 1
+                    raise OSError(name)
+
+        deleter = MediaDeleter(storage=Storage())
+        with self.assertLogs('recipes.media', 'WARNING') as logs:
+            failed = deleter.delete(['a', 'b'])
+
+        # a: falha e passa na segunda; b: falha nas três tentativas
+        self.assertEqual(failed, ['b'])
+        self.assertIn('Could not delete media file b', logs.output[-1])
+
+    def test_background_thread_deletes_in_batches(self):
+        deleter = MediaDeleter()
+        batches = []
+        deleter.delete = lambda names: batches.append(list(names))
+
+        deleter.queue.put('a')
+        deleter.queue.put('b')
+        deleter.submit(['c'])
+        deleter.wait()
+
+        self.assertEqual(sorted(sum(batches, [])), ['a', 'b', 'c'])
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from recipes.images import process_cover
+from recipes.models import Recipe
+
+from .test_recipe_base import RecipeTestBase
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image_file(name='cover.jpg', size=(2000, 1000)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, COVER_PROCESSING_WORKERS=0)
+class RecipeCoverRenditionsTest(RecipeTestBase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        return super().tearDownClass()
+
+    def make_recipe_with_cover(self, size=(2000, 1000)):
+        recipe = self.make_recipe()
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.cover = make_image_file(size=size)
+            recipe.save()
+        recipe.refresh_from_db()
+        return recipe
+
+    def test_save_only_stores_original_and_processes_after_commit(self):
+        recipe = self.make_recipe()
+
+        with patch('recipes.images.process_cover') as process:
+            with self.captureOnCommitCallbacks() as callbacks:
+                recipe.cover = make_image_file()
+                recipe.save()
+            process.assert_not_called()
+
+            for callback in callbacks:
+                callback()
+            process.assert_called_once_with(recipe.pk)
+
+        with Image.open(recipe.cover.path) as original:
+            self.assertEqual(original.size, (2000, 1000))
+
+    def test_renditions_are_generated_in_jpg_and_webp(self):
+        recipe = self.make_recipe_with_cover()
+        renditions = recipe.cover_renditions
+
+        self.assertEqual(renditions['source'], recipe.cover.name)
+        for name, width in (('thumbnail', 320), ('card', 840), ('full', 1600)):
+            self.assertEqual(renditions[name]['width'], width)
+            for extension in ('jpg', 'webp'):
+                path = os.path.join(MEDIA_ROOT, renditions[name][extension])
+                with Image.open(path) as image:
+                    self.assertEqual(image.size, (width, width // 2))
+
+    def test_small_cover_is_not_upscaled(self):
+        recipe = self.make_recipe_with_cover(size=(400, 200))
+        self.assertEqual(recipe.cover_renditions['thumbnail']['width'], 320)
+        self.assertEqual(recipe.cover_renditions['original']['width'], 400)
+        self.assertNotIn('card', recipe.cover_renditions)
+        self.assertNotIn('full', recipe.cover_renditions)
+
+    def test_srcset_has_one_candidate_per_width(self):
+        recipe = self.make_recipe_with_cover(size=(300, 200))
+        srcset = recipe.get_cover_srcset()
+        self.assertEqual(srcset.count('300w'), 1)
+        self.assertEqual(srcset.count(','), 0)
+
+    def test_save_without_cover_change_does_not_reprocess(self):
+        recipe = self.make_recipe_with_cover()
+
+        with patch('recipes.models.schedule_cover_processing') as schedule:
+            recipe.title = 'Another title'
+            recipe.save()
+            schedule.assert_not_called()
+
+    def test_stale_result_is_discarded_when_cover_changes(self):
+        recipe = self.make_recipe_with_cover()
+        stale = {'source': recipe.cover.name}
+
+        def cover_changed_while_processing(cover_name):
+            Recipe.objects.filter(pk=recipe.pk).update(cover='recipes/new.jpg')
+            return stale
+
+        with patch(
+            'recipes.images.make_renditions',
+            side_effect=cover_changed_while_processing,
+        ), patch('recipes.images.delete_renditions') as delete:
+            self.assertIsNone(process_cover(recipe.pk))
+            delete.assert_called_once_with(stale)
+
+    def test_template_renders_srcset(self):
+        self.make_recipe_with_cover()
+        content = self.client.get(reverse('recipes:home')).content.decode()
+        self.assertIn('type="image/webp"', content)
+        self.assertIn('-card.webp 840w', content)
+        self.assertIn('-thumbnail.jpg 320w', content)
+
+    def test_template_falls_back_to_original_before_processing(self):
+        recipe = self.make_recipe()
+        recipe.cover = make_image_file()
+        recipe.save()
+        content = self.client.get(reverse('recipes:home')).content.decode()
+        self.assertIn(recipe.cover.url, content)
+        self.assertNotIn('srcset', content)
+
+    def test_process_covers_command_processes_pending_covers(self):
+        recipe = self.make_recipe()
+        recipe.cover = make_image_file()
+        recipe.save()
+        self.assertTrue(recipe.cover_needs_processing)
+
+        call_command('process_covers', stdout=StringIO())
+        recipe.refresh_from_db()
+        self.assertFalse(recipe.cover_needs_processing)
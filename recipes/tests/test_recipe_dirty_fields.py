@@ -0,0 +1,189 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import test
+
+from recipes.models import Recipe
+
+from .test_recipe_base import RecipeMixin, RecipeTestBase
+
+
+def update_sql(ctx):
+    '''
+    SQL dos UPDATEs da tabela das receitas capturados no `ctx`.
+    '''
+    return [
+        query['sql'] for query in ctx.captured_queries
+        if query['sql'].startswith('UPDATE "recipes_recipe"')
+    ]
+
+
+def updated_columns(sql):
+    columns = sql.split(' SET ', 1)[1].split(' WHERE ', 1)[0]
+    return {column.split(' = ')[0].strip('"') for column in columns.split(', ')}
+
+
+class RecipeDirtyFieldsTest(RecipeTestBase):
+    def setUp(self):
+        recipe = self.make_recipe()
+        self.recipe = Recipe.objects.get(pk=recipe.pk)
+        return super().setUp()
+
+    def save(self, recipe, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            recipe.save(**kwargs)
+        sql = update_sql(ctx)
+        self.assertEqual(len(sql), 1, sql)
+        return updated_columns(sql[0])
+
+    def test_loaded_recipe_has_no_dirty_fields(self):
+        self.assertEqual(self.recipe.get_dirty_fields(), set())
+
+    def test_dirty_fields_are_the_changed_ones(self):
+        self.recipe.title = 'Outro título'
+        self.recipe.is_published = self.recipe.is_published
+        self.recipe.category = None
+        self.assertEqual(
+            self.recipe.get_dirty_fields(), {'title', 'category'}
+        )
+
+    def test_hand_built_recipe_is_not_tracked(self):
+        self.assertIsNone(Recipe(pk=self.recipe.pk).get_dirty_fields())
+
+    def test_save_updates_only_the_changed_columns(self):
+        self.recipe.is_published = False
+        self.assertEqual(
+            self.save(self.recipe), {'is_published', 'updated_at'}
+        )
+        self.assertEqual(self.recipe.get_dirty_fields(), set())
+
+    def test_save_without_changes_updates_only_updated_at(self):
+        self.assertEqual(self.save(self.recipe), {'updated_at'})
+
+    def test_json_changed_in_place_is_dirty(self):
+        self.recipe.cover_renditions['source'] = 'x.jpg'
+        self.assertEqual(self.recipe.get_dirty_fields(), {'cover_renditions'})
+
+    def test_fields_left_out_of_update_fields_stay_dirty(self):
+        self.recipe.title = 'Outro título'
+        self.recipe.description = 'Outra descrição'
+        self.recipe.save(update_fields=['title'])
+        self.assertEqual(self.recipe.get_dirty_fields(), {'description'})
+
+    def test_assigned_deferred_field_is_saved(self):
+        recipe = Recipe.objects.only('id', 'title').get(pk=self.recipe.pk)
+        recipe.description = 'Outra descrição'
+        self.assertIn('description', self.save(recipe))
+        recipe.refresh_from_db(fields=['description'])
+        self.assertEqual(recipe.description, 'Outra descrição')
+
+    def test_refreshed_values_are_the_loaded_ones(self):
+        self.recipe.is_published = False
+        self.recipe.save()
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+
+        # publicada por outra instância
+        other = Recipe.objects.get(pk=self.recipe.pk)
+        other.is_published = True
+        other.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.get_dirty_fields(), set())
+        recipe.is_published = False
+        self.assertEqual(self.save(recipe), {'is_published', 'updated_at'})
+        self.assertFalse(
+            Recipe.objects.filter(pk=recipe.pk, is_published=True).exists()
+        )
+
+    def test_deferred_field_read_is_not_dirty(self):
+        recipe = Recipe.objects.only('id', 'title').get(pk=self.recipe.pk)
+        recipe.description
+        self.assertEqual(recipe.get_dirty_fields(), set())
+
+    def test_author_change_updates_the_author_name(self):
+        self.recipe.author = self.make_author(username='outro')
+        self.assertEqual(
+            self.save(self.recipe),
+            {'author_id', 'author_full_name', 'updated_at'},
+        )
+
+    def test_cover_is_processed_only_when_it_changes(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(cover='old.jpg')
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+
+        with patch('recipes.models.schedule_cover_processing') as schedule:
+            recipe.is_published = False
+            recipe.save()
+            schedule.assert_not_called()
+
+            recipe.cover = 'new.jpg'
+            recipe.save()
+            schedule.assert_called_once_with(recipe.pk)
+
+
+class RecipeDirtyFieldsViewsTest(test.APITestCase, RecipeMixin):
+    def setUp(self):
+        self.recipe = self.make_recipe()
+        self.author = self.recipe.author
+        return super().setUp()
+
+    def test_api_partial_update_writes_only_the_sent_fields(self):
+        self.client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(
+                reverse('recipes:recipes-api-detail', args=(self.recipe.pk,)),
+                {'public': False}, format='json',
+            )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        sql = update_sql(ctx)
+        self.assertEqual(len(sql), 1, sql)
+        self.assertEqual(updated_columns(sql[0]), {'is_published', 'updated_at'})
+
+    def test_dashboard_writes_only_the_changed_fields(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(is_published=False)
+        self.client.force_login(self.author)
+        data = {
+            field: getattr(self.recipe, field) for field in (
+                'title', 'description', 'preparation_time',
+                'preparation_time_unit', 'servings', 'servings_unit',
+                'preparation_steps',
+            )
+        }
+        data['description'] = 'Outra descrição'
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse('authors:dashboard_recipe_edit', args=(self.recipe.pk,)),
+                data,
+            )
+
+        self.assertEqual(response.status_code, 302)
+        sql = update_sql(ctx)
+        self.assertEqual(len(sql), 1, sql)
+        self.assertEqual(updated_columns(sql[0]), {'description', 'updated_at'})
+
+    @override_settings(COVER_PROCESSING_WORKERS=0)
+    def test_admin_list_editable_toggle_writes_only_is_published(self):
+        self.client.force_login(User.objects.create_superuser(
+            'admin', 'admin@email.com', '123456'
+        ))
+        data = {
+            'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1,
+            'form-0-id': self.recipe.pk, # is_published desmarcado
+            '_save': 'Save',
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse('admin:recipes_recipe_changelist'), data
+            )
+
+        self.assertEqual(response.status_code, 302)
+        sql = update_sql(ctx)
+        self.assertEqual(len(sql), 1, sql)
+        self.assertEqual(updated_columns(sql[0]), {'is_published', 'updated_at'})
@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import test
+from tag.models import Tag
+
+from recipes.export import iter_catalog
+from recipes.models import Recipe
+from recipes.tests.test_recipe_base import RecipeMixin
+
+
+class RecipeExportTest(test.APITestCase, RecipeMixin):
+    url = reverse('recipes:recipes-api-export')
+
+    def read_lines(self, response):
+        content = b''.join(response.streaming_content).decode('utf-8')
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_export_streams_published_recipes_as_ndjson(self):
+        recipes = self.make_recipe_in_batch(qtd=3)
+        Recipe.objects.filter(pk=recipes[1].pk).update(is_published=False)
+        tag = Tag.objects.create(name='Doce')
+        recipes[0].tags.add(tag)
+
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        lines = self.read_lines(response)
+        self.assertEqual(
+            [line['id'] for line in lines], [recipes[0].pk, recipes[2].pk]
+        )
+        self.assertEqual(lines[0]['tags'], [tag.pk])
+        self.assertEqual(
+            lines[0]['tags_links'],
+            ['http://testserver' + reverse('recipes:tags-detail', args=(tag.pk,))],
+        )
+
+    def test_export_has_the_same_fields_as_the_api(self):
+        recipe = self.make_recipe()
+        detail = self.client.get(
+            reverse('recipes:recipes-api-detail', args=(recipe.pk,))
+        )
+        lines = self.read_lines(self.client.get(self.url))
+        self.assertEqual(lines, [json.loads(detail.content)])
+
+    def test_export_filters_by_updated_since(self):
+        old, new = self.make_recipe_in_batch(qtd=2)
+        Recipe.objects.filter(pk=old.pk).update(
+            updated_at=timezone.now() - timedelta(days=10)
+        )
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+
+        lines = self.read_lines(self.client.get(self.url + f'?updated_since={since}'))
+        self.assertEqual([line['id'] for line in lines], [new.pk])
+
+    def test_export_rejects_invalid_updated_since(self):
+        response = self.client.get(self.url + '?updated_since=yesterday')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('updated_since', response.data)
+
+    def test_tags_are_fetched_once_per_chunk(self):
+        recipes = self.make_recipe_in_batch(qtd=5)
+        tag = Tag.objects.create(name='Doce')
+        for recipe in recipes:
+            recipe.tags.add(tag)
+
+        # receitas + 3 blocos de tags
+        with self.assertNumQueries(4):
+            exported = list(iter_catalog({}, chunk_size=2))
+        self.assertEqual(len(exported), 5)
+
+    def test_export_command_writes_ndjson_file(self):
+        self.make_recipe_in_batch(qtd=2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recipes.ndjson')
+            call_command(
+                'export_recipes', output=path,
+                base_url='https://example.com/', stderr=StringIO(),
+            )
+            with open(path, encoding='utf-8') as output:
+                lines = [json.loads(line) for line in output]
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]['title'], 'Recipe Title 0')
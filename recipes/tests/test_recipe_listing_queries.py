@@ -0,0 +1,86 @@
+import pytest
+from django.urls import reverse
+from tag.models import Tag
+
+from recipes.counters import reconcile_category_counts
+from recipes.models import Recipe
+
+from .test_recipe_base import RecipeTestBase
+
+
+class RecipeListingQueriesTest(RecipeTestBase):
+    '''
+    Página de categoria/tag: contador + página + prefetch das tags, mesmo com
+    várias receitas.
+    '''
+    def make_recipes_with_tag(self, qtd, tag):
+        recipes = self.make_recipe_in_batch(qtd=qtd)
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        return recipes
+
+    def test_category_page_runs_a_fixed_number_of_queries(self):
+        recipes = self.make_recipe_in_batch(qtd=10)
+        Recipe.objects.update(category=recipes[0].category)
+        # o update() não passa pelos signals dos contadores
+        reconcile_category_counts()
+        url = reverse('recipes:category', args=(recipes[0].category_id,))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertIn('Category - ', response.context['title'])
+        self.assertEqual(response.context['recipes'].paginator.count, 10)
+
+    def test_empty_category_page_returns_404_after_the_counter_only(self):
+        category = self.make_category()
+        url = reverse('recipes:category', args=(category.id,))
+        # a primeira leitura cria a linha do contador
+        self.client.get(url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_tag_page_runs_a_fixed_number_of_queries(self):
+        tag = Tag.objects.create(name='Doce')
+        self.make_recipes_with_tag(10, tag)
+        url = reverse('recipes:tag', args=(tag.slug,))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.context['page_title'], 'Doce - Tag |')
+        self.assertEqual(response.context['recipes'].paginator.count, 10)
+
+    def test_empty_tag_page_still_shows_tag_name(self):
+        tag = Tag.objects.create(name='Doce')
+        response = self.client.get(reverse('recipes:tag', args=(tag.slug,)))
+        self.assertEqual(response.context['page_title'], 'Doce - Tag |')
+
+    def test_unknown_tag_page_shows_no_recipes_found(self):
+        response = self.client.get(reverse('recipes:tag', args=('nope',)))
+        self.assertEqual(
+            response.context['page_title'], 'No recipes found - Tag |'
+        )
+
+
+@pytest.mark.slow
+class RecipeLargeCategoryTest(RecipeTestBase):
+    def test_category_with_50k_recipes(self):
+        recipe = self.make_recipe()
+        Recipe.objects.bulk_create((
+            Recipe(
+                title=f'Recipe {i}', slug=f'large-category-{i}',
+                category=recipe.category, author=recipe.author,
+                is_published=True,
+            )
+            for i in range(50_000)
+        ), batch_size=2000)
+        reconcile_category_counts([recipe.category_id])
+        url = reverse('recipes:category', args=(recipe.category_id,))
+
+        # o total vem do contador: nenhuma página faz COUNT(*)
+        with self.assertNumQueries(3):
+            response = self.client.get(url + '?page=5000')
+
+        self.assertEqual(response.context['recipes'].paginator.count, 50_001)
+        self.assertEqual(response.context['recipes'].number, 5000)
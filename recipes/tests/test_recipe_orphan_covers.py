@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from recipes.images import rendition_name
+from recipes.media import OrphanCovers, walk_files
+from recipes.models import Recipe
+
+from .test_recipe_base import RecipeTestBase
+
+DAY = 'recipes/covers/2024/01/02'
+OLD = time.time() - 3 * 24 * 3600
+
+
+@override_settings(
+    MEDIA_DELETION_RETRY_DELAY=0, COVER_RENDITIONS={'thumbnail': 320}
+)
+class RecipeOrphanCoversTest(RecipeTestBase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.used = [f'{DAY}/bolo.jpg', f'{DAY}/bolo-2.jpg', 'recipes/covers/old.png']
+        for number, cover in enumerate(self.used):
+            Recipe.objects.create(
+                title=f'Receita {number}', slug=f'receita-{number}',
+                cover=cover,
+            )
+        self.used += [
+            rendition_name(cover, 'thumbnail', extension)
+            for cover in self.used for extension in ('jpg', 'webp')
+        ]
+        self.orphans = [
+            f'{DAY}/bolo-3.jpg', f'{DAY}/bolo/extra.jpg',
+            'recipes/covers/2023/12/31/apagada.jpg',
+            rendition_name(f'{DAY}/apagada.jpg', 'thumbnail', 'jpg'),
+            rendition_name('recipes/covers/velha.png', 'card', 'webp'),
+        ]
+        for name in self.used + self.orphans:
+            self.touch(name)
+        return super().setUp()
+
+    def touch(self, name, mtime=OLD):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(b'x' * 10)
+        os.utime(path, (mtime, mtime))
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_walk_files_is_sorted_like_the_full_paths(self):
+        names = list(walk_files(self.media_root, self.media_root))
+        self.assertEqual(names, sorted(self.used + self.orphans))
+
+    def test_finds_only_unreferenced_files(self):
+        for chunk_size in (1, 2, 2000):
+            with self.subTest(chunk_size=chunk_size):
+                orphans = OrphanCovers(chunk_size=chunk_size)
+                self.assertEqual(sorted(orphans), sorted(self.orphans))
+                self.assertEqual(
+                    orphans.scanned, len(self.used) + len(self.orphans)
+                )
+
+    def test_dry_run_only_reports(self):
+        out = StringIO()
+        call_command('collect_orphan_covers', verbosity=2, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn(f'{len(self.orphans)} orphans', output)
+        self.assertIn('dry-run', output)
+        self.assertIn(f'{DAY}/bolo-3.jpg', output)
+        self.assertTrue(all(self.exists(name) for name in self.orphans))
+
+    def test_delete_removes_the_orphans(self):
+        out = StringIO()
+        call_command(
+            'collect_orphan_covers', delete=True, max_rate=0, stdout=out
+        )
+
+        self.assertIn(f'{len(self.orphans)} deleted, 0 failed', out.getvalue())
+        self.assertFalse(any(self.exists(name) for name in self.orphans))
+        self.assertTrue(all(self.exists(name) for name in self.used))
+
+    def test_recent_files_are_kept(self):
+        self.touch(f'{DAY}/upload-em-andamento.jpg', mtime=time.time())
+        out = StringIO()
+        call_command('collect_orphan_covers', delete=True, stdout=out)
+
+        self.assertIn('1 recent files skipped', out.getvalue())
+        self.assertTrue(self.exists(f'{DAY}/upload-em-andamento.jpg'))
+
+    def test_deletions_are_rate_limited(self):
+        start = time.perf_counter()
+        call_command(
+            'collect_orphan_covers', delete=True, max_rate=25,
+            stdout=StringIO(),
+        )
+        self.assertGreaterEqual(
+            time.perf_counter() - start, len(self.orphans) / 25
+        )
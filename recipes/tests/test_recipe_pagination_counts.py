@@ -0,0 +1,124 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from tag.models import Tag
+
+from .test_recipe_base import RecipeTestBase
+
+
+class RecipePaginationCountTest(RecipeTestBase):
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        count_queries = [
+            query['sql'] for query in ctx.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+        return response, count_queries
+
+    def test_home_count_is_cached(self):
+        self.make_recipe_in_batch(qtd=3)
+        url = reverse('recipes:home')
+
+        response, first = self.count_queries(url)
+        response, second = self.count_queries(url)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+        self.assertEqual(response.context['recipes'].paginator.count, 3)
+
+    def test_publish_and_unpublish_invalidate_home_and_category_count(self):
+        recipe = self.make_recipe()
+        home_url = reverse('recipes:home')
+        category_url = reverse('recipes:category', args=(recipe.category_id,))
+        self.client.get(home_url)
+        self.client.get(category_url)
+
+        recipe.is_published = False
+        recipe.save()
+        response = self.client.get(home_url)
+        self.assertEqual(response.context['recipes'].paginator.count, 0)
+
+        recipe.is_published = True
+        recipe.save()
+        response = self.client.get(category_url)
+        self.assertEqual(response.context['recipes'].paginator.count, 1)
+
+    def test_edit_that_keeps_counts_does_not_invalidate(self):
+        recipe = self.make_recipe()
+        url = reverse('recipes:home')
+        self.client.get(url)
+
+        recipe.refresh_from_db()
+        recipe.title = 'Another title'
+        recipe.save()
+
+        _, count_queries = self.count_queries(url)
+        self.assertEqual(count_queries, [])
+
+    def test_delete_invalidates_home_count(self):
+        recipes = self.make_recipe_in_batch(qtd=2)
+        url = reverse('recipes:home')
+        self.client.get(url)
+
+        recipes[0].delete()
+
+        response = self.client.get(url)
+        self.assertEqual(response.context['recipes'].paginator.count, 1)
+
+    def test_tag_changes_invalidate_tag_count(self):
+        recipe = self.make_recipe()
+        tag = Tag.objects.create(name='Doce')
+        url = reverse('recipes:tag', args=(tag.slug,))
+        self.client.get(url)
+
+        recipe.tags.add(tag)
+        response = self.client.get(url)
+        self.assertEqual(response.context['recipes'].paginator.count, 1)
+
+        recipe.tags.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.context['recipes'].paginator.count, 0)
+
+        recipe.tags.add(tag)
+        self.client.get(url)
+        recipe.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.context['recipes'].paginator.count, 0)
+
+    def test_category_and_tag_counts_come_from_the_counters(self):
+        recipe = self.make_recipe()
+        tag = Tag.objects.create(name='Doce')
+        recipe.tags.add(tag)
+
+        for url in (
+            reverse('recipes:category', args=(recipe.category_id,)),
+            reverse('recipes:tag', args=(tag.slug,)),
+        ):
+            response, count_queries = self.count_queries(url)
+            self.assertEqual(count_queries, [], url)
+            self.assertEqual(
+                response.context['recipes'].paginator.count, 1, url
+            )
+
+    def test_search_count_is_capped(self):
+        self.make_recipe_in_batch(qtd=8)
+        url = reverse('recipes:search') + '?q=recipe'
+
+        with patch('recipes.views.site.PER_PAGE', new=1), \
+                self.settings(PAGINATION_COUNT_CAP=1):
+            response = self.client.get(url)
+
+        # página 1 + janela de 4 páginas
+        self.assertEqual(response.context['recipes'].paginator.count, 5)
+        self.assertTrue(response.context['pagination_range']['count_is_estimate'])
+
+    def test_search_count_is_exact_below_the_cap(self):
+        self.make_recipe_in_batch(qtd=3)
+        response = self.client.get(reverse('recipes:search') + '?q=recipe')
+        self.assertEqual(response.context['recipes'].paginator.count, 3)
+        self.assertFalse(
+            response.context['pagination_range']['count_is_estimate']
+        )
@@ -0,0 +1,103 @@
+import re
+from unittest import skipUnless
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from tag.models import Tag
+
+from recipes.models import Recipe
+
+from .test_recipe_base import RecipeTestBase
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN do SQLite')
+class RecipeQueryPlanTest(RecipeTestBase):
+    '''
+    Roda `EXPLAIN QUERY PLAN` nas queries que cada view faz na tabela de receitas e falha se alguma delas ler a tabela inteira. A query principal (a da página) também tem que usar o índice esperado.
+    '''
+    def setUp(self):
+        self.recipes = self.make_recipe_in_batch(qtd=5)
+        self.recipe = self.recipes[0]
+        self.tag = Tag.objects.create(name='Doce')
+        for recipe in self.recipes:
+            recipe.tags.add(self.tag)
+        Recipe.objects.filter(pk=self.recipes[1].pk).update(is_published=False)
+        return super().setUp()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def recipe_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT')
+            and '"recipes_recipe" ' in query['sql'] + ' '
+        ]
+
+    def assertUsesIndexes(self, url, main_index):
+        queries = self.recipe_queries(url)
+        plans = {sql: self.explain(sql) for sql in queries}
+
+        for sql, plan in plans.items():
+            for detail in plan:
+                self.assertIsNone(
+                    FULL_SCAN.match(detail),
+                    f'Full scan in {url}:\n{sql}\n{plan}',
+                )
+
+        main_plans = [
+            plan for sql, plan in plans.items() if 'ORDER BY' in sql
+            or 'LIMIT' in sql
+        ]
+        self.assertTrue(
+            any(main_index in detail for plan in main_plans for detail in plan),
+            f'{main_index} not used in {url}: {main_plans}',
+        )
+
+    def test_home(self):
+        self.assertUsesIndexes(
+            reverse('recipes:home'), 'recipe_published_id_idx'
+        )
+
+    def test_category_page(self):
+        self.assertUsesIndexes(
+            reverse('recipes:category', args=(self.recipe.category_id,)),
+            'recipe_published_category_idx',
+        )
+
+    def test_tag_page(self):
+        self.assertUsesIndexes(
+            reverse('recipes:tag', args=(self.tag.slug,)),
+            'recipe_tags_tag_recipe_idx',
+        )
+
+    def test_api_v2_list(self):
+        url = reverse('recipes:recipes-api-list')
+        self.assertUsesIndexes(url, 'recipe_published_id_idx')
+        self.assertUsesIndexes(
+            url + f'?category_id={self.recipe.category_id}',
+            'recipe_published_category_idx',
+        )
+        self.assertUsesIndexes(
+            url + f'?author_id={self.recipe.author_id}',
+            'recipe_published_author_idx',
+        )
+        self.assertUsesIndexes(
+            url + f'?tags_ids={self.tag.pk}', 'recipe_tags_tag_recipe_idx'
+        )
+
+    def test_dashboard(self):
+        self.client.force_login(self.recipe.author)
+        queries = self.recipe_queries(reverse('authors:dashboard'))
+        plan = self.explain(queries[-1])
+        self.assertTrue(
+            any('recipe_draft_author_idx' in detail for detail in plan), plan
+        )
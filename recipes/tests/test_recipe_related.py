@@ -0,0 +1,301 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import test
+from tag.models import Tag
+
+from recipes.models import Recipe, RelatedRecipes
+from recipes.related import (SimilarityIndex, get_related_recipes,
+                             refresh_related_recipes)
+
+from .test_recipe_base import RecipeMixin
+
+
+def make_index(recipes, **kwargs):
+    '''
+    `recipes`: lista de `(id, category_id, [tag_ids])`.
+    '''
+    tag_indptr, tag_indices = [0], []
+    for _, _, tag_ids in recipes:
+        tag_indices.extend(tag_ids)
+        tag_indptr.append(len(tag_indices))
+    return SimilarityIndex(
+        [recipe_id for recipe_id, _, _ in recipes],
+        [category_id for _, category_id, _ in recipes],
+        tag_indptr, tag_indices, **kwargs
+    )
+
+
+def related_ids(index, recipe_id, count=5):
+    neighbours = index.neighbours(index.position(recipe_id), count)
+    return [index.recipe_ids[position] for position, _ in neighbours]
+
+
+class SimilarityIndexTest(TestCase):
+    def test_recipes_sharing_more_tags_come_first(self):
+        index = make_index([
+            (1, None, [10, 11, 12]),
+            (2, None, [10, 11, 12]),
+            (3, None, [10, 11]),
+            (4, None, [10]),
+            (5, None, [99]),
+        ])
+        self.assertEqual(related_ids(index, 1), [2, 3, 4])
+
+    def test_rare_tags_weigh_more(self):
+        index = make_index([
+            (1, None, [10, 20]),
+            (2, None, [10]), # tag comum
+            (3, None, [20]), # tag rara
+            (4, None, [10]),
+            (5, None, [10]),
+        ])
+        self.assertEqual(related_ids(index, 1)[0], 3)
+
+    def test_category_breaks_ties(self):
+        index = make_index([
+            (1, 7, [10]),
+            (2, 8, [10]),
+            (3, 7, [10]),
+        ])
+        self.assertEqual(related_ids(index, 1), [3, 2])
+
+    def test_recipe_without_tags_gets_its_category(self):
+        index = make_index([
+            (1, 7, []),
+            (2, 7, [10]),
+            (3, 8, [10]),
+        ])
+        self.assertEqual(related_ids(index, 1), [2])
+
+    def test_recipe_without_features_has_no_neighbours(self):
+        index = make_index([(1, None, []), (2, None, [10])])
+        self.assertEqual(related_ids(index, 1), [])
+
+    def test_common_tags_only_look_at_the_nearest_recipes(self):
+        recipes = [(recipe_id, None, [10]) for recipe_id in range(1, 101)]
+        index = make_index(recipes, max_postings=10)
+
+        related = related_ids(index, 50, count=20)
+        self.assertEqual(len(related), 9)
+        self.assertTrue(all(abs(recipe_id - 50) <= 10 for recipe_id in related))
+
+    def test_links_of_unknown_recipes_are_skipped(self):
+        # receitas 2 e 9 publicadas entre a query das receitas e a das tags
+        index = SimilarityIndex.from_rows(
+            [(1, None), (3, None), (5, None)],
+            [(1, 10), (2, 10), (3, 10), (3, 11), (9, 11)],
+        )
+        self.assertEqual(list(index.recipe_ids), [1, 3, 5])
+        self.assertEqual(related_ids(index, 1), [3])
+        self.assertEqual(related_ids(index, 5), [])
+
+    def test_scores_are_cosine_similarities(self):
+        index = make_index([(1, None, [10, 11]), (2, None, [10, 11])])
+        (_, score), = index.neighbours(0, 5)
+        self.assertAlmostEqual(score, 1.0)
+
+
+@override_settings(RELATED_RECIPES_COUNT=2, RELATED_RECIPES_STORED=3)
+class RelatedRecipesRefreshTest(TestCase, RecipeMixin):
+    def setUp(self):
+        self.author = self.make_author()
+        self.category = self.make_category()
+        self.sweet, self.cake, self.salty = (
+            Tag.objects.create(name=name) for name in ('Doce', 'Bolo', 'Sal')
+        )
+        self.chocolate = self.create('Bolo de chocolate', self.sweet, self.cake)
+        self.carrot = self.create('Bolo de cenoura', self.sweet, self.cake)
+        self.pudding = self.create('Pudim', self.sweet)
+        self.soup = self.create('Sopa', self.salty)
+        return super().setUp()
+
+    def create(self, title, *tags, is_published=True):
+        recipe = Recipe.objects.create(
+            title=title, description='Descrição', preparation_time=10,
+            preparation_time_unit='Minutos', servings=2,
+            servings_unit='Porções', preparation_steps='Passos',
+            is_published=is_published, author=self.author,
+        )
+        recipe.tags.add(*tags)
+        return recipe
+
+    def stored(self, recipe):
+        return RelatedRecipes.objects.get(recipe=recipe).recipe_ids
+
+    def test_full_refresh_stores_the_published_recipes(self):
+        self.create('Rascunho', self.sweet, is_published=False)
+        result = refresh_related_recipes(full=True)
+
+        self.assertEqual(result['recipes'], 4)
+        self.assertEqual(result['computed'], 4)
+        self.assertEqual(
+            self.stored(self.chocolate), [self.carrot.pk, self.pudding.pk]
+        )
+        self.assertEqual(self.stored(self.soup), [])
+
+    def test_read_keeps_the_order_and_skips_unpublished_recipes(self):
+        refresh_related_recipes(full=True)
+        published = Recipe.objects.filter(is_published=True)
+
+        self.assertEqual(
+            get_related_recipes(published, self.chocolate.pk),
+            [self.carrot, self.pudding],
+        )
+
+        Recipe.objects.filter(pk=self.carrot.pk).update(is_published=False)
+        self.assertEqual(
+            get_related_recipes(published, self.chocolate.pk), [self.pudding]
+        )
+
+    def test_read_without_a_stored_list_returns_nothing(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_related_recipes(
+                Recipe.objects.all(), self.chocolate.pk
+            ), [])
+
+    def test_tag_change_marks_the_recipe_stale(self):
+        refresh_related_recipes(full=True)
+
+        self.soup.tags.add(self.sweet)
+        self.assertTrue(RelatedRecipes.objects.get(recipe=self.soup).stale)
+
+        result = refresh_related_recipes()
+        self.assertEqual(result['computed'], 1)
+        self.assertFalse(RelatedRecipes.objects.filter(stale=True).exists())
+        self.assertIn(self.pudding.pk, self.stored(self.soup))
+        # a sopa também entra na lista do pudim, que não foi recalculada
+        self.assertIn(self.soup.pk, self.stored(self.pudding))
+
+    def test_tag_side_changes_mark_the_recipes_stale(self):
+        refresh_related_recipes(full=True)
+
+        self.salty.recipe_set.add(self.pudding)
+        self.assertEqual(set(RelatedRecipes.objects.filter(
+            stale=True
+        ).values_list('recipe_id', flat=True)), {self.pudding.pk})
+
+        refresh_related_recipes()
+        self.sweet.delete()
+        self.assertEqual(set(RelatedRecipes.objects.filter(
+            stale=True
+        ).values_list('recipe_id', flat=True)), {
+            self.chocolate.pk, self.carrot.pk, self.pudding.pk
+        })
+
+    def test_category_change_marks_the_recipe_stale(self):
+        refresh_related_recipes(full=True)
+        recipe = Recipe.objects.get(pk=self.soup.pk)
+
+        recipe.title = 'Sopa de legumes'
+        recipe.save()
+        self.assertFalse(RelatedRecipes.objects.get(recipe=recipe).stale)
+
+        recipe.category = self.category
+        recipe.save()
+        self.assertTrue(RelatedRecipes.objects.get(recipe=recipe).stale)
+
+    def test_new_recipe_is_computed_and_added_to_its_neighbours(self):
+        refresh_related_recipes(full=True)
+        brownie = self.create('Brownie', self.sweet, self.cake)
+
+        result = refresh_related_recipes()
+        self.assertEqual(result['computed'], 1)
+        self.assertEqual(
+            self.stored(brownie)[:2], [self.carrot.pk, self.chocolate.pk]
+        )
+        self.assertEqual(
+            self.stored(self.chocolate)[:2], [brownie.pk, self.carrot.pk]
+        )
+
+    def test_unpublished_recipe_list_is_removed(self):
+        refresh_related_recipes(full=True)
+        recipe = Recipe.objects.get(pk=self.pudding.pk)
+        recipe.is_published = False
+        recipe.save()
+
+        result = refresh_related_recipes()
+        self.assertEqual(result['deleted'], 1)
+        self.assertFalse(RelatedRecipes.objects.filter(recipe=recipe).exists())
+
+    def test_failed_refresh_keeps_the_stale_marks(self):
+        refresh_related_recipes(full=True)
+        self.soup.tags.add(self.sweet)
+
+        with patch.object(
+            SimilarityIndex, 'from_database', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            refresh_related_recipes()
+        self.assertTrue(RelatedRecipes.objects.get(recipe=self.soup).stale)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('build_related_recipes', '--full', stdout=out)
+        self.assertIn('4 of 4 published recipes recomputed', out.getvalue())
+
+
+@override_settings(RELATED_RECIPES_COUNT=2)
+class RelatedRecipesViewsTest(test.APITestCase, RecipeMixin):
+    def setUp(self):
+        self.recipe = self.make_recipe()
+        self.other = self.make_recipe(
+            title='Other Recipe', slug='other', author_data={'username': 'o'},
+        )
+        tag = Tag.objects.create(name='Doce')
+        self.recipe.tags.add(tag)
+        self.other.tags.add(tag)
+        refresh_related_recipes(full=True)
+        return super().setUp()
+
+    def test_detail_page_shows_the_similar_recipes(self):
+        response = self.client.get(
+            reverse('recipes:recipe', args=(self.recipe.pk,))
+        )
+        self.assertEqual(
+            list(response.context['related_recipes']), [self.other]
+        )
+        self.assertContains(response, self.other.get_absolute_url())
+
+    def test_detail_page_etag_changes_after_a_refresh(self):
+        url = reverse('recipes:recipe', args=(self.recipe.pk,))
+        etag = self.client.get(url)['ETag']
+        refresh_related_recipes()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_detail_page_etag_changes_when_a_similar_recipe_changes(self):
+        url = reverse('recipes:recipe', args=(self.recipe.pk,))
+        etag = self.client.get(url)['ETag']
+
+        self.other.title = 'Renamed Recipe'
+        self.other.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed Recipe')
+
+        etag = response['ETag']
+        self.other.is_published = False
+        self.other.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, self.other.get_absolute_url())
+
+    def test_api_related(self):
+        url = reverse('recipes:recipes-api-related', args=(self.recipe.pk,))
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data], [self.other.pk]
+        )
+        self.assertEqual(response.data[0]['title'], 'Other Recipe')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_api_related_of_a_draft_is_not_found(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(is_published=False)
+        response = self.client.get(
+            reverse('recipes:recipes-api-related', args=(self.recipe.pk,))
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from rest_framework import test
+from tag.models import Tag
+
+from recipes.models import Recipe
+from recipes.search import get_search_backend, search_recipes
+
+from .test_recipe_base import RecipeMixin, RecipeTestBase
+
+
+class RecipeSearchIndexTest(RecipeTestBase):
+    def search_ids(self, term):
+        qs = Recipe.objects.filter(is_published=True)
+        return list(search_recipes(qs, term).values_list('id', flat=True))
+
+    def test_search_finds_recipe_by_preparation_steps(self):
+        recipe = self.make_recipe(preparation_steps='Misture a farinha')
+        self.assertEqual(self.search_ids('farinha'), [recipe.id])
+
+    def test_search_finds_recipe_by_tag_name(self):
+        recipe = self.make_recipe()
+        recipe.tags.add(Tag.objects.create(name='Vegano'))
+        self.assertEqual(self.search_ids('vegano'), [recipe.id])
+
+    def test_search_ignores_accents_and_matches_prefixes(self):
+        recipe = self.make_recipe(title='Feijão tropeiro')
+        self.assertEqual(self.search_ids('feijao'), [recipe.id])
+        self.assertEqual(self.search_ids('trope'), [recipe.id])
+
+    def test_search_orders_by_relevance(self):
+        in_steps = self.make_recipe(
+            slug='steps', author_data={'username': 'steps'},
+            title='Receita comum', preparation_steps='Use bastante alho',
+        )
+        in_title = self.make_recipe(
+            slug='title', author_data={'username': 'title'},
+            title='Pão de alho',
+        )
+        self.assertEqual(self.search_ids('alho'), [in_title.id, in_steps.id])
+
+    def test_index_follows_recipe_updates_and_deletes(self):
+        recipe = self.make_recipe(title='Bolo simples')
+        recipe.title = 'Torta simples'
+        recipe.save()
+        self.assertEqual(self.search_ids('bolo'), [])
+        self.assertEqual(self.search_ids('torta'), [recipe.id])
+
+        recipe.delete()
+        self.assertEqual(self.search_ids('torta'), [])
+
+    def test_index_follows_tag_rename_remove_and_delete(self):
+        recipe = self.make_recipe()
+        tag = Tag.objects.create(name='Vegano')
+        recipe.tags.add(tag)
+
+        tag.name = 'Vegetariano'
+        tag.save()
+        self.assertEqual(self.search_ids('vegetariano'), [recipe.id])
+
+        recipe.tags.remove(tag)
+        self.assertEqual(self.search_ids('vegetariano'), [])
+
+        recipe.tags.add(tag)
+        tag.delete()
+        self.assertEqual(self.search_ids('vegetariano'), [])
+
+    def test_index_follows_reverse_clear(self):
+        recipe = self.make_recipe()
+        tag = Tag.objects.create(name='Vegano')
+        recipe.tags.add(tag)
+        tag.recipe_set.clear()
+        self.assertEqual(self.search_ids('vegano'), [])
+
+    def test_search_without_words_returns_nothing(self):
+        self.make_recipe()
+        self.assertEqual(self.search_ids('"*()'), [])
+
+    def test_rebuild_command_restores_index(self):
+        recipe = self.make_recipe(title='Bolo simples')
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM recipes_recipe_fts')
+        self.assertEqual(self.search_ids('bolo'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search_ids('bolo'), [recipe.id])
+
+    def test_sqlite_uses_fts5_backend(self):
+        if connection.vendor == 'sqlite':
+            self.assertEqual(
+                type(get_search_backend()).__name__, 'SQLiteFTS5SearchBackend'
+            )
+
+
+class RecipeAPIv2SearchTest(test.APITestCase, RecipeMixin):
+    def test_api_search_filter(self):
+        recipe = self.make_recipe(title='Bolo de cenoura')
+        self.make_recipe(
+            slug='other', author_data={'username': 'other'}
+        )
+        response = self.client.get(
+            reverse('recipes:recipes-api-list') + '?search=cenoura'
+        )
+        ids = [item['id'] for item in response.data['results']]
+        self.assertEqual(ids, [recipe.id])
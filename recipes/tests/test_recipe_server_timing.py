@@ -0,0 +1,103 @@
+import json
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from tag.models import Tag
+from utils.server_timing import measure, timer
+
+from recipes.serializers import RecipeSerializer
+
+from .test_recipe_base import RecipeMixin, RecipeTestBase
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@override_settings(SERVER_TIMING_ENABLED=True)
+class RecipeServerTimingTest(RecipeTestBase):
+    def setUp(self):
+        self.recipes = self.make_recipe_in_batch(qtd=3)
+        return super().setUp()
+
+    def test_home_reports_db_template_and_total(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('recipes:home'))
+
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(
+            metrics['db']['desc'], f'"{len(ctx.captured_queries)} queries"'
+        )
+        self.assertIn('template', metrics)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']), float(metrics['template']['dur'])
+        )
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_disabled_sends_no_header(self):
+        response = self.client.get(reverse('recipes:home'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_function_views_report_template(self):
+        response = self.client.get(reverse('authors:login'))
+        self.assertIn('template', parse_server_timing(response['Server-Timing']))
+
+    @override_settings(SERVER_TIMING_LOG_SAMPLE_RATE=1)
+    def test_sampled_requests_are_logged_as_json(self):
+        with self.assertLogs('utils.server_timing', 'INFO') as logs:
+            self.client.get(reverse('recipes:home'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('recipes:home'))
+        self.assertEqual(record['status'], 200)
+        self.assertIn('db', record['metrics'])
+        self.assertEqual(record, logs.records[0].server_timing)
+
+    def test_not_sampled_requests_are_not_logged(self):
+        with self.assertNoLogs('utils.server_timing'):
+            self.client.get(reverse('recipes:home'))
+
+    def test_timer_outside_a_request_does_nothing(self):
+        with timer('serializer'):
+            pass
+
+
+@override_settings(SERVER_TIMING_ENABLED=True)
+class RecipeAPIServerTimingTest(APITestCase, RecipeMixin):
+    def get_token(self, author):
+        response = self.client.post(
+            reverse('recipes:token_obtain_pair'),
+            {'username': author.username, 'password': '123456'},
+        )
+        return response.data['access']
+
+    def test_api_reports_auth_and_serializer(self):
+        recipe = self.make_recipe()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.get_token(recipe.author)}'
+        )
+
+        response = self.client.get(reverse('recipes:recipes-api-list'))
+
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertIn('auth', metrics)
+        self.assertIn('serializer', metrics)
+        self.assertNotIn('template', metrics)
+
+    def test_nested_serializers_are_measured_once(self):
+        recipe = self.make_recipe()
+        recipe.tags.add(Tag.objects.create(name='Doce'))
+
+        with measure() as metrics:
+            RecipeSerializer(recipe, context={'request': None}).data
+
+        # RecipeSerializer -> TagSerializer: uma medida só
+        self.assertEqual(metrics.counts['serializer'], 1)
+
@@ -0,0 +1,193 @@
+from unittest import mock
+
+from authors.forms.recipe_form import AuthorRecipeForm
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import serializers, test
+
+from recipes.models import Recipe, RecipeManager
+from recipes.serializers import RecipeSerializer
+
+from .test_recipe_base import RecipeMixin, RecipeTestBase
+
+
+class RecipeTitleUniquenessTest(RecipeTestBase):
+    def setUp(self):
+        self.recipe = self.make_recipe(title='Bolo de Cenoura')
+        return super().setUp()
+
+    def form_data(self, **kwargs):
+        return {
+            'title': 'Bolo de cenoura',
+            'description': 'Descrição do bolo',
+            'preparation_time': 10,
+            'preparation_time_unit': 'Minutos',
+            'servings': 2,
+            'servings_unit': 'Porções',
+            'preparation_steps': 'Misture tudo',
+            **kwargs,
+        }
+
+    def test_database_rejects_titles_that_differ_only_in_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Recipe.objects.bulk_create([Recipe(
+                title='BOLO DE CENOURA', slug='outro', author=self.recipe.author
+            )])
+
+    def test_clean_uses_one_exists_query(self):
+        recipe = Recipe(title='bolo de CENOURA')
+        with CaptureQueriesContext(connection) as ctx:
+            with self.assertRaises(ValidationError) as error:
+                recipe.clean()
+
+        self.assertEqual(
+            error.exception.message_dict,
+            {'title': ['Found recipes with the same title']},
+        )
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('LOWER', ctx.captured_queries[0]['sql'].upper())
+        self.assertIn('LIMIT 1', ctx.captured_queries[0]['sql'])
+
+    def test_clean_accepts_the_recipe_own_title(self):
+        self.recipe.title = 'BOLO DE CENOURA'
+        self.recipe.clean()
+
+    def test_author_form_reports_the_title_once(self):
+        form = AuthorRecipeForm(data=self.form_data())
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors['title'], ['Found recipes with the same title']
+        )
+        self.assertNotIn('__all__', form.errors)
+
+    def test_save_maps_a_concurrent_title_to_a_validation_error(self):
+        # o clean() já passou e outra requisição salvou o mesmo título
+        recipe = Recipe(title='BOLO DE CENOURA', author=self.recipe.author)
+        with self.assertRaises(ValidationError) as error:
+            recipe.save()
+        self.assertIn('title', error.exception.message_dict)
+        self.assertIsNone(recipe.pk)
+
+    def test_dashboard_shows_the_error_of_a_concurrent_title(self):
+        self.client.force_login(self.make_author(username='dashboard'))
+        with mock.patch.object(
+            RecipeManager, 'title_taken', side_effect=[False, True]
+        ):
+            response = self.client.post(
+                reverse('authors:dashboard_recipe_new'), self.form_data()
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Found recipes with the same title')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_admin_rejects_a_duplicated_title(self):
+        self.client.force_login(User.objects.create_superuser(
+            'admin', 'admin@email.com', '123456'
+        ))
+        response = self.client.post(
+            reverse('admin:recipes_recipe_add'),
+            self.form_data(slug='bolo-de-cenoura-2', category='', author=''),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Found recipes with the same title')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+
+class RecipeSlugAllocationTest(RecipeTestBase):
+    def make(self, title, **kwargs):
+        return Recipe.objects.create(title=title, **kwargs)
+
+    def test_first_recipe_gets_the_plain_slug(self):
+        self.assertEqual(self.make('Bolo de Cenoura').slug, 'bolo-de-cenoura')
+
+    def test_collisions_get_the_first_free_number(self):
+        self.make('Bolo', slug='bolo')
+        self.make('Bolo A', slug='bolo-2')
+        self.make('Bolo B', slug='bolo-4')
+        self.make('Bolo C', slug='bolos')
+
+        with CaptureQueriesContext(connection) as ctx:
+            slug = Recipe.objects.allocate_slug('BOLO')
+
+        self.assertEqual(slug, 'bolo-3')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_long_titles_fit_the_slug_max_length(self):
+        title = 'Torta ' * 10
+        first, second = self.make(title), self.make(title + 'X')
+        self.assertEqual(len(first.slug), 50)
+        self.assertNotEqual(first.slug, second.slug)
+        self.assertLessEqual(len(second.slug), 50)
+
+    def test_titles_without_slug_characters(self):
+        self.assertEqual(self.make('!!!').slug, 'receita')
+        self.assertEqual(self.make('???').slug, 'receita-2')
+
+    def test_the_recipe_own_slug_is_not_a_collision(self):
+        recipe = self.make('Bolo')
+        self.assertEqual(
+            Recipe.objects.allocate_slug('Bolo', exclude_pk=recipe.pk), 'bolo'
+        )
+
+    def test_a_slug_taken_concurrently_is_allocated_again(self):
+        self.make('Pudim', slug='pudim')
+        with mock.patch.object(
+            RecipeManager, 'allocate_slug', side_effect=['pudim', 'pudim-2']
+        ):
+            recipe = self.make('Pudim de leite')
+        self.assertEqual(recipe.slug, 'pudim-2')
+
+    def test_an_explicit_slug_is_not_reallocated(self):
+        self.make('Pudim', slug='pudim')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.make('Pudim de leite', slug='pudim')
+
+
+class RecipeSerializerTitleUniquenessTest(test.APITestCase, RecipeMixin):
+    def setUp(self):
+        self.recipe = self.make_recipe(title='Bolo de Cenoura')
+        return super().setUp()
+
+    def data(self, **kwargs):
+        return {
+            'title': 'bolo de cenoura',
+            'description': 'Descrição do bolo',
+            'slug': 'outro-bolo',
+            'public': False,
+            'preparation_time': 10,
+            'preparation_time_unit': 'Minutos',
+            'servings': 2,
+            'servings_unit': 'Porções',
+            'preparation_steps': 'Misture tudo',
+            **kwargs,
+        }
+
+    def test_create_rejects_a_duplicated_title(self):
+        serializer = RecipeSerializer(data=self.data())
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors['title'], ['Found recipes with the same title']
+        )
+
+    def test_update_keeps_the_recipe_own_title(self):
+        serializer = RecipeSerializer(
+            self.recipe, data={'title': 'BOLO DE CENOURA'}, partial=True
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_concurrent_title_becomes_a_serializer_error(self):
+        serializer = RecipeSerializer(data=self.data(title='Bolo de fubá'))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        Recipe.objects.create(title='BOLO de fubá', slug='fuba')
+
+        with self.assertRaises(serializers.ValidationError) as error:
+            serializer.save(author=self.recipe.author)
+        self.assertEqual(
+            error.exception.detail['title'],
+            ['Found recipes with the same title'],
+        )
@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from tag.models import Tag
+
+from recipes.cache import get_versions
+from recipes.models import TagRecipeCount
+
+
+class TagAPIBulkUpsertTest(APITestCase):
+    url = reverse('recipes:tags-bulk')
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', password='admin', email='admin@email.com'
+        )
+        self.client.force_authenticate(self.admin)
+        return super().setUp()
+
+    def test_returns_the_id_of_every_name(self):
+        doce = Tag.objects.create(name='Doce')
+
+        response = self.client.post(
+            self.url, {'names': ['doce', 'Bolo', 'BOLO']}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        bolo = Tag.objects.get(normalized_name='bolo')
+        self.assertEqual(
+            response.data['tags'],
+            {'doce': doce.pk, 'Bolo': bolo.pk, 'BOLO': bolo.pk},
+        )
+        self.assertEqual(response.data['created'], ['bolo'])
+
+    def test_created_tags_get_a_counter(self):
+        Tag.objects.create(name='Doce')
+
+        response = self.client.post(
+            self.url, {'names': ['Doce', 'Bolo']}, format='json'
+        )
+
+        bolo = response.data['tags']['Bolo']
+        self.assertEqual(
+            list(TagRecipeCount.objects.filter(pk=bolo).values_list(
+                'name', 'slug', 'published'
+            )),
+            [('Bolo', 'bolo', 0)],
+        )
+
+    def test_needs_an_admin(self):
+        user = User.objects.create_user(username='user', password='user')
+        self.client.force_authenticate(user)
+
+        response = self.client.post(
+            self.url, {'names': ['Doce']}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_invalid_payload(self):
+        for data in ({}, {'names': []}, {'names': ['x' * 256]}):
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+
+    def test_creating_tags_invalidates_the_tag_list_cache(self):
+        Tag.objects.create(name='Doce')
+        version = get_versions('tag:list')
+
+        self.client.post(self.url, {'names': ['Doce']}, format='json')
+        self.assertEqual(get_versions('tag:list'), version)
+
+        self.client.post(self.url, {'names': ['Bolo']}, format='json')
+        self.assertNotEqual(get_versions('tag:list'), version)
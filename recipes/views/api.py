@@ -1,24 +1,86 @@
-from django.db.models.functions import Concat
-from django.db.models import F, Value
 from rest_framework.response import Response
 from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
 from recipes.models import Recipe
-from tag.models import Tag
-from ..serializers import RecipeSerializer, TagSerializer
+from tag.models import Tag, TagUpsertError, normalize_tag_name
+from ..serializers import RecipeFastSerializer, RecipeSerializer, TagBulkUpsertSerializer, TagSerializer
 from django.shortcuts import get_object_or_404
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.generics import RetrieveDestroyAPIView
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny, IsAdminUser
 from ..permissions import IsOwnerOrReadOnly
+from ..cache import RECIPE_TAGS_SCOPE, CachedResponseMixin, bump_versions
+from ..conditional import recipe_list_validators, recipe_validators
+from ..counters import CLOUD_SCOPE, create_tag_counts, tag_cloud
+from ..related import RELATED_SCOPE, get_related_recipes
+from ..search import search_recipes
+from ..bulk import RecipeBulkWriter
+from ..export import NDJSON_CONTENT_TYPE, iter_ndjson, parse_updated_since
+from django.http import StreamingHttpResponse
 
 class RecipeAPIv2Pagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 100 
 
-class RecipeAPIv2ViewSet(ModelViewSet):
+class RecipeAPIv2CursorPagination(CursorPagination):
+    '''
+    Paginação por cursor (keyset) usada quando o cliente pede `?pagination=cursor`.
+
+    Não faz `COUNT(*)` e não usa `OFFSET`: cada página filtra por `id < cursor`, então o custo é o mesmo na primeira ou na milésima página. Os links `next` e `previous` carregam um cursor opaco.
+    '''
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+    pagination_query_param = 'pagination'
+
+    @classmethod
+    def is_requested(cls, request):
+        '''
+        O modo cursor é opt-in: `?pagination=cursor` ou a presença de um `?cursor=` vindo de um link `next`/`previous`.
+        '''
+        return (
+            request.query_params.get(cls.pagination_query_param) == 'cursor'
+            or cls.cursor_query_param in request.query_params
+        )
+
+class FastReadMixin:
+    '''
+    `list` e `retrieve` com o `fast_serializer_class` (dicionários do `.values()` em vez de instâncias e campos do DRF). Fica depois do `CachedResponseMixin` na herança, então só roda quando o cache não tem a resposta.
+    '''
+    fast_serializer_class = None
+
+    def get_fast_serializer(self, rows, many=False):
+        return self.fast_serializer_class(
+            rows, many=many, context=self.get_serializer_context()
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.fast_serializer_class.get_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                self.get_fast_serializer(page, many=True).data
+            )
+
+        return Response(self.get_fast_serializer(queryset, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        row = get_object_or_404(
+            self.fast_serializer_class.get_queryset(self.get_queryset()),
+            pk=self.kwargs.get('pk', ''),
+        )
+        self.check_object_permissions(request, row)
+        return Response(self.get_fast_serializer(row).data)
+
+class RecipeAPIv2ViewSet(CachedResponseMixin, FastReadMixin, ModelViewSet):
     '''
     **Métodos Importantes:**
     - `list` (GET): Obtém vários elementos.
@@ -36,21 +98,53 @@ class RecipeAPIv2ViewSet(ModelViewSet):
     - `self.kwargs`: Contém os parâmetros passados na URL.
     - `self.request.query_params`: Contém os parâmetros da Query String passados após o ponto de interrogação na URL.
     
+    **Lote:**
+    - `bulk` (POST/PATCH em `recipes/api/v2/bulk/`): cria ou atualiza até `bulk_max_items` receitas numa transação (veja `recipes/bulk.py`).
+
+    **Exportação:**
+    - `export` (GET em `recipes/api/v2/export/`): todo o catálogo publicado em NDJSON, via streaming (veja `recipes/export.py`).
+
+    **Leitura:**
+    - `list` e `retrieve` usam o `RecipeFastSerializer` (mesma saída do `RecipeSerializer`, montada a partir do `.values()`).
+
+    **Receitas parecidas:**
+    - `related` (GET em `recipes/api/v2/<pk>/related/`): as receitas parecidas pré-calculadas por `recipes/related.py`, sem paginação.
+
+    **Cache:**
+    - `list` e `retrieve` passam pelo `CachedResponseMixin` (escopo `recipe`, mais `recipe:tags` para os nomes das tags), invalidado pelos signals de Recipe, Tag, Category e User.
+    - `related` depende de `recipe:list` (qualquer receita alterada) e de `related` (trocado a cada refresh).
+    - GET condicional: `ETag`/`Last-Modified` vêm de `get_object_validators`/`get_list_validators` (veja `recipes/conditional.py`).
+
     **Limitando os metodos disponiveis:**
     - `http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']`: Limita os métodos HTTP disponíveis para a view.
     '''
     
-    queryset = Recipe.objects.filter(is_published=True).annotate(
-        author_full_name=Concat(
-            F('author__first_name'), Value(' '),
-            F('author__last_name'), Value(' ('),
-            F('author__username'), Value(')'),
-        )).order_by('-id').select_related('category', 'author').prefetch_related('tags')
+    queryset = Recipe.objects.filter(is_published=True).order_by(
+        '-id'
+    ).select_related('category').prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.order_by('id')) # mesma ordem do RecipeFastSerializer.get_tags
+    ) # author_full_name é uma coluna da receita: não precisa do JOIN com auth_user
     serializer_class = RecipeSerializer
+    fast_serializer_class = RecipeFastSerializer
+    cache_scope = 'recipe'
+    cache_dependencies = [RECIPE_TAGS_SCOPE]
     pagination_class = RecipeAPIv2Pagination
+    bulk_max_items = 500
     permission_classes = [IsAuthenticatedOrReadOnly,]
     http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
     
+    @property
+    def paginator(self):
+        '''
+        Escolhe a paginação por requisição: `RecipeAPIv2CursorPagination` quando o cliente pede o modo cursor, senão a `pagination_class` padrão.
+        '''
+        if not hasattr(self, '_paginator'):
+            if RecipeAPIv2CursorPagination.is_requested(self.request):
+                self._paginator = RecipeAPIv2CursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+    
     def get_queryset(self):
         '''
         Este metodo é chamado toda vez que a view precisa de uma queryset, ele retorna a queryset que será usada para listar os objetos.
@@ -59,12 +153,14 @@ class RecipeAPIv2ViewSet(ModelViewSet):
         - `category_id`: Filtra receitas por ID da categoria.
         - `author_id`: Filtra receitas por ID do autor.
         - `tags_ids`: Filtra receitas por IDs das tags.
+        - `search`: Busca textual (título, descrição, modo de preparo e tags) ordenada por relevância.
         '''
         qs = super().get_queryset() # Pega a queryset definida na view
        
         category_id = self.request.query_params.get('category_id') # https//127.0.0.1:5000/recipes/api/v2/?category_id=1
         author_id = self.request.query_params.get('author_id') 
         tags_ids = self.request.query_params.getlist('tags_ids') # https//127.0.0.1:5000/recipes/api/v2/?tags_ids=1&tags_ids=2&tags_ids=3
+        search = self.request.query_params.get('search') # https//127.0.0.1:5000/recipes/api/v2/?search=bolo de cenoura
         if category_id is not None:
             if category_id.isdigit():
                 qs = qs.filter(category_id=category_id)
@@ -80,6 +176,8 @@ class RecipeAPIv2ViewSet(ModelViewSet):
                 qs = qs.filter(tags__id__in=tags_ids) # Acessa o relacionamento tags e filtra os elementos que tem o id na lista tags_ids, tags__id acessa o campo da tabela de tags e __in verifica se o valor está na lista
             else:
                 raise ValidationError('Os parâmetros tags_ids devem ser números inteiros.')
+        if search:
+            qs = search_recipes(qs, search)
             
         return qs
     
@@ -94,7 +192,26 @@ class RecipeAPIv2ViewSet(ModelViewSet):
         self.check_object_permissions(self.request, obj)
         return obj
     
+    def get_object_validators(self):
+        return recipe_validators(
+            self.get_queryset(), self.kwargs.get('pk', ''),
+            'api', self.request.accepted_renderer.format,
+        )
+    
+    def get_list_validators(self):
+        # o modo cursor existe para não contar a tabela: fica sem validadores
+        if RecipeAPIv2CursorPagination.is_requested(self.request):
+            return None
+        return recipe_list_validators(
+            self.filter_queryset(self.get_queryset()),
+            'api', self.request.accepted_renderer.format,
+            self.request.get_full_path(),
+        )
+    
     def get_permissions(self):
+        if self.action == 'bulk':
+            return [IsAuthenticated()]
+        
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
             return [IsOwnerOrReadOnly()]
         
@@ -133,12 +250,81 @@ class RecipeAPIv2ViewSet(ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
-class TagAPIv2ViewSet(ModelViewSet):
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk', url_name='bulk')
+    def bulk(self, request, *args, **kwargs):
+        '''
+        Cria (POST) ou atualiza (PATCH, cada item com `id`) uma lista de receitas do usuário autenticado.
+        
+        Se algum item for inválido nada é salvo e a resposta 400 traz uma lista de erros na mesma ordem dos itens (`{}` para os itens válidos).
+        '''
+        partial = request.method == 'PATCH'
+        writer = RecipeBulkWriter(
+            author=request.user,
+            items=request.data,
+            partial=partial,
+            max_items=self.bulk_max_items,
+        )
+        
+        if not writer.is_valid():
+            return Response({'errors': writer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        recipes = writer.save()
+        return Response(
+            {'results': [{'id': recipe.pk, 'slug': recipe.slug} for recipe in recipes]},
+            status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED,
+        )
+    
+    @action(detail=False, methods=['get'], url_path='export', url_name='export')
+    def export(self, request, *args, **kwargs):
+        '''
+        Transmite as receitas publicadas em NDJSON, uma por linha, em ordem de id. `?updated_since=2024-05-01` (ou data e hora ISO 8601) exporta só as alteradas a partir dessa data.
+        '''
+        updated_since = request.query_params.get('updated_since')
+        if updated_since:
+            try:
+                updated_since = parse_updated_since(updated_since)
+            except ValueError as error:
+                return Response({'updated_since': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return StreamingHttpResponse(
+            iter_ndjson(self.get_serializer_context(), updated_since or None),
+            content_type=NDJSON_CONTENT_TYPE,
+        )
+    
+    @action(detail=True, methods=['get'], url_path='related', url_name='related')
+    def related(self, request, *args, **kwargs):
+        '''
+        Receitas publicadas mais parecidas com a receita (tags e categoria), da mais parecida para a menos, na mesma saída do `retrieve`.
+        '''
+        return self.cached_response(
+            ['recipe:list', RECIPE_TAGS_SCOPE, RELATED_SCOPE], lambda: None,
+            self.related_recipes, request, *args, **kwargs
+        )
+    
+    def related_recipes(self, request, *args, **kwargs):
+        recipe_id = get_object_or_404(
+            Recipe.objects.filter(is_published=True).values_list('id', flat=True),
+            pk=self.kwargs.get('pk', ''),
+        )
+        rows = get_related_recipes(
+            self.fast_serializer_class.get_queryset(
+                Recipe.objects.filter(is_published=True)
+            ),
+            recipe_id,
+        )
+        return Response(self.get_fast_serializer(rows, many=True).data)
+    
+class TagAPIv2ViewSet(CachedResponseMixin, ModelViewSet):
     '''
     View para detalhes de tags. Permite recuperar e excluir tags.
+    `list` e `retrieve` usam o cache de respostas (escopo `tag`).
+    `cloud` (GET em `recipes/api/v2/tag/cloud/`) lista as tags mais usadas a partir dos contadores de `recipes/counters.py`, no cache com a versão `tag:cloud`.
     '''
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_scope = 'tag'
+    cloud_default_limit = 50
+    cloud_max_limit = 200
     permission_classes = [IsAuthenticated]
     http_method_names = ['get', 'delete', 'patch', 'post']
     
@@ -169,3 +355,46 @@ class TagAPIv2ViewSet(ModelViewSet):
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='bulk', url_name='bulk')
+    def bulk(self, request, *args, **kwargs):
+        """
+        Cria as tags que faltam de uma lista de nomes e retorna o id de cada nome (`{"tags": {nome: id}, "created": [...]}`), veja `TagManager.upsert`. Nomes que só diferem em maiúsculas, acentos compostos ou espaços caem na mesma tag.
+        """
+        serializer = TagBulkUpsertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            ids, created = Tag.objects.upsert(serializer.validated_data['names'])
+        except TagUpsertError as error:
+            return Response(
+                {'detail': 'Algumas tags não puderam ser criadas.', 'names': error.names},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if created:
+            # bulk_create não dispara o post_save que invalida a lista nem
+            # os signals que criam os contadores
+            bump_versions('tag:list')
+            created_names = set(created)
+            create_tag_counts({
+                pk for name, pk in ids.items()
+                if normalize_tag_name(name) in created_names
+            })
+        return Response({'tags': ids, 'created': created})
+
+    @action(detail=False, methods=['get'], url_path='cloud', url_name='cloud')
+    def cloud(self, request, *args, **kwargs):
+        """
+        Tags com receitas publicadas, da mais usada para a menos: `[{"id", "name", "slug", "count"}]`. `?limit=` (até `cloud_max_limit`) limita quantas.
+        """
+        return self.cached_response(
+            [CLOUD_SCOPE], lambda: None, self.tag_cloud, request, *args, **kwargs
+        )
+
+    def tag_cloud(self, request, *args, **kwargs):
+        limit = request.query_params.get('limit', str(self.cloud_default_limit))
+        if not limit.isdigit() or not 0 < int(limit) <= self.cloud_max_limit:
+            return Response(
+                {'limit': [f'Deve ser um número entre 1 e {self.cloud_max_limit}.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(tag_cloud(int(limit)))
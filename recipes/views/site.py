@@ -1,6 +1,6 @@
 import os
 
-from django.db.models import Q
+from django.conf import settings
 from django.db.models.aggregates import Count
 from django.forms.models import model_to_dict
 from django.http import JsonResponse
@@ -12,7 +12,13 @@ from django.views.generic import DetailView, ListView
 from tag.models import Tag
 from utils.pagination import make_pagination
 
+from recipes.cache import set_recipe_cache_versions
+from recipes.conditional import ConditionalGetMixin, recipe_validators
+from recipes.counters import category_count, tag_count
+from recipes.counts import cached_count, capped_count, published_scope
 from recipes.models import Recipe
+from recipes.related import RELATED_SCOPE, get_related_recipes
+from recipes.search import search_recipes
 
 PER_PAGE = int(os.environ.get('PER_PAGE', 6))
 
@@ -53,20 +59,26 @@ class RecipeListViewBase(ListView):
         page_obj, pagination_range = make_pagination(
             self.request,
             ctx.get('recipes'),
-            PER_PAGE
+            PER_PAGE,
+            count=self.get_pagination_count,
         )
 
         html_language = translation.get_language()
+        set_recipe_cache_versions(page_obj.object_list)
 
         ctx.update(
             {
                 'recipes': page_obj,
                 'pagination_range': pagination_range,
                 'html_language': html_language,
+                'recipe_card_cache_timeout': settings.RECIPE_CARD_CACHE_TIMEOUT,
             }
         )
         return ctx
 
+    def get_pagination_count(self, current_page):
+        return cached_count(self.object_list, published_scope()), False
+
 
 class RecipeListViewHome(RecipeListViewBase):
     template_name = 'recipes/pages/home.html'
@@ -90,24 +102,31 @@ class RecipeListViewCategory(RecipeListViewBase):
 
     def get_context_data(self, *args, **kwargs):
         ctx = super().get_context_data(*args, **kwargs)
+        recipes = ctx.get('recipes').object_list
+
+        # A contagem (do contador) decide o 404 e o título vem da categoria já
+        # carregada pelo select_related da própria página: sem avaliar a
+        # queryset inteira e sem query extra para o cabeçalho.
+        if not recipes:
+            raise Http404()
+
         category_translation = _('Category')
 
         ctx.update({
-            'title': f'{ctx.get("recipes")[0].category.name} - '
+            'title': f'{recipes[0].category.name} - '
             f'{category_translation} | '
         })
 
         return ctx
 
+    def get_pagination_count(self, current_page):
+        return category_count(self.kwargs.get('category_id')), False
+
     def get_queryset(self, *args, **kwargs):
         qs = super().get_queryset(*args, **kwargs)
         qs = qs.filter(
             category__id=self.kwargs.get('category_id')
         )
-
-        if not qs:
-            raise Http404()
-
         return qs
 
 
@@ -119,11 +138,24 @@ class RecipeListViewTag(RecipeListViewBase):
         qs = qs.filter(tags__slug=self.kwargs.get('slug', ''))
         return qs
 
+    def get_pagination_count(self, current_page):
+        return tag_count(self.kwargs.get('slug', '')), False
+
+    def get_tag(self, recipes):
+        slug = self.kwargs.get('slug', '')
+
+        # As tags da página já vieram no prefetch_related: só consulta a
+        # tabela de tags quando a página está vazia.
+        for recipe in recipes:
+            for tag in recipe.tags.all():
+                if tag.slug == slug:
+                    return tag
+
+        return Tag.objects.filter(slug=slug).first()
+
     def get_context_data(self, *args, **kwargs):
         ctx = super().get_context_data(*args, **kwargs)
-        page_title = Tag.objects.filter(
-            slug=self.kwargs.get('slug', '')
-        ).first()
+        page_title = self.get_tag(ctx.get('recipes').object_list)
 
         if not page_title:
             page_title = 'No recipes found'
@@ -147,13 +179,10 @@ class RecipeListViewSearch(RecipeListViewBase):
             raise Http404()
 
         qs = super().get_queryset(*args, **kwargs)
-        qs = qs.filter(
-            Q(
-                Q(title__icontains=search_term) |
-                Q(description__icontains=search_term),
-            )
-        )
-        return qs
+        return search_recipes(qs, search_term)
+
+    def get_pagination_count(self, current_page):
+        return capped_count(self.object_list, current_page, PER_PAGE)
 
     def get_context_data(self, *args, **kwargs):
         ctx = super().get_context_data(*args, **kwargs)
@@ -168,7 +197,7 @@ class RecipeListViewSearch(RecipeListViewBase):
         return ctx
 
 
-class RecipeDetail(DetailView):
+class RecipeDetail(ConditionalGetMixin, DetailView):
     model = Recipe
     context_object_name = 'recipe'
     template_name = 'recipes/pages/recipe-view.html'
@@ -176,25 +205,53 @@ class RecipeDetail(DetailView):
     def get_queryset(self, *args, **kwargs):
         qs = super().get_queryset(*args, **kwargs)
         qs = qs.filter(is_published=True)
+        qs = qs.select_related('author', 'category', 'author__profile')
+        qs = qs.prefetch_related('tags')
         return qs
 
+    def get_validators(self):
+        # o menu muda com o usuário logado, o texto com o idioma e as receitas parecidas a cada refresh
+        # ou quando uma delas é editada ou despublicada (`recipe:list`)
+        return recipe_validators(
+            self.get_queryset(), self.kwargs.get('pk'), 'html',
+            translation.get_language(), self.request.user.pk,
+            scopes=['recipe:list', RELATED_SCOPE],
+        )
+
+    def get_related_recipes(self):
+        return get_related_recipes(
+            Recipe.objects.filter(is_published=True).only('id', 'title'),
+            self.object.pk,
+        )
+
     def get_context_data(self, *args, **kwargs):
         ctx = super().get_context_data(*args, **kwargs)
 
         ctx.update({
-            'is_detail_page': True
+            'is_detail_page': True,
+            'recipe_card_cache_timeout': settings.RECIPE_CARD_CACHE_TIMEOUT,
+            'related_recipes': self.get_related_recipes(),
         })
 
         return ctx
 
 
 class RecipeDetailAPI(RecipeDetail):
+    def get_validators(self):
+        return recipe_validators(
+            self.get_queryset(), self.kwargs.get('pk'), 'json'
+        )
+
+    def get_related_recipes(self):
+        return []
+
     def render_to_response(self, context, **response_kwargs):
         recipe = self.get_context_data()['recipe']
         recipe_dict = model_to_dict(recipe)
 
         recipe_dict['created_at'] = str(recipe.created_at)
         recipe_dict['updated_at'] = str(recipe.updated_at)
+        recipe_dict['tags'] = [tag.pk for tag in recipe_dict['tags']]
 
         if recipe_dict.get('cover'):
             recipe_dict['cover'] = self.request.build_absolute_uri() + \
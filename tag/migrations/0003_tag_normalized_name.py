@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+from tag.models import normalize_tag_name
+
+
+def fill_normalized_name(apps, schema_editor):
+    # tags repetidas de antes continuam existindo; o upsert usa a mais antiga
+    Tag = apps.get_model('tag', 'Tag')
+    tags = list(Tag.objects.only('id', 'name'))
+    for tag in tags:
+        tag.normalized_name = normalize_tag_name(tag.name)
+    Tag.objects.bulk_update(tags, ['normalized_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tag', '0002_remove_tag_content_type_remove_tag_object_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_normalized_name, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['normalized_name'], name='tag_normalized_name_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    # a tag mais antiga de cada nome normalizado fica com as receitas das
+    # outras, que são apagadas; a contagem dela é refeita a partir do banco
+    Tag = apps.get_model('tag', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TagRecipeCount = apps.get_model('recipes', 'TagRecipeCount')
+    RecipeTag = Recipe.tags.through
+
+    kept, duplicates = {}, {}
+    for pk, normalized_name in Tag.objects.order_by('id').values_list(
+        'id', 'normalized_name'
+    ).iterator():
+        if normalized_name in kept:
+            duplicates[pk] = kept[normalized_name]
+        else:
+            kept[normalized_name] = pk
+    if not duplicates:
+        return
+
+    recipe_tags = set(RecipeTag.objects.filter(
+        tag_id__in=[*duplicates, *duplicates.values()]
+    ).values_list('recipe_id', 'tag_id'))
+    moved = {
+        (recipe_id, duplicates[tag_id])
+        for recipe_id, tag_id in recipe_tags if tag_id in duplicates
+    }
+    RecipeTag.objects.bulk_create((
+        RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id, tag_id in moved - recipe_tags
+    ), batch_size=1000)
+    Tag.objects.filter(pk__in=duplicates).delete()
+
+    for tag in Tag.objects.filter(pk__in=set(duplicates.values())):
+        TagRecipeCount.objects.update_or_create(tag_id=tag.pk, defaults={
+            'name': tag.name,
+            'slug': tag.slug,
+            'published': RecipeTag.objects.filter(
+                tag_id=tag.pk, recipe__is_published=True
+            ).count(),
+        })
+    print(
+        f'\n  {len(duplicates)} tags repetidas juntadas (id -> id mantido): '
+        + ', '.join(f'{pk} -> {keeper}' for pk, keeper in duplicates.items()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_counts'),
+        ('tag', '0003_tag_normalized_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='tag_normalized_name_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('normalized_name',), name='tag_normalized_name_unique'),
+        ),
+    ]
@@ -1,24 +1,182 @@
-import string
-from random import SystemRandom
+import hashlib
+import unicodedata
 
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
 from django.utils.text import slugify
 
+SLUG_MAX_LENGTH = 50
+TAG_NAME_TAKEN_MESSAGE = 'Já existe uma tag com este nome.'
+
+
+def normalize_tag_name(name):
+    '''
+    Nome usado para comparar tags: Unicode NFKC, espaços colapsados e
+    `casefold()`.
+
+    >>> normalize_tag_name('  Bolo   de CENOURA ')
+    'bolo de cenoura'
+    '''
+    return ' '.join(unicodedata.normalize('NFKC', name).split()).casefold()
+
+
+def make_tag_slug(normalized_name, attempt=0):
+    '''
+    Slug determinístico: o `slugify` do nome e, quando esse já existe (ou é
+    vazio ou longo demais), um sufixo com o hash do nome (e da tentativa).
+
+    >>> make_tag_slug('bolo de cenoura')
+    'bolo-de-cenoura'
+    >>> make_tag_slug('bolo de cenoura', attempt=1)
+    'bolo-de-cenoura-91833b22'
+    '''
+    slug = slugify(normalized_name)
+    if not attempt and slug and len(slug) <= SLUG_MAX_LENGTH:
+        return slug
+    seed = normalized_name if attempt <= 1 else f'{normalized_name}:{attempt}'
+    digest = hashlib.md5(seed.encode()).hexdigest()[:8]
+    return f'{slug[:SLUG_MAX_LENGTH - 9]}-{digest}'.lstrip('-')
+
+
+class TagUpsertError(IntegrityError):
+    '''
+    Nomes para os quais o `TagManager.upsert` não achou nem criou uma tag.
+    '''
+    def __init__(self, names):
+        self.names = names
+        super().__init__(f'Tags não criadas: {", ".join(names)}')
+
+
+class TagManager(models.Manager):
+    def ids_by_normalized_name(self, normalized_names, chunk_size=5000):
+        '''
+        `{nome normalizado: id}` das tags existentes.
+        '''
+        normalized_names = list(normalized_names)
+        ids = {}
+        for start in range(0, len(normalized_names), chunk_size):
+            rows = self.filter(
+                normalized_name__in=normalized_names[start:start + chunk_size]
+            ).values_list('normalized_name', 'id')
+            ids.update(rows)
+        return ids
+
+    def insert_one(self, name, normalized_name, max_attempts):
+        '''
+        Insere uma tag, trocando o slug ocupado pelo seguinte de
+        `make_tag_slug`. Retorna `(id, criada)`: `criada` é falso quando
+        outra requisição já inseriu o mesmo nome, e o id é `None` quando
+        nenhum dos `max_attempts` slugs serviu.
+        '''
+        for attempt in range(max_attempts):
+            try:
+                # savepoint: o IntegrityError não estraga a transação de fora
+                with transaction.atomic():
+                    tag, = self.bulk_create([Tag(
+                        name=name, normalized_name=normalized_name,
+                        slug=make_tag_slug(normalized_name, attempt),
+                    )])
+                return tag.pk, True
+            except IntegrityError:
+                found = self.ids_by_normalized_name([normalized_name])
+                if found:
+                    return found[normalized_name], False
+        return None, False
+
+    def upsert(self, names, batch_size=1000, max_attempts=10):
+        '''
+        Garante uma tag para cada nome e retorna `({nome: id}, criadas)`,
+        em que `criadas` são os nomes normalizados inseridos por esta
+        chamada.
+
+        Os nomes são comparados normalizados (`normalize_tag_name`, único no
+        banco): tags existentes são reaproveitadas e as que faltam entram
+        num só `bulk_create`. Se o lote bater num índice único (a mesma tag
+        inserida ao mesmo tempo por outra requisição, ou nomes diferentes
+        com o mesmo slug, "café" e "cafe"), ele é desfeito e as tags entram
+        uma a uma por `insert_one`. Nomes vazios depois da normalização
+        ficam de fora; se algum nome ficar sem tag, `TagUpsertError`.
+        '''
+        normalized = {name: normalize_tag_name(name) for name in names}
+        wanted = {}
+        for name, normalized_name in normalized.items():
+            if normalized_name:
+                wanted.setdefault(normalized_name, ' '.join(name.split()))
+
+        with transaction.atomic():
+            ids = self.ids_by_normalized_name(wanted)
+            missing = [name for name in wanted if name not in ids]
+            created = []
+            try:
+                with transaction.atomic():
+                    tags = self.bulk_create((
+                        Tag(
+                            name=wanted[normalized_name],
+                            normalized_name=normalized_name,
+                            slug=make_tag_slug(normalized_name),
+                        )
+                        for normalized_name in missing
+                    ), batch_size=batch_size)
+                ids.update((tag.normalized_name, tag.pk) for tag in tags)
+                created.extend(missing)
+            except IntegrityError:
+                unresolved = []
+                for normalized_name in missing:
+                    pk, inserted = self.insert_one(
+                        wanted[normalized_name], normalized_name, max_attempts
+                    )
+                    if pk is None:
+                        unresolved.append(wanted[normalized_name])
+                        continue
+                    ids[normalized_name] = pk
+                    if inserted:
+                        created.append(normalized_name)
+                if unresolved:
+                    raise TagUpsertError(unresolved)
+
+        return {
+            name: ids[normalized_name]
+            for name, normalized_name in normalized.items()
+            if normalized_name in ids
+        }, created
+
 
 class Tag(models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
+    normalized_name = models.CharField(
+        max_length=255, default='', editable=False
+    )
+
+    objects = TagManager()
 
     def save(self, *args, **kwargs):
+        self.normalized_name = normalize_tag_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
         if not self.slug:
-            rand_letters = ''.join(
-                SystemRandom().choices(
-                    string.ascii_letters + string.digits,
-                    k=5,
-                )
-            )
-            self.slug = slugify(f'{self.name}-{rand_letters}')
+            attempt = 0
+            self.slug = make_tag_slug(self.normalized_name)
+            while Tag.objects.filter(slug=self.slug).exists():
+                attempt += 1
+                self.slug = make_tag_slug(self.normalized_name, attempt)
         return super().save(*args, **kwargs)
 
+    def clean(self):
+        # o admin não valida o índice único de um campo fora do formulário
+        self.normalized_name = normalize_tag_name(self.name)
+        if Tag.objects.exclude(pk=self.pk).filter(
+            normalized_name=self.normalized_name
+        ).exists():
+            raise ValidationError({'name': TAG_NAME_TAKEN_MESSAGE})
+
     def __str__(self):
         return self.name
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['normalized_name'], name='tag_normalized_name_unique'
+            ),
+        ]
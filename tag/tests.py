@@ -1,3 +1,135 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import Tag, TagUpsertError, make_tag_slug
+
+
+class TagSlugTest(TestCase):
+    def test_slug_comes_from_the_name(self):
+        tag = Tag.objects.create(name='  Bolo de  Cenoura ')
+        self.assertEqual(tag.slug, 'bolo-de-cenoura')
+        self.assertEqual(tag.normalized_name, 'bolo de cenoura')
+
+    def test_repeated_slugs_get_deterministic_suffixes(self):
+        first, second, third = (
+            Tag.objects.create(name=name) for name in ('Cafe', 'Café', 'cafe!')
+        )
+        self.assertEqual(first.slug, 'cafe')
+        self.assertEqual(second.slug, make_tag_slug('café', 1))
+        self.assertEqual(third.slug, make_tag_slug('cafe!', 1))
+
+    def test_clean_rejects_a_name_already_taken(self):
+        Tag.objects.create(name='Doce')
+        with self.assertRaises(ValidationError):
+            Tag(name=' DOCE ').full_clean()
+
+    def test_long_and_empty_slugs(self):
+        self.assertLessEqual(len(make_tag_slug('a' * 200)), 50)
+        self.assertEqual(len(make_tag_slug('!!!')), 8)
+
+    def test_renaming_updates_the_normalized_name(self):
+        tag = Tag.objects.create(name='Doce')
+        tag.name = 'Salgado'
+        tag.save(update_fields=['name'])
+        tag.refresh_from_db()
+        self.assertEqual(tag.normalized_name, 'salgado')
+
+
+class TagUpsertTest(TestCase):
+    def test_reuses_tags_by_normalized_name(self):
+        tag = Tag.objects.create(name='Doce')
+
+        ids, created = Tag.objects.upsert(['DOCE', ' doce ', 'Salgado'])
+
+        self.assertEqual(ids['DOCE'], tag.pk)
+        self.assertEqual(ids[' doce '], tag.pk)
+        self.assertEqual(created, ['salgado'])
+        salgado = Tag.objects.get(pk=ids['Salgado'])
+        self.assertEqual(
+            (salgado.name, salgado.slug, salgado.normalized_name),
+            ('Salgado', 'salgado', 'salgado'),
+        )
+
+    def test_upsert_is_idempotent(self):
+        first, _ = Tag.objects.upsert(['Doce', 'Bolo'])
+        second, created = Tag.objects.upsert(['Bolo', 'Doce'])
+
+        self.assertEqual(first, second)
+        self.assertEqual(created, [])
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_names_with_the_same_slug_are_both_created(self):
+        ids, _ = Tag.objects.upsert(['Café', 'Cafe'])
+
+        self.assertNotEqual(ids['Café'], ids['Cafe'])
+        self.assertEqual(
+            set(Tag.objects.values_list('slug', flat=True)),
+            {'cafe', make_tag_slug('cafe', 1)},
+        )
+
+    def test_slug_taken_by_an_old_tag_with_another_name(self):
+        Tag.objects.create(name='Outra', slug='doce')
+        ids, _ = Tag.objects.upsert(['Doce'])
+        self.assertEqual(
+            Tag.objects.get(pk=ids['Doce']).slug, make_tag_slug('doce', 1)
+        )
+
+    def test_tag_inserted_by_another_request_is_not_created(self):
+        other = Tag.objects.create(name='Doce')
+        lookup = Tag.objects.ids_by_normalized_name
+
+        # a primeira busca não vê a tag, como se ela viesse de outra transação
+        with patch.object(
+            Tag.objects, 'ids_by_normalized_name',
+            side_effect=[{}, lookup(['doce'])],
+        ):
+            ids, created = Tag.objects.upsert(['Doce', 'Salgado'])
+
+        self.assertEqual(ids['Doce'], other.pk)
+        self.assertEqual(created, ['salgado'])
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_unresolved_names_raise(self):
+        Tag.objects.create(name='Outra', slug='doce')
+
+        with self.assertRaises(TagUpsertError) as raised:
+            Tag.objects.upsert(['Doce', 'Salgado'], max_attempts=1)
+
+        self.assertEqual(raised.exception.names, ['Doce'])
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_blank_names_are_skipped(self):
+        ids, created = Tag.objects.upsert(['   ', 'Doce'])
+        self.assertEqual(list(ids), ['Doce'])
+
+    def test_ten_thousand_tags_in_a_few_selects(self):
+        Tag.objects.upsert([f'Tag {i}' for i in range(0, 10_000, 2)])
+        names = [f'Tag {i}' for i in range(10_000)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            ids, created = Tag.objects.upsert(names)
+
+        selects = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        # 2 lotes de nomes; os ids das inseridas voltam do INSERT
+        self.assertEqual(len(selects), 2)
+        self.assertEqual(len(set(ids.values())), 10_000)
+        self.assertEqual(len(created), 5000)
 
-# Create your tests here.
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN do SQLite')
+    def test_lookup_uses_the_normalized_name_index(self):
+        sql, params = Tag.objects.filter(
+            normalized_name__in=['doce', 'bolo']
+        ).values_list('normalized_name', 'id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('INDEX', plan)
+        self.assertIn('(normalized_name=?)', plan)
@@ -0,0 +1,227 @@
+'''
+In-process connection pool for the Django database backends.
+
+Use it by pointing `ENGINE` at `utils.db_pool.postgresql` or
+`utils.db_pool.sqlite3` (the settings do it with `DATABASE_POOL=1`) and
+configuring the pool with a `POOL` key next to `ENGINE`:
+
+    'POOL': {'MAX_SIZE': 4, 'TIMEOUT': 5, 'MAX_LIFETIME': 1800}
+
+Django keeps opening and closing connections as usual (`CONN_MAX_AGE = 0`
+gives the connection back at the end of every request), but "open" takes
+an idle connection from the pool and "close" puts it back:
+
+- at most `MAX_SIZE` connections per process and alias; a checkout waits up
+  to `TIMEOUT` seconds for a free one and then raises `PoolTimeout`;
+- connections older than `MAX_LIFETIME` seconds are closed instead of
+  reused;
+- with `CONN_HEALTH_CHECKS` an idle connection runs `SELECT 1` before it is
+  handed out, and a connection that had errors is checked before it goes
+  back to the pool;
+- a connection given back inside a transaction is rolled back, and one
+  given back inside an `atomic` block is discarded.
+
+Pools are created lazily, so each gunicorn worker (forked before any query)
+gets its own. `pool_stats()` returns the counters of every pool of the
+process; the time spent waiting for a connection shows up as `db_pool` in
+the Server-Timing header.
+'''
+import threading
+from time import monotonic
+
+from django.db.utils import OperationalError
+
+from utils.server_timing import timer
+
+DEFAULT_POOL = {'MAX_SIZE': 4, 'TIMEOUT': 5, 'MAX_LIFETIME': 1800}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    ...
+
+
+class ConnectionPool:
+    def __init__(self, max_size, timeout, max_lifetime):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self._condition = threading.Condition()
+        self._idle = []
+        self._created_at = {}
+        self._connecting = 0
+        self.stats = {
+            'created': 0, 'closed': 0, 'checkouts': 0, 'checkins': 0,
+            'waits': 0, 'wait_time': 0.0, 'timeouts': 0, 'failed_checks': 0,
+        }
+
+    @property
+    def size(self):
+        return len(self._created_at) + self._connecting
+
+    def _expired(self, raw):
+        age = monotonic() - self._created_at[id(raw)]
+        return self.max_lifetime is not None and age > self.max_lifetime
+
+    def _discard(self, raw):
+        self._created_at.pop(id(raw), None)
+        self.stats['closed'] += 1
+        self._condition.notify()
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _reserve(self):
+        '''
+        An idle connection, or None after reserving a slot for a new one.
+        '''
+        deadline = monotonic() + self.timeout
+        waited = False
+        with self._condition:
+            while True:
+                while self._idle:
+                    raw = self._idle.pop()
+                    if self._expired(raw):
+                        self._discard(raw)
+                        continue
+                    return raw
+                if self.size < self.max_size:
+                    self._connecting += 1
+                    return None
+
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'No database connection free after {self.timeout}s '
+                        f'(pool of {self.max_size}).'
+                    )
+                if not waited:
+                    self.stats['waits'] += 1
+                    waited = True
+                start = monotonic()
+                self._condition.wait(remaining)
+                self.stats['wait_time'] += monotonic() - start
+
+    def checkout(self, connect, validate=None):
+        '''
+        A connection from the pool (passing `validate`, if given) or a new
+        one from `connect()`.
+        '''
+        while True:
+            raw = self._reserve()
+            if raw is None:
+                return self._connect(connect)
+            if validate is None or validate(raw):
+                with self._condition:
+                    self.stats['checkouts'] += 1
+                return raw
+            with self._condition:
+                self.stats['failed_checks'] += 1
+                self._discard(raw)
+
+    def _connect(self, connect):
+        try:
+            raw = connect()
+        except BaseException:
+            with self._condition:
+                self._connecting -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._connecting -= 1
+            self._created_at[id(raw)] = monotonic()
+            self.stats['created'] += 1
+            self.stats['checkouts'] += 1
+        return raw
+
+    def checkin(self, raw, reusable=True):
+        with self._condition:
+            self.stats['checkins'] += 1
+            if not reusable or self._expired(raw):
+                self._discard(raw)
+                return
+            self._idle.append(raw)
+            self._condition.notify()
+
+    def close_idle(self):
+        with self._condition:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                **self.stats,
+                'wait_time': round(self.stats['wait_time'], 6),
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': self.size - len(self._idle),
+            }
+
+
+def get_pool(alias, options):
+    with _pools_lock:
+        if alias not in _pools:
+            options = {**DEFAULT_POOL, **(options or {})}
+            _pools[alias] = ConnectionPool(
+                max_size=options['MAX_SIZE'],
+                timeout=options['TIMEOUT'],
+                max_lifetime=options['MAX_LIFETIME'],
+            )
+        return _pools[alias]
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.get_stats() for alias, pool in pools.items()}
+
+
+class PooledDatabaseWrapperMixin:
+    '''
+    Goes before the backend `DatabaseWrapper` in the bases.
+    '''
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL'))
+
+    def get_new_connection(self, conn_params):
+        def connect():
+            return super(PooledDatabaseWrapperMixin, self).get_new_connection(
+                conn_params
+            )
+
+        validate = self.is_raw_usable if self.health_check_enabled else None
+        with timer('db_pool'):
+            return self.pool.checkout(connect, validate)
+
+    def is_raw_usable(self, raw):
+        try:
+            cursor = raw.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except self.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        raw = self.connection
+        if raw is None:
+            return
+
+        reusable = not self.in_atomic_block
+        if reusable and not self.autocommit:
+            try:
+                raw.rollback()
+            except self.Database.Error:
+                reusable = False
+        if reusable and self.errors_occurred:
+            reusable = self.is_raw_usable(raw)
+        self.pool.checkin(raw, reusable)
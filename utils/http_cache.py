@@ -0,0 +1,42 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def make_validators(parts, last_modified=None):
+    '''
+    Returns `(etag, last_modified)`: a strong ETag hashed from `parts` and the
+    most recent of the given datetimes as a timestamp (or None).
+    '''
+    digest = hashlib.md5(
+        ':'.join(str(part) for part in parts).encode('utf-8'),
+        usedforsecurity=False,
+    ).hexdigest()
+    moments = [moment for moment in (last_modified or ()) if moment]
+    timestamp = int(max(moments).timestamp()) if moments else None
+    return quote_etag(digest), timestamp
+
+
+def conditional_response(request, validators):
+    '''
+    304 (or 412) response when the request validators match, otherwise None.
+    '''
+    if validators is None or request.method not in SAFE_METHODS:
+        return None
+    etag, last_modified = validators
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+
+
+def set_validators(response, validators):
+    if validators is None or response.status_code not in (200, 304):
+        return response
+    etag, last_modified = validators
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
@@ -1,6 +1,7 @@
 import math
 
 from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 
 # python -c
 # "import string as s;from random import SystemRandom as
@@ -41,13 +42,38 @@ def make_pagination_range(
     }
 
 
-def make_pagination(request, queryset, per_page, qty_pages=4):
+class CountedPaginator(Paginator):
+    '''
+    Paginator that takes the total from `count` instead of running
+    `COUNT(*)` on the queryset. `count=None` keeps Django's behaviour.
+    '''
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        if self._count is None:
+            return super().count
+        return self._count
+
+
+def make_pagination(request, queryset, per_page, qty_pages=4, count=None):
+    '''
+    `count` can be an int or a callable `count(current_page)` returning
+    `(total, is_estimate)`; when omitted the paginator counts the queryset.
+    '''
     try:
         current_page = int(request.GET.get('page', 1))
     except ValueError:
         current_page = 1
 
-    paginator = Paginator(queryset, per_page)
+    count_is_estimate = False
+    if callable(count):
+        count, count_is_estimate = count(current_page)
+
+    paginator = CountedPaginator(queryset, per_page, count=count)
     page_obj = paginator.get_page(current_page)
 
     pagination_range = make_pagination_range(
@@ -55,5 +81,6 @@ def make_pagination(request, queryset, per_page, qty_pages=4):
         qty_pages,
         current_page
     )
+    pagination_range['count_is_estimate'] = count_is_estimate
 
     return page_obj, pagination_range
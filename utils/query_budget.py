@@ -0,0 +1,127 @@
+'''
+SQL query budgets for views.
+
+Every request made inside `record_queries()` has its SQL recorded together
+with the project frames that issued it. `QueryBudget.check()` compares the
+number of queries with `query_budget.json` and fails with the offending SQL
+when a view goes over its budget.
+
+Regenerate the file with `pytest --update-query-budget` (or
+`QUERY_BUDGET_UPDATE=1`) and commit the diff.
+'''
+import functools
+import json
+import os
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+BUDGET_FILE = Path(settings.BASE_DIR) / 'query_budget.json'
+UPDATE_ENV = 'QUERY_BUDGET_UPDATE'
+
+
+def query_origin(limit=3):
+    '''
+    The innermost project frames (outside site-packages and this module).
+    '''
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return [
+        f'{os.path.relpath(frame.filename, base_dir)}:{frame.lineno} '
+        f'in {frame.name}'
+        for frame in frames[-limit:]
+    ]
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append({'sql': sql, 'origin': query_origin()})
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self):
+        lines = []
+        for number, query in enumerate(self.queries, start=1):
+            lines.append(f'{number:>3}. {query["sql"]}')
+            lines.extend(f'       {origin}' for origin in query['origin'])
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+
+
+class QueryBudget:
+    def __init__(self, path=BUDGET_FILE, update=None):
+        self.path = Path(path)
+        if update is None:
+            update = os.environ.get(UPDATE_ENV) == '1'
+        self.update = update
+
+    def load(self):
+        if not self.path.exists():
+            return {}
+        return json.loads(self.path.read_text(encoding='utf-8'))
+
+    def save(self, key, count):
+        budgets = self.load()
+        budgets[key] = count
+        self.path.write_text(
+            json.dumps(budgets, indent=2, sort_keys=True) + '\n',
+            encoding='utf-8',
+        )
+
+    def check(self, key, recorder):
+        count = len(recorder)
+        if self.update:
+            self.save(key, count)
+            return
+
+        budget = self.load().get(key)
+        if budget is None:
+            raise AssertionError(
+                f'No query budget for "{key}" ({count} queries). Run pytest '
+                f'with --update-query-budget to record it.'
+            )
+        if count > budget:
+            raise AssertionError(
+                f'"{key}" ran {count} queries, budget is {budget}:\n'
+                f'{recorder.report()}'
+            )
+
+    @contextmanager
+    def measure(self, key):
+        with record_queries() as recorder:
+            yield recorder
+        self.check(key, recorder)
+
+
+def query_budget(key):
+    '''
+    Decorator: the queries run by the decorated function must fit the budget
+    of `key`. The key may use the function arguments, e.g.
+    `@query_budget('recipes:home[{size}]')`.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with QueryBudget().measure(key.format(**kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
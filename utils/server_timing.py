@@ -0,0 +1,164 @@
+'''
+Per-request timings exposed as a `Server-Timing` header.
+
+`ServerTimingMiddleware` measures the database (time and number of queries)
+and the total time of the request. The other metrics come from the code that
+does the work:
+
+- `timed('serializer')` / `timer('serializer')` around serialization;
+- `timed('auth')` around authentication (`authors.authentication`);
+- the `DjangoTemplates` backend below around template rendering.
+
+A metric that is re-entered (a serializer nested in another one) is only
+measured by the outermost call. Outside a measured request `timer()` and
+`timed()` only read a context variable, and with `SERVER_TIMING_ENABLED`
+off the middleware is not installed at all.
+
+Under sampling (`SERVER_TIMING_LOG_SAMPLE_RATE`) every metric is also logged
+as one JSON line in the `utils.server_timing` logger.
+'''
+import functools
+import json
+import logging
+import random
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+_metrics = ContextVar('server_timing_metrics', default=None)
+
+
+class Metrics:
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.active = set()
+
+    def add(self, name, duration):
+        self.durations[name] += duration
+        self.counts[name] += 1
+
+    def as_dict(self):
+        return {
+            name: {
+                'dur': round(duration * 1000, 3),
+                'count': self.counts[name],
+            }
+            for name, duration in self.durations.items()
+        }
+
+    def header(self):
+        entries = []
+        for name, duration in self.durations.items():
+            entry = f'{name};dur={duration * 1000:.3f}'
+            if name == 'db':
+                entry += f';desc="{self.counts[name]} queries"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+
+@contextmanager
+def measure():
+    '''
+    Collects the metrics of the code run inside the block.
+    '''
+    metrics = Metrics()
+    token = _metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _metrics.reset(token)
+
+
+@contextmanager
+def timer(name):
+    metrics = _metrics.get()
+    if metrics is None or name in metrics.active:
+        yield
+        return
+
+    metrics.active.add(name)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, perf_counter() - start)
+        metrics.active.discard(name)
+
+
+def timed(name):
+    '''
+    Decorator version of `timer()`.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _metrics.get() is None:
+                return func(*args, **kwargs)
+            with timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _db_timer(execute, sql, params, many, context):
+    with timer('db'):
+        return execute(sql, params, many, context)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    '''
+    The default Django backend with the rendering measured as `template`.
+    Includes and `{% cache %}` hits are part of the outermost render.
+    '''
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timer('template'):
+            return super().render(context, request)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.log_sample_rate = settings.SERVER_TIMING_LOG_SAMPLE_RATE
+
+    def __call__(self, request):
+        start = perf_counter()
+        with measure() as metrics, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_db_timer))
+            response = self.get_response(request)
+        metrics.add('total', perf_counter() - start)
+
+        response['Server-Timing'] = metrics.header()
+        if self.log_sample_rate and random.random() < self.log_sample_rate:
+            self.log(request, response, metrics)
+        return response
+
+    def log(self, request, response, metrics):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'metrics': metrics.as_dict(),
+        }
+        logger.info(
+            json.dumps(record, sort_keys=True), extra={'server_timing': record}
+        )
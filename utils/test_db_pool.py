@@ -0,0 +1,187 @@
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from django.db import connections
+from django.test import TestCase as DjangoTestCase
+
+from utils.db_pool import ConnectionPool, PoolTimeout
+from utils.db_pool.sqlite3.base import DatabaseWrapper
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(TestCase):
+    def make_pool(self, max_size=2, timeout=0.05, max_lifetime=None):
+        return ConnectionPool(max_size, timeout, max_lifetime)
+
+    def test_reuses_connections_given_back(self):
+        pool = self.make_pool()
+        raw = pool.checkout(FakeConnection)
+        pool.checkin(raw)
+
+        self.assertIs(pool.checkout(FakeConnection), raw)
+        self.assertEqual(pool.get_stats()['created'], 1)
+        self.assertEqual(pool.get_stats()['checkouts'], 2)
+
+    def test_times_out_when_every_connection_is_in_use(self):
+        pool = self.make_pool(max_size=2)
+        pool.checkout(FakeConnection)
+        pool.checkout(FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(FakeConnection)
+        stats = pool.get_stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['in_use'], 2)
+
+    def test_waiting_checkout_gets_the_connection_given_back(self):
+        pool = self.make_pool(max_size=1, timeout=2)
+        raw = pool.checkout(FakeConnection)
+        threading.Timer(0.05, pool.checkin, (raw,)).start()
+
+        self.assertIs(pool.checkout(FakeConnection), raw)
+        self.assertEqual(pool.get_stats()['waits'], 1)
+        self.assertGreater(pool.get_stats()['wait_time'], 0)
+
+    def test_connections_not_reusable_are_closed(self):
+        pool = self.make_pool(max_size=1)
+        raw = pool.checkout(FakeConnection)
+        pool.checkin(raw, reusable=False)
+
+        self.assertTrue(raw.closed)
+        self.assertIsNot(pool.checkout(FakeConnection), raw)
+
+    def test_connections_failing_validation_are_replaced(self):
+        pool = self.make_pool()
+        raw = pool.checkout(FakeConnection)
+        pool.checkin(raw)
+
+        new = pool.checkout(FakeConnection, validate=lambda raw: False)
+
+        self.assertIsNot(new, raw)
+        self.assertTrue(raw.closed)
+        self.assertEqual(pool.get_stats()['failed_checks'], 1)
+
+    def test_old_connections_are_not_reused(self):
+        pool = self.make_pool(max_lifetime=0.01)
+        raw = pool.checkout(FakeConnection)
+        pool.checkin(raw)
+        time.sleep(0.02)
+
+        self.assertIsNot(pool.checkout(FakeConnection), raw)
+        self.assertTrue(raw.closed)
+
+    def test_failed_connect_frees_the_slot(self):
+        pool = self.make_pool(max_size=1)
+
+        def connect():
+            raise OSError('refused')
+
+        with self.assertRaises(OSError):
+            pool.checkout(connect)
+        self.assertEqual(pool.get_stats()['size'], 0)
+        pool.checkout(FakeConnection)
+
+    def test_size_is_bounded_under_concurrency(self):
+        pool = self.make_pool(max_size=3, timeout=5)
+        peak = []
+
+        def work():
+            raw = pool.checkout(FakeConnection)
+            peak.append(pool.get_stats()['in_use'])
+            time.sleep(0.005)
+            pool.checkin(raw)
+
+        threads = [threading.Thread(target=work) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(pool.get_stats()['created'], 3)
+        self.assertEqual(pool.get_stats()['checkins'], 20)
+
+
+class PooledSQLiteBackendTest(DjangoTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.db = self.make_wrapper()
+
+    def make_wrapper(self):
+        settings_dict = {
+            **connections['default'].settings_dict,
+            'ENGINE': 'utils.db_pool.sqlite3',
+            'NAME': str(Path(self.directory.name) / 'pool.sqlite3'),
+            'CONN_HEALTH_CHECKS': True,
+            'POOL': {'MAX_SIZE': 2, 'TIMEOUT': 0.05, 'MAX_LIFETIME': None},
+        }
+        db = DatabaseWrapper(settings_dict, alias=f'pool-{id(self)}')
+        self.addCleanup(db.pool.close_idle)
+        return db
+
+    def query(self, db):
+        with db.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            return cursor.fetchone()[0]
+
+    def test_close_gives_the_connection_back(self):
+        self.query(self.db)
+        raw = self.db.connection
+        self.db.close()
+
+        self.assertEqual(self.query(self.db), 1)
+        self.assertIs(self.db.connection, raw)
+        stats = self.db.pool.get_stats()
+        self.assertEqual((stats['created'], stats['checkouts']), (1, 2))
+        self.db.close()
+        self.assertEqual(self.db.pool.get_stats()['idle'], 1)
+
+    def test_wrappers_of_the_same_alias_share_the_pool(self):
+        other = DatabaseWrapper(self.db.settings_dict, alias=self.db.alias)
+        self.query(self.db)
+        self.query(other)
+
+        self.assertEqual(self.db.pool.get_stats()['in_use'], 2)
+        third = DatabaseWrapper(self.db.settings_dict, alias=self.db.alias)
+        with self.assertRaises(PoolTimeout):
+            self.query(third)
+        self.db.close()
+        other.close()
+
+    def test_connection_closed_inside_atomic_is_discarded(self):
+        self.query(self.db)
+        raw = self.db.connection
+        self.db.in_atomic_block = True
+        self.addCleanup(setattr, self.db, 'in_atomic_block', False)
+        self.db.close()
+
+        stats = self.db.pool.get_stats()
+        self.assertEqual((stats['idle'], stats['closed']), (0, 1))
+        with self.assertRaises(sqlite3.ProgrammingError):
+            raw.execute('SELECT 1')
+
+    def test_uncommitted_work_is_rolled_back_when_given_back(self):
+        self.query(self.db)
+        with self.db.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (name text)')
+        self.db.set_autocommit(False)
+        with self.db.cursor() as cursor:
+            cursor.execute("INSERT INTO item VALUES ('lost')")
+        self.db.close()
+
+        with self.db.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM item')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.db.close()
@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from utils.pagination import make_pagination_range
+from utils.pagination import CountedPaginator, make_pagination_range
 
 
 class PaginationTest(TestCase):
@@ -102,3 +102,14 @@ class PaginationTest(TestCase):
             current_page=21,
         )['pagination']
         self.assertEqual([17, 18, 19, 20], pagination)
+
+
+class CountedPaginatorTest(TestCase):
+    def test_counted_paginator_uses_given_count(self):
+        paginator = CountedPaginator(list(range(100)), 10, count=30)
+        self.assertEqual(paginator.count, 30)
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_counted_paginator_counts_when_no_count_is_given(self):
+        paginator = CountedPaginator(list(range(100)), 10)
+        self.assertEqual(paginator.count, 100)